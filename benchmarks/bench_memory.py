@@ -0,0 +1,61 @@
+"""1年分の10分毎の観測値を保持したときのメモリ使用量を行の形式毎に測る
+
+    $ python benchmarks/bench_memory.py
+"""
+import datetime
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jma
+from jma.rows import compact_rows
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+DAYS = 365
+
+
+def load_table(name):
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return jma.Jma()._parse_table(f.read())
+
+
+def rows(table_rows, station_type, date, url):
+    return [jma.TenMinutelyWeatherDataRow(row, date.year, date.month, date.day, url) for row in table_rows]
+
+
+def compact(table_rows, station_type, date, url):
+    return list(compact_rows(table_rows, jma.DATA_TYPE_TEN_MINUTELY, station_type, date.year, date.month, date.day, url))
+
+
+def measure(build, table_rows, station_type):
+    gc.collect()
+    tracemalloc.start()
+    kept = []
+    start = datetime.date(2017, 1, 1)
+    for i in range(DAYS):
+        date = start + datetime.timedelta(days=i)
+        url = "http://www.data.jma.go.jp/obd/stats/etrn/view/10min_{}1.php?prec_no=51&block_no=47636&year={}&month={}&day={}".format(
+            station_type, date.year, date.month, date.day)
+        kept.extend(build(table_rows, station_type, date, url))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(kept), current
+
+
+def main():
+    for station_type in (jma.STATION_TYPE_S, jma.STATION_TYPE_A):
+        table_rows = load_table("10min_{}1.html".format(station_type))
+        results = {}
+        for name, build in (("dict rows", rows), ("compact rows", compact)):
+            count, size = measure(build, table_rows, station_type)
+            results[name] = size
+            print("{}: {:<13} {:>8} rows {:>8.1f} MiB {:>6.0f} bytes/row".format(
+                station_type, name, count, size / 2 ** 20, size / count))
+        print("{}: reduction     {:>31.1f}x".format(station_type, results["dict rows"] / results["compact rows"]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""パーサのバックエンド毎の解析速度(rows/sec)を測る
+
+    $ python benchmarks/bench_parser.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jma
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+FIXTURES = [
+    ("hourly_s1.html", jma.HourlyWeatherDataRow),
+    ("hourly_a1.html", jma.HourlyWeatherDataRow),
+    ("10min_s1.html", jma.TenMinutelyWeatherDataRow),
+    ("10min_a1.html", jma.TenMinutelyWeatherDataRow),
+]
+REPEAT = 20
+
+
+def bench(parser):
+    j = jma.Jma(parser=parser)
+    pages = []
+    for name, row_class in FIXTURES:
+        with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+            pages.append((f.read(), row_class))
+    rows = 0
+    started = time.perf_counter()
+    for i in range(REPEAT):
+        for content, row_class in pages:
+            for row in j._parse_data(content, row_class, 2018, 9, 28, ""):
+                rows += 1
+    return rows / (time.perf_counter() - started)
+
+
+def main():
+    results = {parser: bench(parser) for parser in ("requests_html", "lxml")}
+    for parser, rows_per_sec in results.items():
+        print("{:<14} {:>10.0f} rows/sec".format(parser, rows_per_sec))
+    print("speedup        {:>10.1f}x".format(results["lxml"] / results["requests_html"]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""fixturesとローカルサーバを使ったベンチマーク
+
+解析速度(rows/sec)、ローカルサーバ経由の取得速度(days/sec)、ピークメモリ、import時間を測り、
+結果をJSONで出力する。
+
+    $ python benchmarks/run.py --output bench.json
+    $ python benchmarks/run.py --compare bench.json   # 前回より遅くなっていれば終了コード1
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import jma
+from jma.testing import FixtureServer
+
+FIXTURES_DIR = os.path.join(ROOT, "fixtures")
+PREC_NO = "51"
+STATIONS = {
+    jma.STATION_TYPE_S: "47636",
+    jma.STATION_TYPE_A: "0467",
+}
+# 値が大きい方が良い指標
+HIGHER_IS_BETTER = ("rows_per_sec", "days_per_sec", "stations_per_sec")
+
+
+def _timed(func, min_time):
+    '''min_time秒以上になるまでfuncを繰り返し、(1回あたりの秒数, funcの返り値)を返す'''
+    count = 0
+    result = None
+    started = time.perf_counter()
+    while True:
+        result = func()
+        count += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            return elapsed / count, result
+
+
+def bench_parse(min_time):
+    results = {}
+    j = jma.Jma()
+    for name, row_class in (("hourly", jma.HourlyWeatherDataRow), ("10min", jma.TenMinutelyWeatherDataRow)):
+        for station_type in STATIONS:
+            with open(os.path.join(FIXTURES_DIR, "{}_{}1.html".format(name, station_type)), "rb") as f:
+                content = f.read()
+            seconds, rows = _timed(lambda: len(list(j._parse_data(content, row_class, 2018, 9, 28, ""))), min_time)
+            results["parse_{}_{}".format(name, station_type)] = {"rows_per_sec": rows / seconds}
+    return results
+
+
+def bench_end_to_end(server, days, min_time):
+    results = {}
+    start = datetime.date(2018, 1, 1)
+    dates = [start + datetime.timedelta(days=i) for i in range(days)]
+
+    def stations():
+        j = jma.Jma(catalog=jma.StationCatalog(), base_url=server.base_url)
+        return len(list(j.get_stations(PREC_NO)))
+
+    seconds, count = _timed(stations, min_time)
+    results["get_stations"] = {"stations_per_sec": count / seconds}
+
+    for name in ("get_hourly_data", "get_ten_minutely_data"):
+        for station_type, block_no in STATIONS.items():
+            j = jma.Jma(catalog=jma.StationCatalog(), base_url=server.base_url)
+            get_data = getattr(j, name)
+            j.get_station(PREC_NO, block_no)
+
+            def fetch():
+                return sum(len(list(get_data(PREC_NO, block_no, d.year, d.month, d.day))) for d in dates)
+
+            seconds, rows = _timed(fetch, min_time)
+            # tracemallocは遅くなるので速度とは別に測る
+            tracemalloc.start()
+            fetch()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results["{}_{}".format(name, station_type)] = {
+                "days_per_sec": days / seconds,
+                "rows_per_sec": rows / seconds,
+                "peak_memory_bytes": peak,
+            }
+    return results
+
+
+def bench_pipeline(server, days, min_time):
+    '''キャッシュしたページをスレッドだけ(fetch_many)と、スレッド+プロセス(fetch_parsed)で取得・解析する'''
+    results = {}
+    start = datetime.date(2018, 1, 1)
+    jobs = [((PREC_NO, block_no), start + datetime.timedelta(days=i), jma.DATA_TYPE_TEN_MINUTELY)
+            for i in range(days) for block_no in STATIONS.values()]
+    with tempfile.TemporaryDirectory() as path:
+        cache = jma.ResponseCache(path)
+        catalog = jma.StationCatalog()
+        online = jma.Jma(catalog=catalog, base_url=server.base_url, cache=cache)
+        for result in jma.fetch_many(jobs, jma=online):
+            result.rows
+        # ページはキャッシュから読み、取得を待たずに解析の速さを測る
+        j = jma.Jma(catalog=catalog, base_url=server.base_url, cache=cache, offline=True)
+        workers = os.cpu_count() or 1
+
+        def threads():
+            return sum(len(result.rows) for result in jma.fetch_many(jobs, workers=workers, jma=j))
+
+        def processes():
+            return sum(len(result.rows) for result in jma.fetch_parsed(jobs, parse_workers=workers, jma=j))
+
+        for name, func in (("fetch_many", threads), ("fetch_parsed", processes)):
+            seconds, rows = _timed(func, min_time)
+            results["{}_cached".format(name)] = {"days_per_sec": len(jobs) / seconds, "rows_per_sec": rows / seconds}
+    return results
+
+
+def bench_import(repeat):
+    '''新しいプロセスでimport jmaとJma()にかかる時間(秒)の最小値と、読み込まれたモジュールの数'''
+    code = ("import sys, time; modules = len(sys.modules); t = time.perf_counter(); import jma; jma.Jma(); "
+            "print(time.perf_counter() - t, len(sys.modules) - modules)")
+    times = []
+    for i in range(repeat):
+        seconds, modules = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT).split()
+        times.append(float(seconds))
+    return {"import_jma": {"seconds": min(times), "modules": int(modules)}}
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(days, min_time, import_repeat):
+    benchmarks = {}
+    benchmarks.update(bench_parse(min_time))
+    with FixtureServer(FIXTURES_DIR) as server:
+        benchmarks.update(bench_end_to_end(server, days, min_time))
+        benchmarks.update(bench_pipeline(server, days, min_time))
+    benchmarks.update(bench_import(import_repeat))
+    return {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "benchmarks": benchmarks,
+    }
+
+
+def compare(result, baseline, tolerance):
+    '''baselineよりtolerance以上悪くなった指標のリスト'''
+    regressions = []
+    for name, metrics in result["benchmarks"].items():
+        for metric, value in metrics.items():
+            base = baseline["benchmarks"].get(name, {}).get(metric)
+            if not base:
+                continue
+            change = (value - base) / base
+            if metric in HIGHER_IS_BETTER:
+                change = -change
+            if change > tolerance:
+                regressions.append("{}.{}: {:.4g} -> {:.4g} ({:+.0%})".format(name, metric, base, value, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="結果を書き込むJSONファイル(省略時は標準出力)")
+    parser.add_argument("--compare", help="比較する前回の結果のJSONファイル")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="回帰とみなす悪化の割合 (default: 0.2)")
+    parser.add_argument("--days", type=int, default=7, help="取得速度を測る日数 (default: 7)")
+    parser.add_argument("--min-time", type=float, default=1.0, help="1項目あたりの最小の測定時間(秒) (default: 1.0)")
+    parser.add_argument("--import-repeat", type=int, default=5, help="import時間の測定回数 (default: 5)")
+    args = parser.parse_args(argv)
+
+    result = run(args.days, args.min_time, args.import_repeat)
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("regression: " + regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1 +1,18 @@
 from .core import *
+from .catalog import StationCatalog
+from .aio import AsyncJma
+from .parallel import fetch_many, FetchJob, FetchResult, RateLimiter
+from .parser import LxmlParser, RequestsHTMLParser
+from .columns import ColumnarData
+from .rows import CompactWeatherDataRow
+from .cache import ResponseCache, PageCache, SingleFlight
+from .transport import Transport, TransportError, HTTPStatusError
+from .instrument import Instrument, Stats, StatsdInstrument
+from .sync import WatermarkStore, SyncResult
+from .writers import ParquetWriter, SqliteWriter
+from .archive import ArchiveFile, ArchiveWriter, open_archive
+from .resample import resample, Resampler, ResampledRow
+from .index import StationIndex, great_circle_distance
+from .pipeline import Pipeline, fetch_parsed
+from .watch import Watch, WatchScheduler
+from .clock import JST, jst_now, jst_today
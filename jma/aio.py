@@ -0,0 +1,215 @@
+import time
+
+from .core import (Jma, Station, InvalidBlockNo, InvalidPrecNo, BASE_URL, DATA_TYPE_HOURLY, DATA_TYPE_TEN_MINUTELY, DATA_TYPE_DAILY,
+                   DATA_TYPE_MONTHLY, DailyWeatherDataRow, MonthlyWeatherDataRow)
+from .instrument import url_kind
+from .parser import NUMBER_OF_HEADER_ROWS
+from .transport import (DEFAULT_TIMEOUT, DEFAULT_RETRIES, DEFAULT_BACKOFF, DEFAULT_MAX_BACKOFF, RETRYABLE_STATUS_CODES,
+                        TransportError, HTTPStatusError, retry_delay, _retry_after)
+
+# 同時に実行するリクエスト数
+DEFAULT_CONCURRENCY = 8
+
+
+class AsyncSingleFlight:
+    '''SingleFlightのasyncio版。同じkeyのコルーチンが実行中なら、その結果(か例外)を待って返す'''
+
+    def __init__(self):
+        # key -> 実行中の呼び出しのasyncio.Task
+        self._calls = {}
+
+    async def do(self, key, function):
+        '''functionはコルーチンを返す関数'''
+        import asyncio
+        task = self._calls.get(key)
+        if task is None:
+            # 呼び出しは別のタスクで実行し、最初に呼んだ側がキャンセルされても他の待っている側には結果を返す
+            task = self._calls[key] = asyncio.ensure_future(function())
+            task.add_done_callback(lambda task: self._done(key, task))
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # 待っている側がいなくても警告を出さない
+            task.exception()
+
+
+class AsyncJma:
+    '''asyncio版のJma
+
+    aiohttpが必要。リクエストはsemaphoreで同時実行数を制限し、
+    1つのClientSessionのコネクションプールを共有する。
+    page_cache(PageCache)はJmaと共有してもよい。
+    失敗したリクエストはTransportと同じ条件(retries、backoff、max_backoff)で再試行する。
+    '''
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, catalog=None, base_url=BASE_URL, parser=None,
+                 timeout=DEFAULT_TIMEOUT, instrument=None, page_cache=None, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF):
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError("AsyncJma requires aiohttp. Install it with `pip install jma[async]`.")
+        self._aiohttp = aiohttp
+        # URLの組み立てとHTMLの解析はJmaのものを使う
+        self._jma = Jma(catalog=catalog, base_url=base_url, parser=parser, instrument=instrument, page_cache=page_cache)
+        self.catalog = self._jma.catalog
+        self.page_cache = page_cache
+        self._flights = AsyncSingleFlight()
+        self.instrument = instrument
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _get(self, url):
+        if self.instrument is None:
+            return await self._load(url)
+        started = time.perf_counter()
+        try:
+            content = await self._load(url)
+        except Exception as e:
+            self.instrument.on_request(url_kind(url), url, 0, time.perf_counter() - started, None, e)
+            raise
+        self.instrument.on_request(url_kind(url), url, len(content), time.perf_counter() - started, None)
+        return content
+
+    async def _load(self, url):
+        import asyncio
+        # ClientSessionとSemaphoreはイベントループの中で作る
+        if self._session is None:
+            connector = self._aiohttp.TCPConnector(limit=self.concurrency)
+            timeout = self._aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1])
+            self._session = self._aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                async with self._semaphore:
+                    async with self._session.get(url) as response:
+                        if response.status == 200:
+                            return await response.read()
+                        if response.status not in RETRYABLE_STATUS_CODES or attempt >= self.retries:
+                            raise HTTPStatusError(url, response.status)
+                        retry_after = _retry_after(response)
+            except (self._aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # 本文の途中で接続が切れた場合(ClientPayloadError)も含む
+                if attempt >= self.retries:
+                    raise TransportError(url, e)
+            # 待っている間は他のリクエストに同時実行の枠を譲る
+            await asyncio.sleep(retry_delay(attempt, self.backoff, self.max_backoff, retry_after))
+            attempt += 1
+
+    async def _get_table(self, url, header_rows=NUMBER_OF_HEADER_ROWS):
+        '''Jma._get_tableと同じ'''
+        if self.page_cache is not None:
+            table_rows = self.page_cache.get(url)
+            if table_rows is not None:
+                return table_rows
+        return await self._flights.do(url, lambda: self._load_table(url, header_rows))
+
+    async def _load_table(self, url, header_rows):
+        content = await self._get(url)
+        table_rows = self._jma._parse_page(content, url, header_rows)
+        if self.page_cache is not None:
+            self.page_cache.put(url, table_rows, len(content))
+        return table_rows
+
+    async def _get_station_params(self, prec_no):
+        stations = self.catalog.get(prec_no)
+        if self.instrument is not None:
+            self.instrument.on_catalog(prec_no, stations is not None)
+        if stations is None:
+            url = self._jma._stations_url(prec_no)
+            content = await self._get(url)
+            stations = self._jma._parse_station_page(content, prec_no, url)
+            self.catalog.put(prec_no, stations)
+        return stations
+
+    async def get_prefectures(self):
+        content = await self._get(self._jma._prefectures_url())
+        for prefecture in self._jma._parse_prefectures(content):
+            yield prefecture
+
+    async def get_stations(self, prec_no):
+        for block_no, station_params in (await self._get_station_params(prec_no)).items():
+            yield Station(prec_no, block_no, self._jma, **station_params)
+
+    async def get_all_stations(self):
+        '''全国の地点のリスト。キャッシュに無い都府県の地点一覧は同時に取得する'''
+        import asyncio
+        prec_nos = [prefecture.prec_no async for prefecture in self.get_prefectures()]
+
+        async def params(prec_no):
+            try:
+                return await self._get_station_params(prec_no)
+            except InvalidPrecNo:
+                self.catalog.put(prec_no, {})
+                return {}
+
+        results = await asyncio.gather(*(params(prec_no) for prec_no in prec_nos))
+        return [Station(prec_no, block_no, self._jma, **station_params)
+                for prec_no, stations in zip(prec_nos, results) for block_no, station_params in stations.items()]
+
+    async def get_station(self, prec_no, block_no=None):
+        '''地点。get_station(block_no)のようにprec_noを省略してもよい'''
+        if block_no is None:
+            block_no = prec_no
+            prec_no = self.catalog.find(block_no)
+            if prec_no is None:
+                await self.get_all_stations()
+                prec_no = self.catalog.find(block_no)
+                if prec_no is None:
+                    raise InvalidBlockNo
+        station_params = (await self._get_station_params(prec_no)).get(block_no)
+        if station_params is None:
+            raise InvalidBlockNo
+        return Station(prec_no, block_no, self._jma, **station_params)
+
+    async def _get_data(self, prec_no, block_no, year, month, day, data_frequency):
+        self._jma._validate_date(year, month, day)
+        station = await self.get_station(prec_no, block_no)
+        url = self._jma._construct_url(prec_no, block_no, station.station_type, year, month, day, data_frequenry=data_frequency)
+        table_rows = await self._get_table(url)
+        return self._jma._rows(table_rows, data_frequency, station.station_type, year, month, day, url)
+
+    async def get_hourly_data(self, prec_no, block_no, year, month, day):
+        for row in await self._get_data(prec_no, block_no, year, month, day, DATA_TYPE_HOURLY):
+            yield row
+
+    async def get_ten_minutely_data(self, prec_no, block_no, year, month, day):
+        for row in await self._get_data(prec_no, block_no, year, month, day, DATA_TYPE_TEN_MINUTELY):
+            yield row
+
+    async def _get_summary(self, prec_no, block_no, year, month, data_frequency):
+        self._jma._validate_date(year, month or 1, 1)
+        station = await self.get_station(prec_no, block_no)
+        url = self._jma._construct_url(prec_no, block_no, station.station_type, year, month, None, data_frequenry=data_frequency)
+        return url, await self._get_table(url, header_rows=None)
+
+    async def get_daily_data(self, prec_no, block_no, year, month):
+        url, table_rows = await self._get_summary(prec_no, block_no, year, month, DATA_TYPE_DAILY)
+        for row in table_rows:
+            yield DailyWeatherDataRow(row, year, month, url)
+
+    async def get_monthly_data(self, prec_no, block_no, year):
+        url, table_rows = await self._get_summary(prec_no, block_no, year, None, DATA_TYPE_MONTHLY)
+        for row in table_rows:
+            yield MonthlyWeatherDataRow(row, year, url)
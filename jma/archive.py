@@ -0,0 +1,348 @@
+'''観測値を地点・年毎の固定長の列形式のファイルに保存するアーカイブ
+
+1時間毎と10分毎の観測値(COLUMN_SPECSの列)を対象にする。
+ファイルは1年分の記録の場所を作成時に確保し、i番目の記録の時刻は
+その年の1月1日0時 + (i + 1) * 観測の間隔 にする(24時の行はその日の記録)。
+時刻から記録の位置が決まるので、期間の読み出しはmmapの範囲をそのまま返す。
+
+    ヘッダ   HEADER、列の表(COLUMN)、文字列の列の語彙(JSON)
+    列       値(capacity個)と品質情報(capacity bytes)を列毎に並べる
+
+値はリトルエンディアンで、FLOATはfloat64(欠測はNaN)、INTはint32(欠測はINT_NULL)、
+STRとWEATHERは語彙の番号のuint8(欠測は0)にする。品質情報は")"か"]"の文字コードで、無ければ0。
+'''
+import datetime
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+
+from .columns import SCHEMAS, FLOAT, INT
+from .resample import STEPS
+from .storage import replacing
+
+MAGIC = b"JMAA"
+VERSION = 1
+FILE_EXTENSION = ".jmaa"
+
+# magic, version, ヘッダの大きさ, 頻度, 地点の種類, 年, 間隔(秒), 記録数, 書き込んだ記録数, 列数
+HEADER = struct.Struct("<4sHIB1sHIIIH")
+# 書き込んだ記録数の位置
+COUNT_OFFSET = 4 + 2 + 4 + 1 + 1 + 2 + 4 + 4
+# 列名, 型, 値の大きさ, 値の位置, 品質情報の位置
+COLUMN = struct.Struct("<32s1sBQQ")
+# 文字列の列の語彙(JSON)に確保する大きさ
+VOCABULARY_SIZE = 8192
+
+FREQUENCY_CODES = {"hourly": 1, "ten_minutely": 2}
+FREQUENCIES = {code: data_frequency for data_frequency, code in FREQUENCY_CODES.items()}
+
+# 値の型。memoryviewの形式と同じ文字にする
+KIND_FLOAT64 = b"d"
+KIND_INT32 = b"i"
+KIND_CATEGORY = b"B"
+KIND_SIZES = {KIND_FLOAT64: 8, KIND_INT32: 4, KIND_CATEGORY: 1}
+
+INT_NULL = -2 ** 31
+FLOAT_NULL = float("nan")
+# 1つの列の語彙の最大数(0は欠測)
+MAX_CATEGORIES = 255
+
+
+def _kind(kind):
+    if kind == FLOAT:
+        return KIND_FLOAT64
+    if kind == INT:
+        return KIND_INT32
+    return KIND_CATEGORY
+
+
+def _align(offset, size=8):
+    return (offset + size - 1) // size * size
+
+
+def archive_path(path, block_no, data_frequency, year):
+    '''pathの下の地点・年のファイル'''
+    return os.path.join(path, data_frequency, block_no, "{}{}".format(year, FILE_EXTENSION))
+
+
+class ArchiveFile:
+    '''地点・年毎のアーカイブのファイル
+
+    mmapで開き、viewは期間の値をコピーせずにmemoryviewで返す。
+    viewを使い終わる(releaseする)までcloseできない。
+    '''
+
+    def __init__(self, path, writable=False):
+        self.path = path
+        self.writable = writable
+        self._file = open(path, "r+b" if writable else "rb")
+        self._map = None
+        self._lock = threading.Lock()
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+            self._read_header()
+        except BaseException:
+            if self._map is not None:
+                self._map.close()
+            self._file.close()
+            raise
+
+    @classmethod
+    def create(cls, path, data_frequency, station_type, year):
+        '''1年分の記録を欠測で埋めたファイルを作り、書き込み用に開く'''
+        schema = SCHEMAS[(data_frequency, station_type)]
+        step = int(STEPS[data_frequency].total_seconds())
+        days = (datetime.date(year + 1, 1, 1) - datetime.date(year, 1, 1)).days
+        capacity = days * 24 * 60 * 60 // step
+
+        header_size = _align(HEADER.size + COLUMN.size * len(schema) + VOCABULARY_SIZE)
+        offset = header_size
+        columns = []
+        for name, kind in schema:
+            kind = _kind(kind)
+            values_offset = offset
+            quality_offset = values_offset + KIND_SIZES[kind] * capacity
+            offset = _align(quality_offset + capacity)
+            columns.append((name, kind, values_offset, quality_offset))
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with replacing(path) as tmp_path, open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, header_size, FREQUENCY_CODES[data_frequency], station_type.encode("ascii"),
+                                year, step, capacity, 0, len(columns)))
+            for name, kind, values_offset, quality_offset in columns:
+                f.write(COLUMN.pack(name.encode("ascii"), kind, KIND_SIZES[kind], values_offset, quality_offset))
+            f.write(json.dumps({}).encode("ascii").ljust(VOCABULARY_SIZE))
+            for name, kind, values_offset, quality_offset in columns:
+                f.seek(values_offset)
+                if kind == KIND_FLOAT64:
+                    f.write(struct.pack("<d", FLOAT_NULL) * capacity)
+                elif kind == KIND_INT32:
+                    f.write(struct.pack("<i", INT_NULL) * capacity)
+                else:
+                    f.write(bytes(capacity))
+                f.write(bytes(capacity))
+            f.truncate(offset)
+        return cls(path, writable=True)
+
+    def _read_header(self):
+        (magic, version, header_size, frequency, station_type, self.year, step, self.capacity, self.count,
+         number_of_columns) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a jma archive of version {}".format(self.path, VERSION))
+        self.data_frequency = FREQUENCIES[frequency]
+        self.station_type = station_type.decode("ascii")
+        self.step = datetime.timedelta(seconds=step)
+        self.origin = datetime.datetime(self.year, 1, 1)
+        # 列名 -> (型, 値の位置, 品質情報の位置)
+        self.columns = {}
+        for index in range(number_of_columns):
+            name, kind, size, values_offset, quality_offset = COLUMN.unpack_from(self._map, HEADER.size + COLUMN.size * index)
+            self.columns[name.rstrip(b"\0").decode("ascii")] = (kind, values_offset, quality_offset)
+        self._vocabulary_offset = HEADER.size + COLUMN.size * number_of_columns
+        self.vocabulary = json.loads(self._map[self._vocabulary_offset:self._vocabulary_offset + VOCABULARY_SIZE].decode("ascii"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return '<ArchiveFile>' + ', '.join("%s: %s" % item for item in (
+            ("path", self.path), ("data_frequency", self.data_frequency), ("station_type", self.station_type),
+            ("year", self.year), ("count", self.count)))
+
+    def __str__(self):
+        return self.__repr__()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            self._file.close()
+
+    def flush(self):
+        if self.writable:
+            self._map.flush()
+
+    def index(self, dt):
+        '''時刻dtの記録の番号'''
+        index, remainder = divmod(dt - self.origin, self.step)
+        if remainder or not 1 <= index <= self.capacity:
+            raise ValueError("{} is not a record time of {}".format(dt, self.path))
+        return index - 1
+
+    def dt(self, index):
+        '''index番目の記録の時刻'''
+        return self.origin + self.step * (index + 1)
+
+    def _range(self, start, end):
+        '''start < dt <= endの記録の番号の範囲。省略した側は書き込んだ記録の端まで
+
+        ページや集計の区間と同じく右閉じにして、1日は0時の翌記録から24時までにする。
+        '''
+        first = 0 if start is None else (start - self.origin) // self.step
+        last = self.count if end is None else (end - self.origin) // self.step
+        first = min(max(first, 0), self.count)
+        return first, min(max(last, first), self.count)
+
+    def view(self, name, start=None, end=None):
+        '''start < dt <= endの値のmemoryview(コピーしない)。欠測はNaN、INT_NULL、0'''
+        kind, values_offset, quality_offset = self.columns[name]
+        first, last = self._range(start, end)
+        size = KIND_SIZES[kind]
+        return memoryview(self._map)[values_offset + first * size:values_offset + last * size].cast(kind.decode("ascii"))
+
+    def quality_view(self, name, start=None, end=None):
+        '''start < dt <= endの品質情報のmemoryview(コピーしない)'''
+        kind, values_offset, quality_offset = self.columns[name]
+        first, last = self._range(start, end)
+        return memoryview(self._map)[quality_offset + first:quality_offset + last]
+
+    def datetimes(self, start=None, end=None):
+        '''start < dt <= endの記録の時刻のlist'''
+        first, last = self._range(start, end)
+        return [self.dt(index) for index in range(first, last)]
+
+    def values(self, name, start=None, end=None):
+        '''start < dt <= endの値のlist。欠測はNone、文字列の列は語彙の文字列にする'''
+        kind = self.columns[name][0]
+        view = self.view(name, start, end)
+        try:
+            if kind == KIND_FLOAT64:
+                return [None if math.isnan(value) else value for value in view]
+            if kind == KIND_INT32:
+                return [None if value == INT_NULL else value for value in view]
+            categories = self.vocabulary.get(name, [])
+            return [categories[value - 1] if value else None for value in view]
+        finally:
+            view.release()
+
+    def to_numpy(self, name, start=None, end=None):
+        '''viewと同じ範囲のnumpyの配列(コピーしない)'''
+        import numpy
+        kind, values_offset, quality_offset = self.columns[name]
+        first, last = self._range(start, end)
+        dtype = {KIND_FLOAT64: "<f8", KIND_INT32: "<i4", KIND_CATEGORY: "u1"}[kind]
+        return numpy.frombuffer(self._map, dtype=dtype, count=last - first, offset=values_offset + first * KIND_SIZES[kind])
+
+    def _category(self, name, value):
+        categories = self.vocabulary.setdefault(name, [])
+        try:
+            return categories.index(value) + 1
+        except ValueError:
+            pass
+        if len(categories) >= MAX_CATEGORIES:
+            raise ValueError("too many categories in {}".format(name))
+        categories.append(value)
+        data = json.dumps(self.vocabulary, ensure_ascii=True).encode("ascii")
+        if len(data) > VOCABULARY_SIZE:
+            categories.pop()
+            raise ValueError("vocabulary of {} is full".format(self.path))
+        self._map[self._vocabulary_offset:self._vocabulary_offset + VOCABULARY_SIZE] = data.ljust(VOCABULARY_SIZE)
+        return len(categories)
+
+    def write_row(self, row):
+        '''get_hourly_data/get_ten_minutely_dataの行(compactも可)を時刻の位置に書き込む
+
+        同じ時刻の記録は置き換える。書き込んだ記録数は書き込んだ最後の位置まで増やす。
+        '''
+        if not self.writable:
+            raise ValueError("{} is not opened for writing".format(self.path))
+        index = self.index(row.dt)
+        quality = row.quality or {}
+        with self._lock:
+            for name, (kind, values_offset, quality_offset) in self.columns.items():
+                value = getattr(row, name)
+                if kind == KIND_FLOAT64:
+                    # 数値にできなかった値は欠測にする
+                    if not isinstance(value, (int, float)) or isinstance(value, bool):
+                        value = FLOAT_NULL
+                    struct.pack_into("<d", self._map, values_offset + index * 8, value)
+                elif kind == KIND_INT32:
+                    if not isinstance(value, int) or isinstance(value, bool):
+                        value = INT_NULL
+                    struct.pack_into("<i", self._map, values_offset + index * 4, value)
+                else:
+                    # 雲量などの文字列の列は数値になっている場合がある
+                    self._map[values_offset + index] = 0 if value is None else self._category(name, str(value))
+                flag = quality.get(name)
+                self._map[quality_offset + index] = ord(flag) if flag is not None else 0
+            if index >= self.count:
+                self.count = index + 1
+                struct.pack_into("<I", self._map, COUNT_OFFSET, self.count)
+
+
+class ArchiveWriter:
+    '''行を地点・年毎のArchiveFileに書き込む
+
+    path/{data_frequency}/{block_no}/{year}.jmaa の構成にする。
+    ParquetWriter、SqliteWriterと同じく使える。書き込みはmmapに直接行い、flushでディスクに書く。
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        # (block_no, data_frequency, year) -> ArchiveFile
+        self._files = {}
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _file(self, station, data_frequency, year):
+        key = (station.block_no, data_frequency, year)
+        archive = self._files.get(key)
+        if archive is None:
+            path = archive_path(self.path, station.block_no, data_frequency, year)
+            if os.path.exists(path):
+                archive = ArchiveFile(path, writable=True)
+                if archive.station_type != station.station_type:
+                    archive.close()
+                    raise ValueError("{} has station type {}".format(path, archive.station_type))
+            else:
+                archive = ArchiveFile.create(path, data_frequency, station.station_type, year)
+            self._files[key] = archive
+        return archive
+
+    def write(self, station, data_frequency, rows):
+        '''get_hourly_data/get_ten_minutely_dataの行(compactも可)を書き込む'''
+        step = STEPS[data_frequency]
+        with self._lock:
+            archive = None
+            for row in rows:
+                # 24:00の行は前の年の記録
+                year = (row.dt - step).year
+                if archive is None or archive.year != year:
+                    archive = self._file(station, data_frequency, year)
+                archive.write_row(row)
+
+    def sink(self, station, data_frequency, date, rows):
+        '''WatermarkStoreのsinkに渡す。watermarkを進める前に書き込みを終える'''
+        self.write(station, data_frequency, rows)
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            for archive in self._files.values():
+                archive.flush()
+
+    def close(self):
+        with self._lock:
+            for archive in self._files.values():
+                archive.flush()
+                archive.close()
+            self._files.clear()
+
+
+def open_archive(path, block_no, data_frequency, year):
+    '''ArchiveWriterで書いた地点・年のファイルを読み込み用に開く'''
+    return ArchiveFile(archive_path(path, block_no, data_frequency, year))
@@ -0,0 +1,204 @@
+import collections
+import concurrent.futures
+import datetime
+import gzip
+import hashlib
+import os
+import threading
+import time
+import urllib.parse
+
+from .clock import jst_today
+from .storage import replacing
+
+# 当日のページの有効期間(秒)
+DEFAULT_TODAY_TTL = 10 * 60
+# 日付の無いページ(地点一覧など)の有効期間(秒)
+DEFAULT_TTL = 24 * 60 * 60
+# 前日以前でもこの日数以内のページは当日と同じく更新される可能性がある
+DEFAULT_SETTLE_DAYS = 1
+# メモリ上のキャッシュの上限(元のページのbytes数の合計)
+DEFAULT_PAGE_CACHE_BYTES = 256 * 1024 * 1024
+# メモリ上のキャッシュで過去の日付のページを持つ期間(秒)
+DEFAULT_HISTORY_TTL = 7 * 24 * 60 * 60
+
+
+def _page_date(url):
+    '''ページに含まれる最後の日。日毎のページは月末、月毎のページは年末'''
+    query = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+    try:
+        year = int(query["year"][0])
+        if "month" not in query:
+            return datetime.date(year, 12, 31)
+        month = int(query["month"][0])
+        if "day" not in query:
+            return datetime.date(year + month // 12, month % 12 + 1, 1) - datetime.timedelta(days=1)
+        return datetime.date(year, month, int(query["day"][0]))
+    except (KeyError, ValueError):
+        return None
+
+
+def _page_ttl(url, today_ttl, history_ttl, ttl, settle_days):
+    '''URLの有効期間(秒)。当日(とsettle_days日前まで)はtoday_ttl、それより前はhistory_ttl、日付の無いページはttl'''
+    date = _page_date(url)
+    if date is None:
+        return ttl
+    if date < jst_today() - datetime.timedelta(days=settle_days):
+        return history_ttl
+    return today_ttl
+
+
+def _complete_page(content):
+    '''観測値の表(#tablefix1)があり、最後まで読めたページか'''
+    return b"tablefix1" in content and content.rstrip()[-7:].lower() == b"</html>"
+
+
+class ResponseCache:
+    '''ページの内容をURL毎にgzipで保存するキャッシュ
+
+    過去の日付のページは変わらないので期限切れにしない。
+    当日(とsettle_days日前まで)のページはtoday_ttl秒、日付の無いページはttl秒で期限切れにする。
+    過去の日付でも観測値の表が無いか途中までのページ(メンテナンス中のページなど)はtoday_ttl秒で期限切れにする。
+    '''
+
+    def __init__(self, path, today_ttl=DEFAULT_TODAY_TTL, ttl=DEFAULT_TTL, settle_days=DEFAULT_SETTLE_DAYS):
+        self.path = path
+        self.today_ttl = today_ttl
+        self.ttl = ttl
+        self.settle_days = settle_days
+
+    def _file_path(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, key[:2], key + ".html.gz")
+
+    def ttl_for(self, url):
+        '''URLの有効期間(秒)。期限切れにしない場合はNone'''
+        return _page_ttl(url, self.today_ttl, None, self.ttl, self.settle_days)
+
+    def get(self, url, allow_stale=False):
+        '''キャッシュした内容を返す。無いか期限切れならNone'''
+        path = self._file_path(url)
+        try:
+            if not allow_stale:
+                ttl = self.ttl_for(url)
+                age = time.time() - os.path.getmtime(path)
+                if ttl is not None and age >= ttl:
+                    return None
+            with gzip.open(path, "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+        if not allow_stale and ttl is None and age >= self.today_ttl and not _complete_page(content):
+            return None
+        return content
+
+    def put(self, url, content):
+        path = self._file_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with replacing(path) as tmp_path:
+            with gzip.open(tmp_path, "wb") as f:
+                f.write(content)
+
+    def invalidate(self, url):
+        try:
+            os.remove(self._file_path(url))
+        except FileNotFoundError:
+            pass
+
+
+class PageCache:
+    '''解析したページ(表の行)をURL毎にメモリに持つLRUキャッシュ
+
+    元のページのbytes数の合計がmax_bytesを超えたら古く使ったものから捨てる。
+    当日(とsettle_days日前まで)のページはtoday_ttl秒、それより前のページはhistory_ttl秒、
+    日付の無いページはttl秒で期限切れにする。有効期間がNoneなら期限切れにしない。
+    複数のスレッドから使える。
+    '''
+
+    def __init__(self, max_bytes=DEFAULT_PAGE_CACHE_BYTES, today_ttl=DEFAULT_TODAY_TTL, history_ttl=DEFAULT_HISTORY_TTL,
+                 ttl=DEFAULT_TTL, settle_days=DEFAULT_SETTLE_DAYS):
+        self.max_bytes = max_bytes
+        self.today_ttl = today_ttl
+        self.history_ttl = history_ttl
+        self.ttl = ttl
+        self.settle_days = settle_days
+        # URL -> (期限(time.monotonic)かNone, bytes数, 値)。最後に使ったものが末尾
+        self._entries = collections.OrderedDict()
+        self.size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def ttl_for(self, url):
+        '''URLの有効期間(秒)。期限切れにしない場合はNone'''
+        return _page_ttl(url, self.today_ttl, self.history_ttl, self.ttl, self.settle_days)
+
+    def get(self, url):
+        '''キャッシュした値を返す。無いか期限切れならNone'''
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            expires, size, value = entry
+            if expires is not None and time.monotonic() >= expires:
+                self._remove(url)
+                return None
+            self._entries.move_to_end(url)
+            return value
+
+    def put(self, url, value, size):
+        '''sizeは値の大きさ(元のページのbytes数)。max_bytesより大きい値は持たない'''
+        ttl = self.ttl_for(url)
+        expires = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._remove(url)
+            if size > self.max_bytes:
+                return
+            self._entries[url] = (expires, size, value)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, url=None):
+        '''urlを省略した場合は全て捨てる'''
+        with self._lock:
+            if url is None:
+                self._entries.clear()
+                self.size = 0
+            else:
+                self._remove(url)
+
+    def _remove(self, url):
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+
+class SingleFlight:
+    '''同じkeyの呼び出しが実行中なら、実行せずにその結果(か例外)を待って返す'''
+
+    def __init__(self):
+        # key -> 実行中の呼び出しのFuture
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = concurrent.futures.Future()
+        if not leader:
+            return future.result()
+        try:
+            result = function()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
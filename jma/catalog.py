@@ -0,0 +1,103 @@
+import json
+import threading
+import time
+
+from .storage import params_from_json, params_to_json, write_json
+
+# 観測地点情報の有効期間(秒)
+DEFAULT_CATALOG_TTL = 24 * 60 * 60
+
+
+class StationCatalog:
+    '''観測地点情報のキャッシュ
+
+    prec_no毎にprefecture.phpの解析結果を保持する。
+    pathを指定した場合はJSONファイルにも保存し、プロセスをまたいで再利用する。
+    block_no -> prec_noの索引も持ち、prec_noが分からない地点も引ける。
+    '''
+
+    def __init__(self, ttl=DEFAULT_CATALOG_TTL, path=None):
+        self.ttl = ttl
+        self.path = path
+        # prec_no -> (取得時刻, {block_no: station_params})
+        self._entries = {}
+        # block_no -> prec_no
+        self._prec_nos = {}
+        self._lock = threading.RLock()
+        if path is not None:
+            self._load()
+
+    def get(self, prec_no):
+        '''有効期間内の地点情報を返す。無ければNone'''
+        with self._lock:
+            entry = self._entries.get(prec_no)
+            if entry is None:
+                return None
+            fetched_at, stations = entry
+            if self.ttl is not None and time.time() - fetched_at >= self.ttl:
+                return None
+            return stations
+
+    def find(self, block_no):
+        '''block_noの地点のprec_no。地点情報が無いか期限切れならNone'''
+        with self._lock:
+            prec_no = self._prec_nos.get(block_no)
+            if prec_no is None or self.get(prec_no) is None:
+                return None
+            return prec_no
+
+    def _index(self, prec_no, stations):
+        for block_no in stations:
+            self._prec_nos[block_no] = prec_no
+
+    def _unindex(self, prec_no):
+        entry = self._entries.get(prec_no)
+        if entry is None:
+            return
+        for block_no in entry[1]:
+            if self._prec_nos.get(block_no) == prec_no:
+                del self._prec_nos[block_no]
+
+    def put(self, prec_no, stations):
+        with self._lock:
+            self._unindex(prec_no)
+            self._entries[prec_no] = (time.time(), dict(stations))
+            self._index(prec_no, stations)
+            if self.path is not None:
+                self._save()
+
+    def invalidate(self, prec_no=None):
+        '''prec_noを指定しない場合は全て破棄する'''
+        with self._lock:
+            if prec_no is None:
+                self._entries.clear()
+                self._prec_nos.clear()
+            else:
+                self._unindex(prec_no)
+                self._entries.pop(prec_no, None)
+            if self.path is not None:
+                self._save()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for prec_no, entry in data.items():
+            stations = {}
+            for block_no, params in entry["stations"].items():
+                stations[block_no] = params_from_json(params)
+            self._entries[prec_no] = (entry["fetched_at"], stations)
+            self._index(prec_no, stations)
+
+    def _save(self):
+        data = {}
+        for prec_no, (fetched_at, stations) in self._entries.items():
+            serialized = {block_no: params_to_json(params) for block_no, params in stations.items()}
+            data[prec_no] = {"fetched_at": fetched_at, "stations": serialized}
+        write_json(self.path, data, ensure_ascii=False)
+
+
+# Jmaインスタンス間で共有するデフォルトのキャッシュ
+default_catalog = StationCatalog()
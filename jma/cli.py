@@ -0,0 +1,280 @@
+'''jmaコマンド
+
+    $ jma prefectures
+    $ jma stations --prec 51
+    $ jma download --prec 51 --block 47636 --from 2018-01-01 --to 2018-12-31 --freq hourly \
+          --format parquet --output data -j 8
+
+downloadは(地点, 日)毎に並列で取得し、書き込みを終えた日をチェックポイントのファイルに記録する。
+中断しても同じコマンドを実行すれば残りの日から続ける。
+'''
+import argparse
+import datetime
+import json
+import sys
+import threading
+import time
+
+from .clock import jst_today
+from .core import (Jma, _station_vars, BASE_URL, DATA_TYPE_HOURLY, DATA_TYPE_TEN_MINUTELY, InvalidBlockNo,
+                   InvalidPrecNo)
+from .parallel import fetch_many, RateLimiter, DEFAULT_RATE, DEFAULT_WORKERS
+from .storage import params_to_json, write_json
+from .transport import Transport
+
+FORMAT_PARQUET = "parquet"
+FORMAT_SQLITE = "sqlite"
+FORMAT_ARCHIVE = "archive"
+FORMATS = (FORMAT_PARQUET, FORMAT_SQLITE, FORMAT_ARCHIVE)
+
+# この日数(地点×日)毎に書き込んでチェックポイントを保存する
+DEFAULT_CHECKPOINT_EVERY = 100
+# 進捗を表示する間隔(秒)
+PROGRESS_INTERVAL = 0.5
+DATE_FORMAT = "%Y-%m-%d"
+
+
+class Checkpoint:
+    '''書き込みを終えた(地点, 頻度, 日)をJSONファイルに記録する'''
+
+    def __init__(self, path):
+        self.path = path
+        # "prec_no/block_no/data_frequency" -> 日付の文字列のset
+        self._done = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _key(self, station, data_frequency):
+        return "{}/{}/{}".format(station.prec_no, station.block_no, data_frequency)
+
+    def is_done(self, station, data_frequency, date):
+        with self._lock:
+            return date.strftime(DATE_FORMAT) in self._done.get(self._key(station, data_frequency), ())
+
+    def add(self, jobs):
+        '''jobs((station, date, data_frequency)のリスト)を記録して保存する'''
+        with self._lock:
+            for station, date, data_frequency in jobs:
+                self._done.setdefault(self._key(station, data_frequency), set()).add(date.strftime(DATE_FORMAT))
+            self._save()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._done = {key: set(dates) for key, dates in data.items()}
+
+    def _save(self):
+        data = {key: sorted(dates) for key, dates in self._done.items()}
+        write_json(self.path, data, sort_keys=True)
+
+
+class Progress:
+    '''取得した日数と行数、1秒あたりの数を表示する'''
+
+    def __init__(self, total, out=None, interval=PROGRESS_INTERVAL):
+        self.total = total
+        self.out = out
+        self.interval = interval
+        self.days = 0
+        self.rows = 0
+        self.errors = 0
+        self.started = time.monotonic()
+        self._shown = None
+
+    def update(self, rows=0, error=False):
+        self.days += 1
+        self.rows += rows
+        self.errors += error
+        now = time.monotonic()
+        if self._shown is None or now - self._shown >= self.interval:
+            self._shown = now
+            self._show("\r")
+
+    def finish(self):
+        self._show("\r")
+        if self.out is not None:
+            self.out.write("\n")
+            self.out.flush()
+
+    def _show(self, prefix):
+        if self.out is None:
+            return
+        seconds = max(time.monotonic() - self.started, 1e-9)
+        self.out.write("{}{}/{} days, {} rows, {} errors, {:.1f} days/s, {:.0f} rows/s".format(
+            prefix, self.days, self.total, self.rows, self.errors, self.days / seconds, self.rows / seconds))
+        self.out.flush()
+
+
+def _date(text):
+    try:
+        return datetime.datetime.strptime(text, DATE_FORMAT).date()
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid date: {} (expected YYYY-MM-DD)".format(text))
+
+
+def _new_jma(args):
+    rate_limiter = RateLimiter(args.rate) if args.rate > 0 else None
+    return Jma(base_url=args.base_url, rate_limiter=rate_limiter, transport=Transport(pool_size=args.jobs))
+
+
+def _station_json(station):
+    return params_to_json(_station_vars(station))
+
+
+def _dump(data, out):
+    json.dump(data, out, ensure_ascii=False, indent=2)
+    out.write("\n")
+
+
+def command_prefectures(args, out, err):
+    jma = Jma(base_url=args.base_url)
+    _dump([{"prec_no": prefecture.prec_no, "name": prefecture.name} for prefecture in jma.get_prefectures()], out)
+    return 0
+
+
+def _get_stations(jma, prec_no, block_nos=None):
+    '''指定された地点のリスト。存在しないprec_noやblock_noはUsageError'''
+    try:
+        if not block_nos:
+            return list(jma.get_stations(prec_no))
+        stations = []
+        for block_no in block_nos:
+            try:
+                stations.append(jma.get_station(prec_no, block_no))
+            except InvalidBlockNo:
+                raise UsageError("unknown --block {} in --prec {}".format(block_no, prec_no))
+        return stations
+    except InvalidPrecNo:
+        raise UsageError("unknown --prec {}".format(prec_no))
+
+
+def command_stations(args, out, err):
+    jma = Jma(base_url=args.base_url)
+    _dump([_station_json(station) for station in _get_stations(jma, args.prec)], out)
+    return 0
+
+
+def _new_writer(args):
+    # チェックポイントと揃えるため、書き込みはflushの時だけにする
+    batch_size = sys.maxsize
+    if args.format == FORMAT_PARQUET:
+        from .writers import ParquetWriter
+        return ParquetWriter(args.output, batch_size=batch_size)
+    if args.format == FORMAT_ARCHIVE:
+        from .archive import ArchiveWriter
+        return ArchiveWriter(args.output)
+    from .writers import SqliteWriter
+    return SqliteWriter(args.output, batch_size=batch_size)
+
+
+def command_download(args, out, err):
+    if args.end < args.start:
+        raise UsageError("--to must not be before --from")
+    # 当日以降のページはまだ完成していないので取得しない
+    yesterday = jst_today() - datetime.timedelta(days=1)
+    if args.start > yesterday:
+        raise UsageError("--from must not be after {}".format(yesterday))
+    end = min(args.end, yesterday)
+    if end < args.end:
+        err.write("--to is limited to {}\n".format(end))
+
+    jma = _new_jma(args)
+    stations = _get_stations(jma, args.prec, args.block)
+    checkpoint = Checkpoint(args.checkpoint or args.output.rstrip("/\\") + ".checkpoint.json")
+
+    jobs = []
+    date = args.start
+    while date <= end:
+        for station in stations:
+            # 観測が終了した後の日は取得しない
+            if station.observation_end_date is not None and date > station.observation_end_date:
+                continue
+            if not checkpoint.is_done(station, args.freq, date):
+                jobs.append((station, date, args.freq))
+        date += datetime.timedelta(days=1)
+
+    progress = Progress(len(jobs), None if args.quiet else err)
+    pending = []
+    failed = []
+    with _new_writer(args) as writer:
+        for result in fetch_many(jobs, workers=args.jobs, jma=jma):
+            station, date, data_frequency = result.job
+            if result.ok:
+                writer.write(station, data_frequency, result.rows)
+                pending.append(result.job)
+            else:
+                failed.append(result)
+            progress.update(len(result.rows) if result.ok else 0, not result.ok)
+            if len(pending) >= args.checkpoint_every:
+                writer.flush()
+                checkpoint.add(pending)
+                pending = []
+        writer.flush()
+        checkpoint.add(pending)
+    progress.finish()
+
+    for result in failed:
+        station, date, data_frequency = result.job
+        err.write("failed: {} {} {}: {!r}\n".format(station.block_no, date.strftime(DATE_FORMAT), data_frequency,
+                                                   result.error))
+    return 1 if failed else 0
+
+
+class UsageError(Exception):
+    "Invalid command line arguments"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="jma", description="気象庁の過去の気象データをダウンロードする")
+    parser.add_argument("--base-url", default=BASE_URL, help=argparse.SUPPRESS)
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("prefectures", help="都府県・地方の一覧をJSONで出力する")
+
+    stations = subparsers.add_parser("stations", help="地点の一覧をJSONで出力する")
+    stations.add_argument("--prec", required=True, help="prec_no")
+
+    download = subparsers.add_parser("download", help="観測値をParquetかSQLiteにダウンロードする")
+    download.add_argument("--prec", required=True, help="prec_no")
+    download.add_argument("--block", action="append", help="block_no (複数指定可。省略時は都府県の全地点)")
+    download.add_argument("--from", dest="start", type=_date, required=True, help="開始日 (YYYY-MM-DD)")
+    download.add_argument("--to", dest="end", type=_date, required=True, help="終了日 (YYYY-MM-DD)")
+    download.add_argument("--freq", choices=(DATA_TYPE_HOURLY, DATA_TYPE_TEN_MINUTELY), default=DATA_TYPE_HOURLY)
+    download.add_argument("--format", choices=FORMATS, default=FORMAT_PARQUET)
+    download.add_argument("--output", "-o", required=True, help="ParquetかArchiveのディレクトリか、SQLiteのファイル")
+    download.add_argument("--checkpoint", help="チェックポイントのファイル (default: OUTPUT.checkpoint.json)")
+    download.add_argument("--checkpoint-every", type=int, default=DEFAULT_CHECKPOINT_EVERY,
+                          help="書き込んでチェックポイントを保存する日数 (default: %(default)s)")
+    download.add_argument("-j", "--jobs", type=int, default=DEFAULT_WORKERS, help="並列数 (default: %(default)s)")
+    download.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                          help="1秒あたりのリクエスト数。0で制限しない (default: %(default)s)")
+    download.add_argument("--quiet", "-q", action="store_true", help="進捗を表示しない")
+    return parser
+
+
+COMMANDS = {
+    "prefectures": command_prefectures,
+    "stations": command_stations,
+    "download": command_download,
+}
+
+
+def main(argv=None, out=None, err=None):
+    out = out if out is not None else sys.stdout
+    err = err if err is not None else sys.stderr
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help(err)
+        return 2
+    try:
+        return COMMANDS[args.command](args, out, err)
+    except UsageError as e:
+        parser.error(str(e))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
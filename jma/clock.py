@@ -0,0 +1,15 @@
+'''JMAのページの日付は日本時間なので、「今日」や「今」は実行する環境のタイムゾーンによらず日本時間で決める'''
+import datetime
+
+# 日本標準時
+JST = datetime.timezone(datetime.timedelta(hours=9), "JST")
+
+
+def jst_now():
+    '''日本時間の現在の日時(行のdtと比べられるようにtzinfoは付けない)'''
+    return datetime.datetime.now(JST).replace(tzinfo=None)
+
+
+def jst_today():
+    '''日本時間の今日の日付'''
+    return jst_now().date()
@@ -0,0 +1,187 @@
+import array
+import collections
+import datetime
+
+from .core import WeatherDataRow, COLUMN_SPECS
+from .decoder import FLOAT, INT
+
+# (frequency, station_type) -> 1列目(時刻)以降の列の(名前, 型)
+SCHEMAS = {key: [(spec.name, spec.kind) for spec in specs] for key, specs in COLUMN_SPECS.items()}
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+_row = WeatherDataRow()
+
+
+class Column:
+    '''1列分の値と欠測のマスク
+
+    FLOAT, INTはarray.array、それ以外はlistに入れる。maskは値がある行が1。
+    qualityは品質情報(")"か"]")の文字コード、無ければ0。
+    '''
+
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        if kind == FLOAT:
+            self.values = array.array("d")
+        elif kind == INT:
+            self.values = array.array("q")
+        else:
+            self.values = []
+        self.mask = bytearray()
+        self.quality = bytearray()
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return '<Column>' + ', '.join("%s: %s" % item for item in (("name", self.name), ("kind", self.kind), ("length", len(self))))
+
+    def __str__(self):
+        return self.__repr__()
+
+    def _appender(self):
+        '''値を1つ追加する関数'''
+        append_value = self.values.append
+        append_mask = self.mask.append
+        if self.kind == FLOAT:
+            def append(value):
+                if value is None or isinstance(value, str):
+                    append_value(float("nan"))
+                    append_mask(0)
+                else:
+                    append_value(value)
+                    append_mask(1)
+        elif self.kind == INT:
+            def append(value):
+                if value is None or not isinstance(value, int):
+                    append_value(0)
+                    append_mask(0)
+                else:
+                    append_value(value)
+                    append_mask(1)
+        else:
+            def append(value):
+                append_value(value)
+                append_mask(0 if value is None else 1)
+        return append
+
+    def to_list(self):
+        '''欠測をNoneにしたlist'''
+        return [value if valid else None for value, valid in zip(self.values, self.mask)]
+
+    def quality_flags(self):
+        '''品質情報のlist。無い行はNone'''
+        return [chr(flag) if flag else None for flag in self.quality]
+
+    def to_numpy(self):
+        '''numpyのMaskedArray'''
+        import numpy
+        if self.kind in (FLOAT, INT):
+            data = numpy.frombuffer(self.values, dtype=numpy.float64 if self.kind == FLOAT else numpy.int64)
+        else:
+            data = numpy.array(self.values, dtype=object)
+        valid = numpy.frombuffer(bytes(self.mask), dtype=numpy.uint8).astype(bool)
+        return numpy.ma.MaskedArray(data, mask=~valid)
+
+
+class ColumnarData:
+    '''観測値を列毎にまとめたもの
+
+    行毎のオブジェクトを作らずに表のセルを列に直接入れる。
+    dtはエポック秒(JST)でdt列に入る。
+    '''
+
+    def __init__(self, data_frequency, station_type):
+        self.data_frequency = data_frequency
+        self.station_type = station_type
+        self.schema = SCHEMAS[(data_frequency, station_type)]
+        self.specs = COLUMN_SPECS[(data_frequency, station_type)]
+        self.dt = array.array("q")
+        self.columns = collections.OrderedDict((name, Column(name, kind)) for name, kind in self.schema)
+        # ページ毎の(URL, 行数)
+        self.pages = []
+        # 日付範囲で取得できなかった日
+        self.errors = collections.OrderedDict()
+
+    def __getstate__(self):
+        # 列の変換関数はpickleできないので、COLUMN_SPECSから戻す
+        state = dict(self.__dict__)
+        del state["specs"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.specs = COLUMN_SPECS[(self.data_frequency, self.station_type)]
+
+    def __len__(self):
+        return len(self.dt)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __repr__(self):
+        return '<ColumnarData>' + ', '.join("%s: %s" % item for item in (
+            ("data_frequency", self.data_frequency), ("station_type", self.station_type), ("length", len(self))))
+
+    def __str__(self):
+        return self.__repr__()
+
+    def extend(self, table_rows, year, month, day, url):
+        '''1ページ分の表の行を追加する'''
+        convert_weather_img = _row._convert_weather_img
+        day_seconds = int((datetime.datetime(year, month, day) - EPOCH).total_seconds())
+        appenders = [(index, spec.decode, self.columns[spec.name]._appender(), self.columns[spec.name].quality.append)
+                     for index, spec in enumerate(self.specs, start=1)]
+        number_of_columns = len(self.schema) + 1
+        append_dt = self.dt.append
+        count = 0
+        for cells in table_rows:
+            if len(cells) != number_of_columns:
+                continue
+            value = cells[0].text
+            if ":" in value:
+                hours, minutes = value.split(":")
+                append_dt(day_seconds + int(hours) * 3600 + int(minutes) * 60)
+            else:
+                append_dt(day_seconds + int(value) * 3600)
+            for index, decode, append, append_quality in appenders:
+                cell = cells[index]
+                if decode is None:
+                    append(convert_weather_img(cell))
+                    append_quality(0)
+                    continue
+                value, flag = decode(cell.text)
+                append(value)
+                append_quality(ord(flag) if flag is not None else 0)
+            count += 1
+        self.pages.append((url, count))
+
+    def datetimes(self):
+        '''dt列をdatetimeのlistにする'''
+        return [EPOCH + datetime.timedelta(seconds=seconds) for seconds in self.dt]
+
+    def to_numpy(self):
+        '''列名 -> numpyの配列。dtはdatetime64[s]'''
+        import numpy
+        arrays = collections.OrderedDict()
+        arrays["dt"] = numpy.frombuffer(self.dt, dtype=numpy.int64).astype("datetime64[s]")
+        for name, column in self.columns.items():
+            arrays[name] = column.to_numpy()
+        return arrays
+
+    def to_pandas(self):
+        '''pandasのDataFrame。欠測はNaN/None'''
+        import numpy
+        import pandas
+        data = collections.OrderedDict()
+        data["dt"] = pandas.to_datetime(numpy.frombuffer(self.dt, dtype=numpy.int64), unit="s")
+        for name, column in self.columns.items():
+            if column.kind == FLOAT:
+                data[name] = pandas.array(column.to_list(), dtype="Float64")
+            elif column.kind == INT:
+                data[name] = pandas.array(column.to_list(), dtype="Int64")
+            else:
+                data[name] = column.to_list()
+        return pandas.DataFrame(data)
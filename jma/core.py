@@ -1,41 +1,79 @@
-from requests_html import HTMLSession
 import urllib
 import re
 import datetime
+import collections
+import concurrent.futures
+import time
+
+from .cache import SingleFlight
+from .catalog import default_catalog
+from .clock import jst_today
+from .decoder import (ColumnSpec, FLOAT, INT, STR, WEATHER, sanitize, float_decoder, int_decoder, direction_decoder,
+                      code_decoder, minutes_decoder, text_decoder)
+from .instrument import url_kind, CACHE_HIT, CACHE_MISS
+from .parser import element_cells, get_parser, NUMBER_OF_HEADER_ROWS
+from .transport import Transport
 
 # 1時間毎の観測値のカラム数
 NUMBER_OF_COLUMNS_HOURLY_DATA_S = 17
 NUMBER_OF_COLUMNS_HOURLY_DATA_A = 8
 NUMBER_OF_COLUMNS_TEN_MINUTELY_DATA_S = 11
 NUMBER_OF_COLUMNS_TEN_MINUTELY_DATA_A = 8
+# 日毎の観測値のカラム数
+NUMBER_OF_COLUMNS_DAILY_DATA_S = 22
+NUMBER_OF_COLUMNS_DAILY_DATA_A = 16
+# 月毎の観測値のカラム数
+NUMBER_OF_COLUMNS_MONTHLY_DATA_S = 28
+NUMBER_OF_COLUMNS_MONTHLY_DATA_A = 20
 
 STATION_TYPE_S = "s"
 STATION_TYPE_A = "a"
 
 DATA_TYPE_HOURLY = "hourly"
 DATA_TYPE_TEN_MINUTELY = "ten_minutely"
+DATA_TYPE_DAILY = "daily"
+DATA_TYPE_MONTHLY = "monthly"
+
+BASE_URL = "http://www.data.jma.go.jp/obd/stats/etrn"
+
+# 列形式で返す場合のas_
+OUTPUT_COLUMNS = "columns"
+# __slots__の行で返す場合のas_
+OUTPUT_COMPACT = "compact"
+
+# 日付範囲の取得で先読みするページ数
+DEFAULT_PREFETCH = 4
+# 全国の地点一覧を同時に取得するページ数
+DEFAULT_CATALOG_WORKERS = 8
+
+def _station_vars(station):
+    '''StationやPrefectureの属性(取得に使うJmaを除く)'''
+    return {name: value for name, value in vars(station).items() if name != "_jma"}
 
-session = HTMLSession()
 
 class Prefecture:
-    def __init__(self, prec_no, name):
+    def __init__(self, prec_no, name, jma=None):
         self.prec_no = prec_no
         self.name = name
+        # get_stationsで使うJma。Noneなら既定の設定のJma
+        self._jma = jma
 
     def __repr__(self):
-        return '<Station>' + ', '.join("%s: %s" % item for item in vars(self).items())
+        return '<Station>' + ', '.join("%s: %s" % item for item in _station_vars(self).items())
 
     def __str__(self):
         return self.__repr__()
 
     def get_stations(self):
-        return Jma().get_stations(self.prec_no)
+        return (self._jma if self._jma is not None else Jma()).get_stations(self.prec_no)
 
 
 class Station:
-    def __init__(self, prec_no, block_no, **kwargs):
+    def __init__(self, prec_no, block_no, jma=None, **kwargs):
         self.prec_no = prec_no
         self.block_no = block_no
+        # get_hourly_dataなどで使うJma(このStationを返したもの)。Noneなら既定の設定のJma
+        self._jma = jma
 
         #kwargs
         self.name = kwargs['name']
@@ -56,16 +94,296 @@ class Station:
         self.longitude = float(self.longitude_degrees) + float(self.longitude_minutes) / 60
 
     def __repr__(self):
-        return '<Station>' + ', '.join("%s: %s" % item for item in vars(self).items())
+        return '<Station>' + ', '.join("%s: %s" % item for item in _station_vars(self).items())
 
     def __str__(self):
         return self.__repr__()
 
-    def get_hourly_data(self, year, month, day):
-        return Jma().get_hourly_data(self.prec_no, self.block_no, year, month, day)
-
-    def get_ten_minutely_data(self, year, month, day):
-        return Jma().get_ten_minutely_data(self.prec_no, self.block_no, year, month, day)
+    def _get_jma(self):
+        return self._jma if self._jma is not None else Jma()
+
+    def get_hourly_data(self, year, month, day, as_=None):
+        return self._get_jma().get_hourly_data(self.prec_no, self.block_no, year, month, day, as_=as_)
+
+    def get_ten_minutely_data(self, year, month, day, as_=None):
+        return self._get_jma().get_ten_minutely_data(self.prec_no, self.block_no, year, month, day, as_=as_)
+
+    def get_hourly_range(self, start, end, as_=None):
+        return self._get_jma().get_hourly_range(self.prec_no, self.block_no, start, end, as_=as_)
+
+    def get_ten_minutely_range(self, start, end, as_=None):
+        return self._get_jma().get_ten_minutely_range(self.prec_no, self.block_no, start, end, as_=as_)
+
+    def get_daily_data(self, year, month):
+        return self._get_jma().get_daily_data(self.prec_no, self.block_no, year, month)
+
+    def get_monthly_data(self, year):
+        return self._get_jma().get_monthly_data(self.prec_no, self.block_no, year)
+
+
+# (frequency, station_type) -> 1列目(時刻)以降の列
+COLUMN_SPECS = {
+    (DATA_TYPE_HOURLY, STATION_TYPE_S): [
+        # 気圧(hPa) 現地
+        ColumnSpec("air_pressure_spot", FLOAT, float_decoder()),
+        # 気圧(hPa) 海面
+        ColumnSpec("air_pressure_sea", FLOAT, float_decoder()),
+        # 降水量(mm)
+        ColumnSpec("precipitation", FLOAT, float_decoder()),
+        # 気温(度)
+        ColumnSpec("temperature", FLOAT, float_decoder()),
+        # 露点温度(度)
+        ColumnSpec("dew_point_temperature", FLOAT, float_decoder()),
+        # 蒸気圧(hPa)
+        ColumnSpec("vapor_pressure", FLOAT, float_decoder()),
+        # 湿度(%)
+        ColumnSpec("humidity", INT, int_decoder()),
+        # 風速
+        ColumnSpec("wind_speed", FLOAT, float_decoder()),
+        # 風向
+        ColumnSpec("wind_direction", STR, direction_decoder()),
+        # 日照時間(h)
+        ColumnSpec("daylight_hours", FLOAT, float_decoder()),
+        # 全天日射量(MJ/m2)
+        ColumnSpec("solar_irradiance", FLOAT, float_decoder()),
+        # 雪(降雪)
+        ColumnSpec("snowfall", INT, int_decoder()),
+        # 雪(積雪)
+        ColumnSpec("snow_cover", INT, int_decoder()),
+        # 天気
+        ColumnSpec("weather", WEATHER),
+        # 雲量
+        ColumnSpec("cloud_cover", STR, code_decoder()),
+        # 視程(km)
+        ColumnSpec("visibility", FLOAT, float_decoder()),
+    ],
+    (DATA_TYPE_HOURLY, STATION_TYPE_A): [
+        # 降水量(mm)
+        ColumnSpec("precipitation", FLOAT, float_decoder()),
+        # 気温(度)
+        ColumnSpec("temperature", FLOAT, float_decoder()),
+        # 風速
+        ColumnSpec("wind_speed", FLOAT, float_decoder()),
+        # 風向
+        ColumnSpec("wind_direction", STR, direction_decoder()),
+        # 日照時間(h)
+        ColumnSpec("daylight_hours", FLOAT, float_decoder()),
+        # 雪(降雪)
+        ColumnSpec("snowfall", INT, int_decoder()),
+        # 雪(積雪)
+        ColumnSpec("snow_cover", INT, int_decoder()),
+    ],
+    (DATA_TYPE_TEN_MINUTELY, STATION_TYPE_S): [
+        # 気圧(hPa) 現地
+        ColumnSpec("air_pressure_spot", FLOAT, float_decoder()),
+        # 気圧(hPa) 海面
+        ColumnSpec("air_pressure_sea", FLOAT, float_decoder()),
+        # 降水量(mm)
+        ColumnSpec("precipitation", FLOAT, float_decoder()),
+        # 気温(度)
+        ColumnSpec("temperature", FLOAT, float_decoder()),
+        # 相対湿度(%)
+        ColumnSpec("relative_humidity", INT, int_decoder()),
+        # 平均風速(m/s)
+        ColumnSpec("mean_wind_speed", FLOAT, float_decoder()),
+        # 平均風速（風向）
+        ColumnSpec("wind_direction", STR, direction_decoder()),
+        # 最大瞬間(m/s)
+        ColumnSpec("max_wind_speed", FLOAT, float_decoder()),
+        # 最大瞬間（風向）
+        ColumnSpec("max_wind_direction", STR, direction_decoder()),
+        # 日照時間（分）
+        ColumnSpec("daylight_minute", INT, minutes_decoder()),
+    ],
+    (DATA_TYPE_TEN_MINUTELY, STATION_TYPE_A): [
+        # 降水量(mm)
+        ColumnSpec("precipitation", FLOAT, float_decoder()),
+        # 気温(度)
+        ColumnSpec("temperature", FLOAT, float_decoder()),
+        # 平均風速(m/s)
+        ColumnSpec("mean_wind_speed", FLOAT, float_decoder()),
+        # 平均風速（風向）
+        ColumnSpec("wind_direction", STR, direction_decoder()),
+        # 最大瞬間(m/s)
+        ColumnSpec("max_wind_speed", FLOAT, float_decoder()),
+        # 最大瞬間（風向）
+        ColumnSpec("max_wind_direction", STR, direction_decoder()),
+        # 日照時間（分）
+        ColumnSpec("daylight_minute", INT, minutes_decoder()),
+    ],
+    (DATA_TYPE_DAILY, STATION_TYPE_S): [
+        # 気圧(hPa) 現地 平均
+        ColumnSpec("air_pressure_spot", FLOAT, float_decoder()),
+        # 気圧(hPa) 海面 平均
+        ColumnSpec("air_pressure_sea", FLOAT, float_decoder()),
+        # 降水量(mm) 合計
+        ColumnSpec("precipitation", FLOAT, float_decoder()),
+        # 降水量(mm) 最大1時間
+        ColumnSpec("max_precipitation_1h", FLOAT, float_decoder()),
+        # 降水量(mm) 最大10分間
+        ColumnSpec("max_precipitation_10min", FLOAT, float_decoder()),
+        # 気温(度) 平均
+        ColumnSpec("temperature", FLOAT, float_decoder()),
+        # 気温(度) 最高
+        ColumnSpec("max_temperature", FLOAT, float_decoder()),
+        # 気温(度) 最低
+        ColumnSpec("min_temperature", FLOAT, float_decoder()),
+        # 湿度(%) 平均
+        ColumnSpec("humidity", INT, int_decoder()),
+        # 湿度(%) 最小
+        ColumnSpec("min_humidity", INT, int_decoder()),
+        # 平均風速(m/s)
+        ColumnSpec("wind_speed", FLOAT, float_decoder()),
+        # 最大風速(m/s)
+        ColumnSpec("max_wind_speed", FLOAT, float_decoder()),
+        # 最大風速（風向）
+        ColumnSpec("max_wind_direction", STR, direction_decoder()),
+        # 最大瞬間風速(m/s)
+        ColumnSpec("max_instantaneous_wind_speed", FLOAT, float_decoder()),
+        # 最大瞬間風速（風向）
+        ColumnSpec("max_instantaneous_wind_direction", STR, direction_decoder()),
+        # 最多風向
+        ColumnSpec("most_frequent_wind_direction", STR, direction_decoder()),
+        # 日照時間(h)
+        ColumnSpec("daylight_hours", FLOAT, float_decoder()),
+        # 雪(降雪) 合計
+        ColumnSpec("snowfall", INT, int_decoder()),
+        # 雪(最深積雪)
+        ColumnSpec("max_snow_cover", INT, int_decoder()),
+        # 天気概況 昼(06:00-18:00)
+        ColumnSpec("weather_daytime", STR, text_decoder()),
+        # 天気概況 夜(18:00-翌日06:00)
+        ColumnSpec("weather_nighttime", STR, text_decoder()),
+    ],
+    (DATA_TYPE_DAILY, STATION_TYPE_A): [
+        # 降水量(mm) 合計
+        ColumnSpec("precipitation", FLOAT, float_decoder()),
+        # 降水量(mm) 最大1時間
+        ColumnSpec("max_precipitation_1h", FLOAT, float_decoder()),
+        # 降水量(mm) 最大10分間
+        ColumnSpec("max_precipitation_10min", FLOAT, float_decoder()),
+        # 気温(度) 平均
+        ColumnSpec("temperature", FLOAT, float_decoder()),
+        # 気温(度) 最高
+        ColumnSpec("max_temperature", FLOAT, float_decoder()),
+        # 気温(度) 最低
+        ColumnSpec("min_temperature", FLOAT, float_decoder()),
+        # 平均風速(m/s)
+        ColumnSpec("wind_speed", FLOAT, float_decoder()),
+        # 最大風速(m/s)
+        ColumnSpec("max_wind_speed", FLOAT, float_decoder()),
+        # 最大風速（風向）
+        ColumnSpec("max_wind_direction", STR, direction_decoder()),
+        # 最大瞬間風速(m/s)
+        ColumnSpec("max_instantaneous_wind_speed", FLOAT, float_decoder()),
+        # 最大瞬間風速（風向）
+        ColumnSpec("max_instantaneous_wind_direction", STR, direction_decoder()),
+        # 最多風向
+        ColumnSpec("most_frequent_wind_direction", STR, direction_decoder()),
+        # 日照時間(h)
+        ColumnSpec("daylight_hours", FLOAT, float_decoder()),
+        # 雪(降雪) 合計
+        ColumnSpec("snowfall", INT, int_decoder()),
+        # 雪(最深積雪)
+        ColumnSpec("max_snow_cover", INT, int_decoder()),
+    ],
+    (DATA_TYPE_MONTHLY, STATION_TYPE_S): [
+        # 気圧(hPa) 現地 平均
+        ColumnSpec("air_pressure_spot", FLOAT, float_decoder()),
+        # 気圧(hPa) 海面 平均
+        ColumnSpec("air_pressure_sea", FLOAT, float_decoder()),
+        # 降水量(mm) 合計
+        ColumnSpec("precipitation", FLOAT, float_decoder()),
+        # 降水量(mm) 日最大
+        ColumnSpec("max_daily_precipitation", FLOAT, float_decoder()),
+        # 降水量(mm) 最大1時間
+        ColumnSpec("max_precipitation_1h", FLOAT, float_decoder()),
+        # 降水量(mm) 最大10分間
+        ColumnSpec("max_precipitation_10min", FLOAT, float_decoder()),
+        # 気温(度) 日平均の平均
+        ColumnSpec("temperature", FLOAT, float_decoder()),
+        # 気温(度) 日最高の平均
+        ColumnSpec("mean_max_temperature", FLOAT, float_decoder()),
+        # 気温(度) 日最低の平均
+        ColumnSpec("mean_min_temperature", FLOAT, float_decoder()),
+        # 気温(度) 最高
+        ColumnSpec("max_temperature", FLOAT, float_decoder()),
+        # 気温(度) 最低
+        ColumnSpec("min_temperature", FLOAT, float_decoder()),
+        # 湿度(%) 平均
+        ColumnSpec("humidity", INT, int_decoder()),
+        # 湿度(%) 最小
+        ColumnSpec("min_humidity", INT, int_decoder()),
+        # 平均風速(m/s)
+        ColumnSpec("wind_speed", FLOAT, float_decoder()),
+        # 最大風速(m/s)
+        ColumnSpec("max_wind_speed", FLOAT, float_decoder()),
+        # 最大風速（風向）
+        ColumnSpec("max_wind_direction", STR, direction_decoder()),
+        # 最大瞬間風速(m/s)
+        ColumnSpec("max_instantaneous_wind_speed", FLOAT, float_decoder()),
+        # 最大瞬間風速（風向）
+        ColumnSpec("max_instantaneous_wind_direction", STR, direction_decoder()),
+        # 日照時間(h)
+        ColumnSpec("daylight_hours", FLOAT, float_decoder()),
+        # 全天日射量(MJ/m2) 日平均
+        ColumnSpec("solar_irradiance", FLOAT, float_decoder()),
+        # 雪(降雪) 合計
+        ColumnSpec("snowfall", INT, int_decoder()),
+        # 雪(降雪) 日合計の最大
+        ColumnSpec("max_daily_snowfall", INT, int_decoder()),
+        # 雪(最深積雪)
+        ColumnSpec("max_snow_cover", INT, int_decoder()),
+        # 雲量 平均
+        ColumnSpec("cloud_cover", FLOAT, float_decoder()),
+        # 雪日数
+        ColumnSpec("snow_days", INT, int_decoder()),
+        # 霧日数
+        ColumnSpec("fog_days", INT, int_decoder()),
+        # 雷日数
+        ColumnSpec("thunder_days", INT, int_decoder()),
+    ],
+    (DATA_TYPE_MONTHLY, STATION_TYPE_A): [
+        # 降水量(mm) 合計
+        ColumnSpec("precipitation", FLOAT, float_decoder()),
+        # 降水量(mm) 日最大
+        ColumnSpec("max_daily_precipitation", FLOAT, float_decoder()),
+        # 降水量(mm) 最大1時間
+        ColumnSpec("max_precipitation_1h", FLOAT, float_decoder()),
+        # 降水量(mm) 最大10分間
+        ColumnSpec("max_precipitation_10min", FLOAT, float_decoder()),
+        # 気温(度) 日平均の平均
+        ColumnSpec("temperature", FLOAT, float_decoder()),
+        # 気温(度) 日最高の平均
+        ColumnSpec("mean_max_temperature", FLOAT, float_decoder()),
+        # 気温(度) 日最低の平均
+        ColumnSpec("mean_min_temperature", FLOAT, float_decoder()),
+        # 気温(度) 最高
+        ColumnSpec("max_temperature", FLOAT, float_decoder()),
+        # 気温(度) 最低
+        ColumnSpec("min_temperature", FLOAT, float_decoder()),
+        # 平均風速(m/s)
+        ColumnSpec("wind_speed", FLOAT, float_decoder()),
+        # 最大風速(m/s)
+        ColumnSpec("max_wind_speed", FLOAT, float_decoder()),
+        # 最大風速（風向）
+        ColumnSpec("max_wind_direction", STR, direction_decoder()),
+        # 最大瞬間風速(m/s)
+        ColumnSpec("max_instantaneous_wind_speed", FLOAT, float_decoder()),
+        # 最大瞬間風速（風向）
+        ColumnSpec("max_instantaneous_wind_direction", STR, direction_decoder()),
+        # 最多風向
+        ColumnSpec("most_frequent_wind_direction", STR, direction_decoder()),
+        # 日照時間(h)
+        ColumnSpec("daylight_hours", FLOAT, float_decoder()),
+        # 雪(降雪) 合計
+        ColumnSpec("snowfall", INT, int_decoder()),
+        # 雪(降雪) 日合計の最大
+        ColumnSpec("max_daily_snowfall", INT, int_decoder()),
+        # 雪(最深積雪)
+        ColumnSpec("max_snow_cover", INT, int_decoder()),
+    ],
+}
 
 
 class WeatherDataRow:
@@ -78,54 +396,12 @@ class WeatherDataRow:
 
     def _sanitize(self, value):
         '''値の処理'''
-        # http://www.data.jma.go.jp/obd/stats/data/mdrr/man/remark.html
-        direction_mapping = {
-            '北': 'N',
-            '東': 'E',
-            '南': 'S',
-            '西': 'W',
-            '北東': 'NE',
-            '南東': 'SE',
-            '南西': 'SW',
-            '北西': 'NW',
-            '北北東': 'NNE',
-            '東南東': 'ESE',
-            '南南西': 'SSW',
-            '西北西': 'WNW',
-            '東北東': 'ENE',
-            '南南東': 'SSE',
-            '西南西': 'WSW',
-            '北北西': 'NNW',
-            '静穏': None
-        }
-        if value == '--':
-            return None
-        if value == '///':
-            return None
-        if value == '':
-            return None
-        if value == '#':
-            return None
-        if value in direction_mapping:
-            return direction_mapping[value]
-        if '×' in value:
-            return None
-        if '.' in value:
-            if ']' in value:
-                return float(value.replace(']',''))
-            elif ')' in value:
-                return float(value.replace(')',''))
-            else:
-                return float(value)
-        try:
-            return int(value)
-        except ValueError:
-            return value
+        return sanitize(value)
 
     def _convert_weather_img(self, column):
-        if len(column.find("img")) == 1:
-            return column.find("img", first=True).attrs["alt"]
-        if len(column.find("img")) == 0:
+        if len(column.alts) == 1:
+            return column.alts[0]
+        if len(column.alts) == 0:
             return None
         raise WeatherImageConvertError
 
@@ -136,140 +412,240 @@ class WeatherDataRow:
             dt += datetime.timedelta(hours=int(value))
         return dt
 
+    def _decode(self, columns, data_frequency, station_type, url, time_name, time_value):
+        '''COLUMN_SPECSの列を属性にする
+
+        1列目の時刻(日付)はtime_nameの属性にする。
+        qualityは品質情報(")"か"]")の付いた列の{列名: 品質情報}。無ければNone。
+        '''
+        self.type = station_type
+        self.url = url
+        values = self.__dict__
+        values[time_name] = time_value
+        quality = None
+        for spec, column in zip(COLUMN_SPECS[(data_frequency, station_type)], columns[1:]):
+            if spec.decode is None:
+                values[spec.name] = self._convert_weather_img(column)
+                continue
+            value, flag = spec.decode(column.text)
+            values[spec.name] = value
+            if flag is not None:
+                if quality is None:
+                    quality = {}
+                quality[spec.name] = flag
+        self.quality = quality
+
+
+def _row_values(row):
+    '''行の観測値(時刻と品質情報を除く)。compactの行も可'''
+    if isinstance(row, tuple):
+        return row[2:-1]
+    return [value for name, value in vars(row).items() if name not in ("type", "url", "dt", "date", "quality")]
+
 
 class HourlyWeatherDataRow(WeatherDataRow):
 
     def __init__(self, row, year, month, day, url):
-        columns = row.find("td")
-        dt = self._parse_time_value(datetime.datetime(year, month, day), columns[0].text)
-
+        # rowはCellのリストかrequests_htmlのtr要素
+        columns = row if isinstance(row, list) else element_cells(row)
         if len(columns) == NUMBER_OF_COLUMNS_HOURLY_DATA_S:
-            # station_type = "s"
-            self.type = STATION_TYPE_S
-            # url
-            self.url = url
-
-            ### data ###
-            # 時
-            self.dt = dt
-            # 気圧(hPa) 現地
-            self.air_pressure_spot = self._sanitize(columns[1].text)
-            # 気圧(hPa) 海面
-            self.air_pressure_sea = self._sanitize(columns[2].text)
-            # 降水量(mm)
-            self.precipitation = self._sanitize(columns[3].text)
-            # 気温(度)
-            self.temperature = self._sanitize(columns[4].text)
-            # 露点温度(度)
-            self.dew_point_temperature = self._sanitize(columns[5].text)
-            # 蒸気圧(hPa)
-            self.vapor_pressure = self._sanitize(columns[6].text)
-            # 湿度(%)
-            self.humidity = self._sanitize(columns[7].text)
-            # 風速
-            self.wind_speed = self._sanitize(columns[8].text)
-            # 風向
-            self.wind_direction = self._sanitize(columns[9].text)
-            # 日照時間(h)
-            self.daylight_hours = self._sanitize(columns[10].text)
-            # 全天日射量(MJ/m2)
-            self.solar_irradiance = self._sanitize(columns[11].text)
-            # 雪(降雪)
-            self.snowfall = self._sanitize(columns[12].text)
-            # 雪(積雪)
-            self.snow_cover = self._sanitize(columns[13].text)
-            # 天気
-            self.weather = self._convert_weather_img(columns[14])
-            # 雲量
-            self.cloud_cover = self._sanitize(columns[15].text)
-            # 視程(km)
-            self.visibility = self._sanitize(columns[16].text)
+            station_type = STATION_TYPE_S
         elif len(columns) == NUMBER_OF_COLUMNS_HOURLY_DATA_A:
-            # station_type = "a"
-            self.type = STATION_TYPE_A
-            # url
-            self.url = url
-
-            ### data ###
-            # 時
-            self.dt = dt
-            # 降水量(mm)
-            self.precipitation = self._sanitize(columns[1].text)
-            # 気温(度)
-            self.temperature = self._sanitize(columns[2].text)
-            # 風速
-            self.wind_speed = self._sanitize(columns[3].text)
-            # 風向
-            self.wind_direction = self._sanitize(columns[4].text)
-            # 日照時間(h)
-            self.daylight_hours = self._sanitize(columns[5].text)
-            # 雪(降雪)
-            self.snowfall = self._sanitize(columns[6].text)
-            # 雪(積雪)
-            self.snow_cover = self._sanitize(columns[7].text)
+            station_type = STATION_TYPE_A
+        else:
+            return
+        dt = self._parse_time_value(datetime.datetime(year, month, day), columns[0].text)
+        self._decode(columns, DATA_TYPE_HOURLY, station_type, url, "dt", dt)
 
 
 class TenMinutelyWeatherDataRow(WeatherDataRow):
 
     def __init__(self, row, year, month, day, url):
-        columns = row.find("td")
-        dt = self._parse_time_value(datetime.datetime(year, month, day), columns[0].text)
-
+        # rowはCellのリストかrequests_htmlのtr要素
+        columns = row if isinstance(row, list) else element_cells(row)
         if len(columns) == NUMBER_OF_COLUMNS_TEN_MINUTELY_DATA_S:
-            # station_type = "s""
-            self.type = STATION_TYPE_S
-            # url
-            self.url = url
-            ### data ###
-            # 時分
-            self.dt = dt
-            # 気圧(hPa) 現地
-            self.air_pressure_spot = self._sanitize(columns[1].text)
-            # 気圧(hPa) 海面
-            self.air_pressure_sea = self._sanitize(columns[2].text)
-            # 降水量(mm)
-            self.precipitation = self._sanitize(columns[3].text)
-            # 気温(度)
-            self.temperature = self._sanitize(columns[4].text)
-            # 相対湿度(%)
-            self.relative_humidity = self._sanitize(columns[5].text)
-            # 平均風速(m/s)
-            self.mean_wind_speed = self._sanitize(columns[6].text)
-            # 平均風速（風向）
-            self.wind_direction = self._sanitize(columns[7].text)
-            # 最大瞬間(m/s)
-            self.max_wind_speed = self._sanitize(columns[8].text)
-            # 最大瞬間（風向）
-            self.max_wind_direction = self._sanitize(columns[9].text)
-            # 日照時間（分）
-            self.daylight_minute = self._sanitize(columns[10].text)
+            station_type = STATION_TYPE_S
         elif len(columns) == NUMBER_OF_COLUMNS_TEN_MINUTELY_DATA_A:
-            # station_type = "a"
-            self.type = STATION_TYPE_A
-            # url
-            self.url = url
-
-            ### data ###
-            # 時分
-            self.dt = dt
-            # 降水量(mm)
-            self.precipitation = self._sanitize(columns[1].text)
-            # 気温(度)
-            self.temperature = self._sanitize(columns[2].text)
-            # 平均風速(m/s)
-            self.mean_wind_speed = self._sanitize(columns[3].text)
-            # 平均風速（風向）
-            self.wind_direction = self._sanitize(columns[4].text)
-            # 最大瞬間(m/s)
-            self.max_wind_speed = self._sanitize(columns[5].text)
-            # 最大瞬間（風向）
-            self.max_wind_direction = self._sanitize(columns[6].text)
-            # 日照時間（分）
-            self.daylight_minute = self._sanitize(columns[7].text)
+            station_type = STATION_TYPE_A
+        else:
+            return
+        dt = self._parse_time_value(datetime.datetime(year, month, day), columns[0].text)
+        self._decode(columns, DATA_TYPE_TEN_MINUTELY, station_type, url, "dt", dt)
+
+
+class DailyWeatherDataRow(WeatherDataRow):
+    '''日毎の値。1列目の日はdate(datetime.date)にする'''
+
+    def __init__(self, row, year, month, url):
+        columns = row if isinstance(row, list) else element_cells(row)
+        if len(columns) == NUMBER_OF_COLUMNS_DAILY_DATA_S:
+            station_type = STATION_TYPE_S
+        elif len(columns) == NUMBER_OF_COLUMNS_DAILY_DATA_A:
+            station_type = STATION_TYPE_A
+        else:
+            return
+        date = datetime.date(year, month, int(columns[0].text))
+        self._decode(columns, DATA_TYPE_DAILY, station_type, url, "date", date)
+
+
+class MonthlyWeatherDataRow(WeatherDataRow):
+    '''月毎の値。1列目の月はdate(その月の1日)にする'''
+
+    def __init__(self, row, year, url):
+        columns = row if isinstance(row, list) else element_cells(row)
+        if len(columns) == NUMBER_OF_COLUMNS_MONTHLY_DATA_S:
+            station_type = STATION_TYPE_S
+        elif len(columns) == NUMBER_OF_COLUMNS_MONTHLY_DATA_A:
+            station_type = STATION_TYPE_A
+        else:
+            return
+        date = datetime.date(year, int(columns[0].text), 1)
+        self._decode(columns, DATA_TYPE_MONTHLY, station_type, url, "date", date)
+
+
+ROW_CLASSES = {
+    DATA_TYPE_HOURLY: HourlyWeatherDataRow,
+    DATA_TYPE_TEN_MINUTELY: TenMinutelyWeatherDataRow,
+}
+
+
+class DateRangeData:
+    '''日付範囲の観測値
+
+    iterすると行を時系列順に返す。ページの取得は先読みしておく。
+    取得できなかった日はerrorsに日付毎の例外として記録し、残りの日の処理を続ける。
+    '''
+
+    def __init__(self, jma, station, start, end, data_frequency, prefetch=DEFAULT_PREFETCH, as_=None):
+        if isinstance(start, datetime.datetime):
+            start = start.date()
+        if isinstance(end, datetime.datetime):
+            end = end.date()
+        self.jma = jma
+        self.station = station
+        self.start = start
+        self.end = end
+        self.data_frequency = data_frequency
+        self.prefetch = prefetch
+        self.as_ = as_
+        # 全日分のURLを先に作っておく
+        self.urls = collections.OrderedDict()
+        date = start
+        while date <= end:
+            self.urls[date] = jma._construct_url(station.prec_no, station.block_no, station.station_type,
+                                                 date.year, date.month, date.day, data_frequenry=data_frequency)
+            date += datetime.timedelta(days=1)
+        self.errors = collections.OrderedDict()
+
+    def _tables(self):
+        '''取得できた日の(日付, URL, 表の行)を日付順に返す'''
+        today = jst_today()
+        urls = iter(self.urls.items())
+        queue = collections.deque()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.prefetch) as executor:
+            def fill():
+                while len(queue) < self.prefetch:
+                    item = next(urls, None)
+                    if item is None:
+                        return
+                    date, url = item
+                    # 未来の日付は取得しない
+                    future = None if date > today else executor.submit(self.jma._get_table, url)
+                    queue.append((date, url, future))
+
+            fill()
+            while queue:
+                date, url, future = queue.popleft()
+                fill()
+                if future is None:
+                    self.errors[date] = FutureDateError()
+                    continue
+                try:
+                    table_rows = future.result()
+                except Exception as e:
+                    self.errors[date] = e
+                    continue
+                yield date, url, table_rows
+
+    def __iter__(self):
+        for date, url, table_rows in self._tables():
+            yield from self.jma._rows(table_rows, self.data_frequency, self.station.station_type,
+                                      date.year, date.month, date.day, url, self.as_)
+
+    def to_columns(self):
+        '''全日分を列形式のColumnarDataにする'''
+        from .columns import ColumnarData
+        columns = ColumnarData(self.data_frequency, self.station.station_type)
+        for date, url, table_rows in self._tables():
+            self.jma._extend_columns(columns, table_rows, date.year, date.month, date.day, url)
+        columns.errors = self.errors
+        return columns
+
+    def resample(self, window, how, completeness=None, fill=None, rolling=None):
+        '''windowの区間毎に集計したResampledRowを返す。引数はjma.resample.Resamplerと同じ'''
+        from .resample import Resampler, DEFAULT_COMPLETENESS
+        if completeness is None:
+            completeness = DEFAULT_COMPLETENESS
+        return Resampler(self.data_frequency, window, how, completeness, fill, rolling).resample(self)
 
 
 class Jma:
 
+    def __init__(self, catalog=None, base_url=BASE_URL, rate_limiter=None, parser=None, cache=None, offline=False,
+                 transport=None, instrument=None, page_cache=None, streaming=False):
+        # 観測地点情報のキャッシュ
+        self.catalog = catalog if catalog is not None else default_catalog
+        # HTMLのパーサ
+        self.parser = get_parser(parser)
+        self.base_url = base_url
+        # HTTPの取得
+        self.transport = transport if transport is not None else Transport()
+        # リクエスト数の制限
+        self.rate_limiter = rate_limiter
+        # ページのキャッシュ(ResponseCache)。offlineの場合はキャッシュだけを使う
+        self.cache = cache
+        self.offline = offline
+        if offline and cache is None:
+            raise ValueError("offline mode requires a cache")
+        # 計測のイベントを受け取るInstrument。Noneの場合は計測しない
+        self.instrument = instrument
+        # 解析したページのメモリ上のキャッシュ(PageCache)
+        self.page_cache = page_cache
+        # 同じURLを同時に取得する場合は1回だけ取得して解析する
+        self._flights = SingleFlight()
+        # 1時間毎と10分毎の観測値のページを読みながら解析し、行ができ次第返す。
+        # キャッシュと計測を使う場合はページを全て読んでから解析する
+        self.streaming = streaming
+
+    def _load(self, url, use_cache=True):
+        '''(ページの内容, キャッシュの結果)'''
+        if self.cache is None or not use_cache:
+            return self.transport.get(url, rate_limiter=self.rate_limiter), None
+        # オフラインの場合は期限切れでも使う
+        content = self.cache.get(url, allow_stale=self.offline)
+        if content is not None:
+            return content, CACHE_HIT
+        if self.offline:
+            raise CacheMissError(url)
+        content = self.transport.get(url, rate_limiter=self.rate_limiter)
+        self.cache.put(url, content)
+        return content, CACHE_MISS
+
+    def _get(self, url, use_cache=True):
+        '''ページの内容(bytes)。use_cacheがFalseならキャッシュを読み書きせずに取得する'''
+        if self.instrument is None:
+            return self._load(url, use_cache)[0]
+        started = time.perf_counter()
+        try:
+            content, cache = self._load(url, use_cache)
+        except Exception as e:
+            cache = None if self.cache is None or not use_cache else CACHE_MISS
+            self.instrument.on_request(url_kind(url), url, 0, time.perf_counter() - started, cache, e)
+            raise
+        self.instrument.on_request(url_kind(url), url, len(content), time.perf_counter() - started, cache)
+        return content
+
     def _observation_end_date(self, year, month, day):
         if year == '9999' or month == '99' or day == '99':
             return None
@@ -338,6 +714,12 @@ class Jma:
         block_no = parsed_query["block_no"][0]
         return block_no
 
+    def _extract_prec_no_and_block_no(self, url):
+        '''URLを1回だけ解析して(prec_no, block_no)を返す。block_noが無ければNone'''
+        parsed_query = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+        block_no = parsed_query.get("block_no")
+        return parsed_query["prec_no"][0], block_no[0] if block_no else None
+
     def _construct_url(self, prec_no, block_no, station_type, year, month, day, data_frequenry=None):
         if data_frequenry == "hourly":
             params = {
@@ -348,7 +730,7 @@ class Jma:
                 "day": day
             }
             query = urllib.parse.urlencode(params)
-            url = "http://www.data.jma.go.jp/obd/stats/etrn/view/hourly_{}1.php?".format(station_type) + query
+            url = self.base_url + "/view/hourly_{}1.php?".format(station_type) + query
             return url
         if data_frequenry == "ten_minutely":
             params = {
@@ -359,89 +741,349 @@ class Jma:
                 "day": day
             }
             query = urllib.parse.urlencode(params)
-            url = "http://www.data.jma.go.jp/obd/stats/etrn/view/10min_{}1.php?".format(station_type) + query
+            url = self.base_url + "/view/10min_{}1.php?".format(station_type) + query
+            return url
+        if data_frequenry == "daily":
+            params = {
+                "prec_no": prec_no,
+                "block_no": block_no,
+                "year": year,
+                "month": month
+            }
+            query = urllib.parse.urlencode(params)
+            url = self.base_url + "/view/daily_{}1.php?".format(station_type) + query
+            return url
+        if data_frequenry == "monthly":
+            params = {
+                "prec_no": prec_no,
+                "block_no": block_no,
+                "year": year
+            }
+            query = urllib.parse.urlencode(params)
+            url = self.base_url + "/view/monthly_{}1.php?".format(station_type) + query
             return url
         raise InvalidDataFrequency
 
     def _validate_date(self, year, month, day):
         datetime.datetime(year=year,month=month,day=day)
 
-    def get_prefectures(self):
-        url = "http://www.data.jma.go.jp/obd/stats/etrn/select/prefecture00.php"
-        r = session.get(url)
+    def _prefectures_url(self):
+        return self.base_url + "/select/prefecture00.php"
 
-        for area in r.html.find("area"):
-            prec_no = self._extract_prec_no(area.attrs["href"])
-            prec_name = area.attrs["alt"]
-            yield Prefecture(prec_no, prec_name)
+    def _stations_url(self, prec_no):
+        return self.base_url + "/select/prefecture.php?prec_no={}".format(prec_no)
 
-    def get_stations(self, prec_no):
-        block_no_array = []
-        stations = {}
-        url = "http://www.data.jma.go.jp/obd/stats/etrn/select/prefecture.php?prec_no={}".format(prec_no)
-        #print(url)
-        r = session.get(url)
+    def _parse_prefectures(self, content):
+        for area in self.parser.areas(content):
+            prec_no = self._extract_prec_no(area["href"])
+            prec_name = area["alt"]
+            yield Prefecture(prec_no, prec_name, self)
 
+    def get_prefectures(self):
+        content = self._get(self._prefectures_url())
+        yield from self._parse_prefectures(content)
+
+    def _parse_stations(self, content, prec_no):
+        stations = {}
+        areas = self.parser.areas(content)
         # 存在しないprec_noの場合はエラー
-        if len(r.html.find("area")) == 0:
+        if len(areas) == 0:
             raise InvalidPrecNo
 
-        for area in r.html.find("area"):
+        for area in areas:
             #print(area)
-            prec_no_in_url = self._extract_prec_no(area.attrs["href"])
+            prec_no_in_url, block_no = self._extract_prec_no_and_block_no(area["href"])
             if prec_no != prec_no_in_url:
                 continue
-            block_no = self._extract_block_no(area.attrs["href"])
             # 全地点は省く
             if block_no == "00":
                 continue
-            name = area.attrs["alt"]
-
-            onmouseover = area.attrs["onmouseover"]
-            station_params = self._extract_station_info(onmouseover)
             # 同じ情報が2個づつ入っているので1個にする
-            if block_no not in block_no_array:
-                block_no_array.append(block_no)
-                yield Station(prec_no, block_no, **station_params)
+            if block_no in stations:
+                continue
 
-    def get_station(self, prec_no, block_no):
-        for station in self.get_stations(prec_no):
-            if station.block_no == block_no:
-                return station
-        raise InvalidBlockNo     
+            onmouseover = area["onmouseover"]
+            stations[block_no] = self._extract_station_info(onmouseover)
+        return stations
 
-    def get_hourly_data(self, prec_no, block_no, year, month, day):
-        self._validate_date(year, month, day)
-        station = self.get_station(prec_no, block_no)
-        url = self._construct_url(prec_no, block_no, station.station_type, year, month, day, data_frequenry=DATA_TYPE_HOURLY)
+    def _fetch_stations(self, prec_no):
+        url = self._stations_url(prec_no)
         #print(url)
-        r = session.get(url)
+        content = self._get(url)
+        return self._parse_station_page(content, prec_no, url)
+
+    def _parse_station_page(self, content, prec_no, url):
+        '''_parse_stationsと同じ。計測する場合は解析時間を記録する'''
+        if self.instrument is None:
+            return self._parse_stations(content, prec_no)
+        started = time.perf_counter()
+        stations = self._parse_stations(content, prec_no)
+        self.instrument.on_parse(url_kind(url), url, time.perf_counter() - started, len(stations))
+        return stations
+
+    def _get_station_params(self, prec_no):
+        stations = self.catalog.get(prec_no)
+        if self.instrument is not None:
+            self.instrument.on_catalog(prec_no, stations is not None)
+        if stations is None:
+            stations = self._fetch_stations(prec_no)
+            self.catalog.put(prec_no, stations)
+        return stations
+
+    def refresh_stations(self, prec_no=None):
+        '''キャッシュした地点情報を破棄する。prec_noを指定した場合は再取得する'''
+        self.catalog.invalidate(prec_no)
+        if prec_no is not None:
+            self._get_station_params(prec_no)
+
+    def get_stations(self, prec_no):
+        for block_no, station_params in self._get_station_params(prec_no).items():
+            yield Station(prec_no, block_no, self, **station_params)
+
+    def get_all_stations(self, workers=DEFAULT_CATALOG_WORKERS):
+        '''全国の地点のリスト
+
+        キャッシュに無い都府県の地点一覧はworkers並列で取得する。地点の無い都府県は除く。
+        取得した地点はblock_noだけでget_stationで引ける。
+        '''
+        prec_nos = [prefecture.prec_no for prefecture in self.get_prefectures()]
+
+        def params(prec_no):
+            try:
+                return self._get_station_params(prec_no)
+            except InvalidPrecNo:
+                # 地点の無い都府県も記録して、次から取得しない
+                self.catalog.put(prec_no, {})
+                return {}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(params, prec_nos))
+        return [Station(prec_no, block_no, self, **station_params)
+                for prec_no, stations in zip(prec_nos, results) for block_no, station_params in stations.items()]
+
+    def get_station_index(self, prec_nos=None):
+        '''全国(prec_nosを指定した場合はその都府県)の地点のStationIndex'''
+        from .index import StationIndex
+        if prec_nos is None:
+            return StationIndex(self.get_all_stations())
+        return StationIndex(station for prec_no in prec_nos for station in self.get_stations(prec_no))
+
+    def _find_prec_no(self, block_no):
+        '''block_noの地点のprec_no。索引に無ければ全国の地点一覧を読み込む'''
+        prec_no = self.catalog.find(block_no)
+        if prec_no is None:
+            self.get_all_stations()
+            prec_no = self.catalog.find(block_no)
+            if prec_no is None:
+                raise InvalidBlockNo
+        return prec_no
 
+    def get_station(self, prec_no, block_no=None):
+        '''地点。get_station(block_no)のようにprec_noを省略してもよい'''
+        if block_no is None:
+            block_no = prec_no
+            prec_no = self._find_prec_no(block_no)
+        station_params = self._get_station_params(prec_no).get(block_no)
+        if station_params is None:
+            raise InvalidBlockNo
+        return Station(prec_no, block_no, self, **station_params)
+
+    def _parse_table(self, content, header_rows=NUMBER_OF_HEADER_ROWS):
+        '''観測値の表の行(Cellのリスト)のリスト。header_rowsがNoneの場合はtdの無い行をヘッダとする'''
         # ヘッダを削除してテーブルを読み込む
-        if len(r.html.find("#tablefix1")) > 0:
-            rows = r.html.find("#tablefix1 > tr")[2:]
-            #print(rows)
-            for row in rows:
-                yield HourlyWeatherDataRow(row, year, month, day, url)
+        table = self.parser.data_table(content, header_rows)
+        return self._table_rows(table)
+
+    def _table_rows(self, table):
+        '''DataTableの行。表が無い場合は#mainの文字列から未来の日付か判定して例外を投げる'''
+        if table.rows is not None:
+            #print(table.rows)
+            return table.rows
+        div_main_text = table.main_text
+        if div_main_text.count("閲覧可能な日まで戻るか、「メニューに戻る」ボタンをクリックして下さい。") > 0:
+            raise FutureDateError
         else:
-            div_main_text = r.html.find("#main",first=True).text
-            if div_main_text.count("閲覧可能な日まで戻るか、「メニューに戻る」ボタンをクリックして下さい。") > 0:
-                raise FutureDateError
-            else:
-                raise Exception
-
-
-    def get_ten_minutely_data(self, prec_no, block_no, year, month, day):
+            raise DataNotFoundError
+
+    def _parse_page(self, content, url, header_rows=NUMBER_OF_HEADER_ROWS):
+        '''_parse_tableと同じ。計測する場合は解析時間を記録する'''
+        if self.instrument is None:
+            return self._parse_table(content, header_rows)
+        started = time.perf_counter()
+        table_rows = self._parse_table(content, header_rows)
+        self.instrument.on_parse(url_kind(url), url, time.perf_counter() - started, len(table_rows))
+        return table_rows
+
+    def _get_table(self, url, header_rows=NUMBER_OF_HEADER_ROWS):
+        '''URLのページを取得して解析した表の行
+
+        page_cacheにあればそれを返す。同じURLを取得中なら、その結果を待って共有する。
+        '''
+        if self.page_cache is not None:
+            table_rows = self.page_cache.get(url)
+            if table_rows is not None:
+                return table_rows
+        return self._flights.do(url, lambda: self._load_table(url, header_rows))
+
+    def _load_table(self, url, header_rows):
+        # 待っている間に他のスレッドがキャッシュしたかもしれない
+        if self.page_cache is not None:
+            table_rows = self.page_cache.get(url)
+            if table_rows is not None:
+                return table_rows
+        content = self._get(url)
+        table_rows = self._parse_page(content, url, header_rows)
+        if self.page_cache is not None:
+            self.page_cache.put(url, table_rows, len(content))
+        return table_rows
+
+    def _parse_data(self, content, row_class, year, month, day, url):
+        for row in self._parse_table(content):
+            yield row_class(row, year, month, day, url)
+
+    def _fetch_table(self, prec_no, block_no, year, month, day, data_frequency):
         self._validate_date(year, month, day)
         station = self.get_station(prec_no, block_no)
-        url = self._construct_url(prec_no, block_no, station.station_type, year, month, day, data_frequenry=DATA_TYPE_TEN_MINUTELY)
+        url = self._construct_url(prec_no, block_no, station.station_type, year, month, day, data_frequenry=data_frequency)
         #print(url)
-        r = session.get(url)
+        return station, url, self._get_table(url)
 
-        # ヘッダを削除してテーブルを読み込む
-        rows = r.html.find("#tablefix1 > tr")[2:]
+    def _rows(self, table_rows, data_frequency, station_type, year, month, day, url, as_=None):
+        if as_ == OUTPUT_COMPACT:
+            from .rows import compact_rows
+            rows = compact_rows(table_rows, data_frequency, station_type, year, month, day, url)
+        else:
+            row_class = ROW_CLASSES[data_frequency]
+            rows = (row_class(row, year, month, day, url) for row in table_rows)
+        if self.instrument is None:
+            return rows
+        return self._counted_rows(rows, url)
+
+    def _counted_rows(self, rows, url):
+        '''行数とNoneの値の数を数えて、返し終わったらon_rowsを呼ぶ'''
+        count = 0
+        nulls = 0
         for row in rows:
-            yield TenMinutelyWeatherDataRow(row, year, month, day, url)
+            count += 1
+            nulls += sum(value is None for value in _row_values(row))
+            yield row
+        self.instrument.on_rows(url_kind(url), url, count, nulls)
+
+    def _get_data(self, prec_no, block_no, year, month, day, data_frequency, as_=None):
+        station, url, table_rows = self._fetch_table(prec_no, block_no, year, month, day, data_frequency)
+        return self._rows(table_rows, data_frequency, station.station_type, year, month, day, url, as_)
+
+    def _iter_data(self, prec_no, block_no, year, month, day, data_frequency, as_=None):
+        if self.streaming and self.cache is None and self.page_cache is None and self.instrument is None:
+            yield from self._stream_data(prec_no, block_no, year, month, day, data_frequency, as_)
+        else:
+            yield from self._get_data(prec_no, block_no, year, month, day, data_frequency, as_)
+
+    def _stream_data(self, prec_no, block_no, year, month, day, data_frequency, as_=None):
+        '''_get_dataと同じだが、ページを読みながら解析して行を返す'''
+        self._validate_date(year, month, day)
+        station = self.get_station(prec_no, block_no)
+        url = self._construct_url(prec_no, block_no, station.station_type, year, month, day, data_frequenry=data_frequency)
+        chunks = self.transport.stream(url, rate_limiter=self.rate_limiter)
+        table_rows = self._table_rows(self.parser.stream_data_table(chunks))
+        yield from self._rows(table_rows, data_frequency, station.station_type, year, month, day, url, as_)
+
+    def _get_columns(self, prec_no, block_no, year, month, day, data_frequency):
+        from .columns import ColumnarData
+        station, url, table_rows = self._fetch_table(prec_no, block_no, year, month, day, data_frequency)
+        columns = ColumnarData(data_frequency, station.station_type)
+        self._extend_columns(columns, table_rows, year, month, day, url)
+        return columns
+
+    def _extend_columns(self, columns, table_rows, year, month, day, url):
+        if self.instrument is None:
+            columns.extend(table_rows, year, month, day, url)
+            return
+        start = len(columns)
+        columns.extend(table_rows, year, month, day, url)
+        nulls = sum(column.mask.count(0, start) for column in columns.columns.values())
+        self.instrument.on_rows(url_kind(url), url, columns.pages[-1][1], nulls)
+
+    def _validate_output(self, as_):
+        if as_ not in (None, OUTPUT_COLUMNS, OUTPUT_COMPACT):
+            raise ValueError("as_ must be None, {!r} or {!r}".format(OUTPUT_COLUMNS, OUTPUT_COMPACT))
+
+    def _get_output(self, prec_no, block_no, year, month, day, data_frequency, as_):
+        self._validate_output(as_)
+        if as_ == OUTPUT_COLUMNS:
+            return self._get_columns(prec_no, block_no, year, month, day, data_frequency)
+        return self._iter_data(prec_no, block_no, year, month, day, data_frequency, as_)
+
+    def get_hourly_data(self, prec_no, block_no, year, month, day, as_=None):
+        '''as_="columns"の場合はColumnarData、as_="compact"の場合は__slots__の行を返す'''
+        return self._get_output(prec_no, block_no, year, month, day, DATA_TYPE_HOURLY, as_)
+
+    def get_ten_minutely_data(self, prec_no, block_no, year, month, day, as_=None):
+        '''as_="columns"の場合はColumnarData、as_="compact"の場合は__slots__の行を返す'''
+        return self._get_output(prec_no, block_no, year, month, day, DATA_TYPE_TEN_MINUTELY, as_)
+
+    def _get_summary(self, prec_no, block_no, year, month, data_frequency):
+        '''日毎(月のページ)か月毎(年のページ)の表の行'''
+        self._validate_date(year, month or 1, 1)
+        station = self.get_station(prec_no, block_no)
+        url = self._construct_url(prec_no, block_no, station.station_type, year, month, None, data_frequenry=data_frequency)
+        # ヘッダの行数は地点の種類で異なる
+        return url, self._get_table(url, header_rows=None)
+
+    def get_daily_data(self, prec_no, block_no, year, month):
+        '''year年month月の日毎の値'''
+        url, table_rows = self._get_summary(prec_no, block_no, year, month, DATA_TYPE_DAILY)
+        rows = (DailyWeatherDataRow(row, year, month, url) for row in table_rows)
+        if self.instrument is not None:
+            rows = self._counted_rows(rows, url)
+        yield from rows
+
+    def get_monthly_data(self, prec_no, block_no, year):
+        '''year年の月毎の値'''
+        url, table_rows = self._get_summary(prec_no, block_no, year, None, DATA_TYPE_MONTHLY)
+        rows = (MonthlyWeatherDataRow(row, year, url) for row in table_rows)
+        if self.instrument is not None:
+            rows = self._counted_rows(rows, url)
+        yield from rows
+
+    def _get_range(self, prec_no, block_no, start, end, data_frequency, prefetch, as_):
+        self._validate_output(as_)
+        station = self.get_station(prec_no, block_no)
+        if as_ == OUTPUT_COLUMNS:
+            return DateRangeData(self, station, start, end, data_frequency, prefetch).to_columns()
+        return DateRangeData(self, station, start, end, data_frequency, prefetch, as_)
+
+    def get_hourly_range(self, prec_no, block_no, start, end, prefetch=DEFAULT_PREFETCH, as_=None):
+        '''start日からend日までの1時間毎の観測値'''
+        return self._get_range(prec_no, block_no, start, end, DATA_TYPE_HOURLY, prefetch, as_)
+
+    def get_ten_minutely_range(self, prec_no, block_no, start, end, prefetch=DEFAULT_PREFETCH, as_=None):
+        '''start日からend日までの10分毎の観測値'''
+        return self._get_range(prec_no, block_no, start, end, DATA_TYPE_TEN_MINUTELY, prefetch, as_)
+
+    def sync(self, stations, data_frequency, store, start=None, workers=1, prefetch=DEFAULT_PREFETCH, as_=None):
+        '''前回の続きから新しい行だけを取得してstore(WatermarkStore)に保存する
+
+        stationsはStationか(prec_no, block_no)。初回はstart日(省略時は当日)から取得する。
+        当日の途中までのページは次回に取り直す。観測が終了した地点は取得しない。
+        SyncResultのリストを返す。
+        '''
+        from .sync import sync
+        return sync(self, stations, data_frequency, store, start, workers, prefetch, as_)
+
+    def watch(self, prec_no, block_no, data_frequency=DATA_TYPE_TEN_MINUTELY, interval=None, since=None, as_=None):
+        '''新しく公開された行を返し続けるジェネレータ
+
+        interval秒(省略時は5分)毎にページを確認し、前に返した行より後の行だけを返す。
+        sinceを省略した場合は日本時間の当日の0時より後の行から返す。新しい行が無ければ確認の間隔を延ばす。
+        多くの地点を監視する場合はjma.watch.WatchSchedulerで1つのスケジューラにまとめる。
+        '''
+        from .watch import WatchScheduler, DEFAULT_WATCH_INTERVAL
+        scheduler = WatchScheduler(self, interval=interval if interval is not None else DEFAULT_WATCH_INTERVAL,
+                                   workers=1, as_=as_)
+        scheduler.add((prec_no, block_no), data_frequency, since)
+        for watch, rows in scheduler.run():
+            yield from rows
 
 
 class InvalidPrecNo(Exception):
@@ -461,4 +1103,12 @@ class WeatherImageConvertError(Exception):
 
 
 class FutureDateError(Exception):
-    "Specified date is future date"
\ No newline at end of file
+    "Specified date is future date"
+
+
+class DataNotFoundError(Exception):
+    "Page has no data table"
+
+
+class CacheMissError(Exception):
+    "Page is not in the cache (offline mode)"
\ No newline at end of file
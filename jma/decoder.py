@@ -0,0 +1,145 @@
+'''観測値の表のセルの文字列を値にする
+
+http://www.data.jma.go.jp/obd/stats/data/mdrr/man/remark.html
+'''
+
+# 列の型
+FLOAT = "float"
+INT = "int"
+STR = "str"
+WEATHER = "weather"
+
+# 値が無いことを表す文字列
+NULL_TEXTS = frozenset(["--", "///", "", "#"])
+# 値の後に付く品質情報。")"は準正常値、"]"は資料不足値
+QUALITY_FLAGS = (")", "]")
+# 欠測を表す文字
+MISSING = "×"
+
+DIRECTIONS = {
+    '北': 'N',
+    '東': 'E',
+    '南': 'S',
+    '西': 'W',
+    '北東': 'NE',
+    '南東': 'SE',
+    '南西': 'SW',
+    '北西': 'NW',
+    '北北東': 'NNE',
+    '東南東': 'ESE',
+    '南南西': 'SSW',
+    '西北西': 'WNW',
+    '東北東': 'ENE',
+    '南南東': 'SSE',
+    '西南西': 'WSW',
+    '北北西': 'NNW',
+    '静穏': None
+}
+
+# 1つの列で覚えておく文字列の数
+MAX_CACHED_TEXTS = 4096
+
+
+def sanitize(value):
+    '''型の分からない列の値。数値にできない場合は文字列のまま返す'''
+    if value in NULL_TEXTS:
+        return None
+    if value in DIRECTIONS:
+        return DIRECTIONS[value]
+    if MISSING in value:
+        return None
+    if '.' in value:
+        return float(value.replace(']', '').replace(')', ''))
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def _direction(text):
+    try:
+        return DIRECTIONS[text]
+    except KeyError:
+        raise ValueError(text)
+
+
+def _code(text):
+    '''雲量など。"10-"や"0+"は文字列のまま'''
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+def _decoder(convert):
+    '''セルの文字列 -> (値, 品質情報)の関数
+
+    値の種類は限られるので、文字列毎の結果を覚えておき、同じ値のオブジェクトを行の間で共有する。
+    変換できない文字列はそのまま値にする。
+    '''
+    cache = {}
+
+    def decode(text):
+        try:
+            return cache[text]
+        except KeyError:
+            pass
+        if len(cache) >= MAX_CACHED_TEXTS:
+            cache.clear()
+        if text in NULL_TEXTS or MISSING in text:
+            result = (None, None)
+        else:
+            flag = None
+            value = text
+            if value[-1] in QUALITY_FLAGS:
+                flag = value[-1]
+                value = value[:-1]
+            try:
+                result = (convert(value), flag)
+            except ValueError:
+                result = (text, None)
+        cache[text] = result
+        return result
+    return decode
+
+
+def float_decoder():
+    return _decoder(float)
+
+
+def int_decoder():
+    return _decoder(int)
+
+
+def direction_decoder():
+    return _decoder(_direction)
+
+
+def code_decoder():
+    return _decoder(_code)
+
+
+def text_decoder():
+    '''天気概況など文字列のままの列'''
+    return _decoder(str)
+
+
+# 日照時間(分)などの分数
+minutes_decoder = int_decoder
+
+
+class ColumnSpec:
+    '''表の1列の名前、型(FLOAT, INT, STR, WEATHER)と変換する関数。WEATHERは画像のaltから取る'''
+
+    __slots__ = ("name", "kind", "decode")
+
+    def __init__(self, name, kind, decode=None):
+        self.name = name
+        self.kind = kind
+        self.decode = decode
+
+    def __repr__(self):
+        return '<ColumnSpec>' + ', '.join("%s: %s" % (name, getattr(self, name)) for name in ("name", "kind"))
+
+    def __str__(self):
+        return self.__repr__()
@@ -0,0 +1,174 @@
+import heapq
+import json
+import math
+
+from .clock import jst_today
+from .core import Station, _station_vars
+from .storage import params_from_json, params_to_json, write_json
+
+# 地球の半径(km)
+EARTH_RADIUS = 6371.0088
+
+
+def _unit_vector(latitude, longitude):
+    '''緯度経度 -> 単位球上の点(x, y, z)'''
+    phi = math.radians(latitude)
+    lam = math.radians(longitude)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+
+def _chord_to_km(squared_chord):
+    '''単位球上の2点間の直線距離の2乗 -> 大円距離(km)'''
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(squared_chord) / 2))
+
+
+def _km_to_chord(km):
+    '''大円距離(km) -> 単位球上の2点間の直線距離の2乗'''
+    angle = min(math.pi, km / EARTH_RADIUS)
+    return (2 * math.sin(angle / 2)) ** 2
+
+
+def great_circle_distance(latitude1, longitude1, latitude2, longitude2):
+    '''2点間の大円距離(km)'''
+    p = _unit_vector(latitude1, longitude1)
+    q = _unit_vector(latitude2, longitude2)
+    return _chord_to_km(sum((a - b) ** 2 for a, b in zip(p, q)))
+
+
+def _station_params(station):
+    '''Stationの引数(prec_no, block_noと緯度経度の計算結果を除く)'''
+    params = _station_vars(station)
+    for name in ("prec_no", "block_no", "latitude", "longitude"):
+        params.pop(name)
+    return params
+
+
+class StationIndex:
+    '''全国の観測地点の空間索引
+
+    地点を単位球上の点にしてKD木(配列に並べたもの)に入れ、近い地点を大円距離で探す。
+    地点の並び順がそのまま木なので、save()で保存した地点を読み込めば作り直す必要はない。
+    '''
+
+    def __init__(self, stations, _ordered=False):
+        items = [(_unit_vector(station.latitude, station.longitude), station) for station in stations]
+        if not _ordered:
+            self._build(items, 0, len(items), 0)
+        self._points = [point for point, station in items]
+        self.stations = [station for point, station in items]
+
+    def __len__(self):
+        return len(self.stations)
+
+    def __iter__(self):
+        return iter(self.stations)
+
+    def __repr__(self):
+        return '<StationIndex>' + ', '.join("%s: %s" % item for item in [("stations", len(self.stations))])
+
+    def __str__(self):
+        return self.__repr__()
+
+    def _build(self, items, lo, hi, depth):
+        # [lo, hi)の中央の地点を節にして、その軸で左右に分ける
+        if hi - lo <= 1:
+            return
+        axis = depth % 3
+        items[lo:hi] = sorted(items[lo:hi], key=lambda item: item[0][axis])
+        mid = (lo + hi) // 2
+        self._build(items, lo, mid, depth + 1)
+        self._build(items, mid + 1, hi, depth + 1)
+
+    def _accept(self, require, active):
+        '''地点の条件。requireは観測している項目(f_temなど)、activeは観測を続けている日付'''
+        if active is True:
+            active = jst_today()
+        if not require and active is None:
+            return None
+
+        def accept(station):
+            for name in require:
+                if not getattr(station, name):
+                    return False
+            if active is not None and station.observation_end_date is not None:
+                return station.observation_end_date >= active
+            return True
+        return accept
+
+    def _search(self, query, bound, accept, found, k):
+        '''foundに(-距離の2乗, 位置)を入れる。kがNoneの場合はbound以内の全ての地点'''
+        points = self._points
+        # (範囲, 深さ, 分割面までの距離の2乗)
+        stack = [(0, len(points), 0, 0.0)]
+        while stack:
+            lo, hi, depth, plane = stack.pop()
+            # 分割面までの距離が今の境界より遠い側は探さない
+            if lo >= hi or plane > bound:
+                continue
+            mid = (lo + hi) // 2
+            point = points[mid]
+            distance = sum((a - b) ** 2 for a, b in zip(query, point))
+            if distance <= bound and (accept is None or accept(self.stations[mid])):
+                if k is None:
+                    found.append((-distance, mid))
+                elif len(found) < k:
+                    heapq.heappush(found, (-distance, mid))
+                else:
+                    heapq.heappushpop(found, (-distance, mid))
+                if k is not None and len(found) == k:
+                    bound = -found[0][0]
+            axis = depth % 3
+            diff = query[axis] - point[axis]
+            if diff > 0:
+                stack.append((lo, mid, depth + 1, diff * diff))
+                stack.append((mid + 1, hi, depth + 1, 0.0))
+            else:
+                stack.append((mid + 1, hi, depth + 1, diff * diff))
+                stack.append((lo, mid, depth + 1, 0.0))
+        return found
+
+    def _results(self, found):
+        found.sort(key=lambda item: (-item[0], item[1]))
+        return [(self.stations[i], _chord_to_km(-distance)) for distance, i in found]
+
+    def nearest(self, latitude, longitude, k=1, require=(), active=None):
+        '''近い順にk地点の(Station, 距離(km))のリスト
+
+        requireは観測している項目の名前(例: ("f_tem", "f_pre"))。
+        activeにdateを指定するとその日に観測している地点、Trueなら今日観測している地点に限る。
+        '''
+        if k <= 0:
+            return []
+        query = _unit_vector(latitude, longitude)
+        found = self._search(query, 4.0, self._accept(require, active), [], k)
+        return self._results(found)
+
+    def within(self, latitude, longitude, radius, require=(), active=None):
+        '''radius(km)以内の(Station, 距離(km))を近い順に返す。requireとactiveはnearestと同じ'''
+        query = _unit_vector(latitude, longitude)
+        found = self._search(query, _km_to_chord(radius), self._accept(require, active), [], None)
+        return self._results(found)
+
+    def to_dict(self):
+        data = []
+        for station in self.stations:
+            params = params_to_json(_station_params(station))
+            data.append({"prec_no": station.prec_no, "block_no": station.block_no, "params": params})
+        return {"stations": data}
+
+    @classmethod
+    def from_dict(cls, data):
+        stations = []
+        for item in data["stations"]:
+            params = params_from_json(item["params"])
+            stations.append(Station(item["prec_no"], item["block_no"], **params))
+        return cls(stations, _ordered=True)
+
+    def save(self, path):
+        '''JSONファイルに保存する'''
+        write_json(path, self.to_dict(), ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,166 @@
+import collections
+import threading
+
+# URLの種類
+KIND_PREFECTURES = "prefectures"
+KIND_STATIONS = "stations"
+KIND_HOURLY = "hourly"
+KIND_TEN_MINUTELY = "ten_minutely"
+KIND_DAILY = "daily"
+KIND_MONTHLY = "monthly"
+KIND_OTHER = "other"
+
+# ページ(キャッシュ)の取得元
+CACHE_HIT = "hit"
+CACHE_MISS = "miss"
+
+
+def url_kind(url):
+    '''URLの種類(prefectures, stations, hourly, ten_minutely, daily, monthly, other)'''
+    if "/view/hourly_" in url:
+        return KIND_HOURLY
+    if "/view/10min_" in url:
+        return KIND_TEN_MINUTELY
+    if "/view/daily_" in url:
+        return KIND_DAILY
+    if "/view/monthly_" in url:
+        return KIND_MONTHLY
+    if "/select/prefecture00.php" in url:
+        return KIND_PREFECTURES
+    if "/select/prefecture.php" in url:
+        return KIND_STATIONS
+    return KIND_OTHER
+
+
+class Instrument:
+    '''Jmaの処理毎に呼ばれるイベントを受け取る
+
+    Jma(instrument=...)に渡す。必要なメソッドだけを上書きすればよい。
+    複数のスレッドから呼ばれることがある。
+    '''
+
+    def on_request(self, kind, url, nbytes, seconds, cache, error=None):
+        '''ページを1つ取得した
+
+        secondsはキャッシュを含めた取得時間。cacheはキャッシュを使わない場合None、それ以外は"hit"か"miss"。
+        失敗した場合はerrorに例外が入る。
+        '''
+
+    def on_parse(self, kind, url, seconds, rows):
+        '''ページのHTMLを解析した。rowsは表の行数(地点一覧の場合は地点数)'''
+
+    def on_rows(self, kind, url, rows, nulls):
+        '''1ページ分の行を返し終わった。nullsは欠測などでNoneになった値の数'''
+
+    def on_catalog(self, prec_no, hit):
+        '''地点情報を引いた。hitがFalseの場合は地点一覧のページを取得する'''
+
+
+class Stats(Instrument):
+    '''イベントを種類毎に集計する
+
+    snapshot()でdict、to_prometheus()でPrometheusのテキスト形式にできる。
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # (名前, 種類) -> 値
+            self._counters = collections.defaultdict(float)
+            self._catalog = collections.Counter()
+
+    def _add(self, kind, *items):
+        with self._lock:
+            counters = self._counters
+            for name, value in items:
+                counters[(name, kind)] += value
+
+    def on_request(self, kind, url, nbytes, seconds, cache, error=None):
+        items = [("requests", 1), ("request_seconds", seconds)]
+        if error is not None:
+            items.append(("request_errors", 1))
+        else:
+            items.append(("bytes", nbytes))
+        if cache == CACHE_HIT:
+            items.append(("cache_hits", 1))
+        elif cache == CACHE_MISS:
+            items.append(("cache_misses", 1))
+        self._add(kind, *items)
+
+    def on_parse(self, kind, url, seconds, rows):
+        self._add(kind, ("parses", 1), ("parse_seconds", seconds))
+
+    def on_rows(self, kind, url, rows, nulls):
+        self._add(kind, ("rows", rows), ("nulls", nulls))
+
+    def on_catalog(self, prec_no, hit):
+        with self._lock:
+            self._catalog["hits" if hit else "misses"] += 1
+
+    def snapshot(self):
+        '''{種類: {名前: 値}}と地点情報の{"catalog": {"hits": n, "misses": n}}'''
+        with self._lock:
+            result = collections.OrderedDict()
+            for (name, kind), value in sorted(self._counters.items(), key=lambda item: (item[0][1], item[0][0])):
+                result.setdefault(kind, collections.OrderedDict())[name] = value
+            result["catalog"] = collections.OrderedDict((name, self._catalog[name]) for name in ("hits", "misses"))
+        return result
+
+    def to_prometheus(self, prefix="jma"):
+        '''Prometheusのテキスト形式'''
+        lines = []
+        with self._lock:
+            names = sorted(set(name for name, kind in self._counters))
+            for name in names:
+                metric = "{}_{}_total".format(prefix, name)
+                lines.append("# TYPE {} counter".format(metric))
+                for (counter_name, kind), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append('{}{{kind="{}"}} {}'.format(metric, kind, _format_value(value)))
+            if self._catalog:
+                metric = "{}_catalog_lookups_total".format(prefix)
+                lines.append("# TYPE {} counter".format(metric))
+                for name, result in (("hits", "hit"), ("misses", "miss")):
+                    lines.append('{}{{result="{}"}} {}'.format(metric, result, self._catalog[name]))
+        return "\n".join(lines) + "\n"
+
+
+def _format_value(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+class StatsdInstrument(Instrument):
+    '''イベントをStatsDのクライアントに送る
+
+    clientはincr(name, count)とtiming(name, milliseconds)を持つもの(statsdパッケージのStatsClientなど)。
+    '''
+
+    def __init__(self, client, prefix="jma"):
+        self.client = client
+        self.prefix = prefix
+
+    def _name(self, kind, name):
+        return "{}.{}.{}".format(self.prefix, kind, name)
+
+    def on_request(self, kind, url, nbytes, seconds, cache, error=None):
+        self.client.incr(self._name(kind, "requests"), 1)
+        self.client.timing(self._name(kind, "request"), seconds * 1000)
+        if error is not None:
+            self.client.incr(self._name(kind, "request_errors"), 1)
+        else:
+            self.client.incr(self._name(kind, "bytes"), nbytes)
+        if cache is not None:
+            self.client.incr(self._name(kind, "cache_hits" if cache == CACHE_HIT else "cache_misses"), 1)
+
+    def on_parse(self, kind, url, seconds, rows):
+        self.client.timing(self._name(kind, "parse"), seconds * 1000)
+
+    def on_rows(self, kind, url, rows, nulls):
+        self.client.incr(self._name(kind, "rows"), rows)
+        self.client.incr(self._name(kind, "nulls"), nulls)
+
+    def on_catalog(self, prec_no, hit):
+        self.client.incr("{}.catalog.{}".format(self.prefix, "hits" if hit else "misses"), 1)
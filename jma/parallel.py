@@ -0,0 +1,148 @@
+import collections
+import concurrent.futures
+import threading
+import time
+import urllib.parse
+
+from .core import Jma, Station
+from .transport import Transport
+
+# 1ホストあたりの1秒間のリクエスト数
+DEFAULT_RATE = 2.0
+DEFAULT_BURST = 4
+DEFAULT_WORKERS = 4
+
+
+class RateLimiter:
+    '''ホスト毎のトークンバケットでリクエスト数を制限する'''
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        # host -> [トークン数, 更新時刻]
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url):
+        '''トークンが取れるまで待つ'''
+        host = urllib.parse.urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._buckets.setdefault(host, [self.burst, now])
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            # 先にトークンを予約して、足りない分だけロックの外で待つ
+            bucket[0] -= 1
+            wait = -bucket[0] / self.rate if bucket[0] < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+# プロセス全体で共有するデフォルトの制限
+default_rate_limiter = RateLimiter()
+
+# fetch_manyでrate_limiterを指定しなかった場合
+_DEFAULT_RATE_LIMITER = object()
+
+FetchJob = collections.namedtuple("FetchJob", ["station", "date", "data_frequency"])
+
+
+class FetchResult:
+    '''fetch_manyの結果。失敗した場合はrowsがNoneでerrorに例外が入る'''
+
+    def __init__(self, job, rows=None, error=None):
+        self.job = job
+        self.rows = rows
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return '<FetchResult>' + ', '.join("%s: %s" % item for item in vars(self).items() if item[0] != "rows")
+
+    def __str__(self):
+        return self.__repr__()
+
+
+def _run_job(jma, job, rate_limiter=None):
+    station, date, data_frequency = job
+    if rate_limiter is not None:
+        rate_limiter.acquire(jma.base_url)
+    if isinstance(station, Station):
+        prec_no, block_no = station.prec_no, station.block_no
+    else:
+        prec_no, block_no = station
+    try:
+        rows = list(jma._get_data(prec_no, block_no, date.year, date.month, date.day, data_frequency))
+    except Exception as e:
+        return FetchResult(job, error=e)
+    return FetchResult(job, rows=rows)
+
+
+def _new_jma(jma, rate_limiter, workers):
+    '''(使うJma, job毎に使うRateLimiterかNone)
+
+    jmaがNoneならrate_limiter(省略時はdefault_rate_limiter)を使うJmaを作る。
+    jmaを渡した場合はjmaのrate_limiterを使い、rate_limiterも渡されていればjob毎にそれで制限する。
+    '''
+    if jma is None:
+        if rate_limiter is _DEFAULT_RATE_LIMITER:
+            rate_limiter = default_rate_limiter
+        # ワーカー数に合わせてコネクションプールを用意する
+        return Jma(rate_limiter=rate_limiter, transport=Transport(pool_size=workers)), None
+    if rate_limiter is _DEFAULT_RATE_LIMITER or rate_limiter is None or rate_limiter is jma.rate_limiter:
+        return jma, None
+    if jma.rate_limiter is not None:
+        raise ValueError("pass rate_limiter either here or to the Jma, not both")
+    return jma, rate_limiter
+
+
+def fetch_many(jobs, workers=DEFAULT_WORKERS, ordered=False, jma=None, rate_limiter=_DEFAULT_RATE_LIMITER):
+    '''(station, date, data_frequency)の組をスレッドプールで取得してFetchResultを返す
+
+    stationはStationか(prec_no, block_no)。orderedがFalseなら終わった順、Trueならjobsの順に返す。
+    個々のjobの失敗は例外を投げずにFetchResult.errorで返す。
+    rate_limiterを省略するとdefault_rate_limiterで制限する。jmaを渡した場合はjmaのrate_limiterを使い、
+    rate_limiterも渡すとjob毎にそれで制限する(jmaが別のrate_limiterを持っている場合はValueError)。
+    '''
+    jma, job_rate_limiter = _new_jma(jma, rate_limiter, workers)
+    jobs = iter(FetchJob(*job) for job in jobs)
+    # 取り出されていない結果が溜まりすぎないように投入数を制限する
+    max_pending = workers * 2
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit():
+            job = next(jobs, None)
+            if job is None:
+                return None
+            return executor.submit(_run_job, jma, job, job_rate_limiter)
+
+        if ordered:
+            queue = collections.deque()
+            while len(queue) < max_pending:
+                future = submit()
+                if future is None:
+                    break
+                queue.append(future)
+            while queue:
+                future = queue.popleft()
+                next_future = submit()
+                if next_future is not None:
+                    queue.append(next_future)
+                yield future.result()
+        else:
+            pending = set()
+            while len(pending) < max_pending:
+                future = submit()
+                if future is None:
+                    break
+                pending.add(future)
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    next_future = submit()
+                    if next_future is not None:
+                        pending.add(next_future)
+                    yield future.result()
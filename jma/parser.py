@@ -0,0 +1,166 @@
+import collections
+
+# 表の1セル。textはセルの文字列、altsはセル内のimgのalt
+Cell = collections.namedtuple("Cell", ["text", "alts"])
+
+# 表の先頭のヘッダ行の数
+NUMBER_OF_HEADER_ROWS = 2
+
+
+def _skip_header_rows(rows, header_rows, has_cells):
+    '''header_rowsがNoneの場合はtdの無い先頭の行をヘッダとして除く'''
+    if header_rows is not None:
+        return rows[header_rows:]
+    index = 0
+    while index < len(rows) and not has_cells(rows[index]):
+        index += 1
+    return rows[index:]
+
+
+class DataTable:
+    '''観測値のページの解析結果
+
+    #tablefix1が無いページではrowsがNoneで、main_textに#mainの文字列が入る。
+    stream_data_tableの場合はrowsが行を順に返すイテレータになる。
+    '''
+
+    def __init__(self, rows, main_text=None):
+        self.rows = rows
+        self.main_text = main_text
+
+
+class LxmlParser:
+    '''lxmlで直接解析するパーサ'''
+
+    name = "lxml"
+
+    def _document(self, content):
+        # lxmlはimportが重いので使う時に読み込む
+        import lxml.html
+        return lxml.html.document_fromstring(content)
+
+    def areas(self, content):
+        '''area要素の属性のリスト'''
+        return [dict(area.attrib) for area in self._document(content).iter("area")]
+
+    def data_table(self, content, header_rows=NUMBER_OF_HEADER_ROWS):
+        document = self._document(content)
+        try:
+            table = document.get_element_by_id("tablefix1")
+        except KeyError:
+            main = document.get_element_by_id("main", None)
+            return DataTable(None, main.text_content() if main is not None else "")
+
+        rows = []
+        for tr in _skip_header_rows(table.findall("tr"), header_rows, lambda tr: tr.find("td") is not None):
+            cells = []
+            for td in tr.findall("td"):
+                # 子要素がある場合だけimgを探す
+                alts = [img.get("alt") for img in td.iter("img")] if len(td) else []
+                cells.append(Cell(td.text_content().strip(), alts))
+            rows.append(cells)
+        return DataTable(rows)
+
+    def stream_data_table(self, chunks, header_rows=NUMBER_OF_HEADER_ROWS):
+        '''data_tableと同じだが、ページの内容をbytesのchunksから少しずつ読んで解析する
+
+        #tablefix1が始まった所で返し、rowsはtrが閉じる毎にその行を返す。返した行の要素は捨てる。
+        '''
+        import lxml.etree
+        parser = lxml.etree.HTMLPullParser(events=("start", "end"))
+        events = _pull_events(parser, chunks)
+        root = None
+        for event, element in events:
+            if root is None:
+                root = element
+            if event == "start" and element.tag == "table" and element.get("id") == "tablefix1":
+                return DataTable(self._stream_rows(element, events, header_rows))
+        main = root.find(".//*[@id='main']") if root is not None else None
+        return DataTable(None, "".join(main.itertext()) if main is not None else "")
+
+    def _stream_rows(self, table, events, header_rows):
+        skipping = True
+        skipped = 0
+        for event, element in events:
+            if event != "end":
+                continue
+            if element is table:
+                break
+            if element.tag != "tr" or element.getparent() is not table:
+                continue
+            tds = element.findall("td")
+            if skipping:
+                # header_rowsがNoneの場合はtdの無い先頭の行をヘッダとする
+                skipping = not tds if header_rows is None else skipped < header_rows
+                skipped += 1
+            if not skipping:
+                # 子要素がある場合だけimgを探す
+                yield [Cell("".join(td.itertext()).strip(), [img.get("alt") for img in td.iter("img")] if len(td) else [])
+                       for td in tds]
+            # 返し終わった行の要素は捨てる
+            element.clear()
+            while element.getprevious() is not None:
+                del table[0]
+        # 残りも読んで、コネクションを再利用できるようにする
+        for _ in events:
+            pass
+
+
+def _pull_events(parser, chunks):
+    '''chunksをparserに渡して(event, element)を返す'''
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+
+class RequestsHTMLParser:
+    '''requests_htmlで解析するパーサ'''
+
+    name = "requests_html"
+
+    def _document(self, content):
+        from requests_html import HTML
+        return HTML(html=content)
+
+    def areas(self, content):
+        return [area.attrs for area in self._document(content).find("area")]
+
+    def data_table(self, content, header_rows=NUMBER_OF_HEADER_ROWS):
+        document = self._document(content)
+        if len(document.find("#tablefix1")) == 0:
+            main = document.find("#main", first=True)
+            return DataTable(None, main.text if main is not None else "")
+
+        rows = []
+        trs = document.find("#tablefix1 > tr")
+        for tr in _skip_header_rows(trs, header_rows, lambda tr: len(tr.find("td")) > 0):
+            rows.append(element_cells(tr))
+        return DataTable(rows)
+
+    def stream_data_table(self, chunks, header_rows=NUMBER_OF_HEADER_ROWS):
+        '''requests_htmlは少しずつ解析できないので、全て読んでからdata_tableと同じく解析する'''
+        return self.data_table(b"".join(chunks), header_rows)
+
+
+def element_cells(row):
+    '''requests_htmlのtr要素をCellのリストにする'''
+    return [Cell(td.text, [img.attrs["alt"] for img in td.find("img")]) for td in row.find("td")]
+
+
+PARSERS = {
+    LxmlParser.name: LxmlParser,
+    RequestsHTMLParser.name: RequestsHTMLParser,
+}
+
+default_parser = LxmlParser()
+
+
+def get_parser(parser):
+    '''パーサのインスタンスか名前からパーサを返す'''
+    if parser is None:
+        return default_parser
+    if isinstance(parser, str):
+        return PARSERS[parser]()
+    return parser
@@ -0,0 +1,146 @@
+'''取得と解析を分けたパイプライン
+
+ページの取得はスレッド、HTMLの解析はプロセスで行う。
+解析はGILに縛られるので、スレッドだけではコア数を増やしても速くならない。
+プロセスだけではアイドルの接続をプロセス毎に持つことになる。
+'''
+import concurrent.futures
+import os
+import time
+
+from .core import Jma, Station, ROW_CLASSES, OUTPUT_COLUMNS, OUTPUT_COMPACT, InvalidDataFrequency, _row_values
+from .instrument import url_kind
+from .parallel import FetchJob, FetchResult, DEFAULT_WORKERS, _DEFAULT_RATE_LIMITER, _new_jma
+
+
+def _parse(parser, content, data_frequency, station_type, year, month, day, url, as_, count_nulls):
+    '''解析プロセスで実行する。(行のリストかColumnarData, 解析時間, 表の行数, Noneの値の数)を返す'''
+    jma = Jma(parser=parser)
+    started = time.perf_counter()
+    table_rows = jma._parse_table(content)
+    seconds = time.perf_counter() - started
+    if as_ == OUTPUT_COLUMNS:
+        from .columns import ColumnarData
+        value = ColumnarData(data_frequency, station_type)
+        value.extend(table_rows, year, month, day, url)
+        nulls = sum(column.mask.count(0) for column in value.columns.values()) if count_nulls else 0
+    else:
+        value = list(jma._rows(table_rows, data_frequency, station_type, year, month, day, url, as_))
+        nulls = sum(value is None for row in value for value in _row_values(row)) if count_nulls else 0
+    return value, seconds, len(table_rows), nulls
+
+
+class Pipeline:
+    '''(station, date, data_frequency)の組をスレッドで取得し、プロセスで解析してFetchResultを返す
+
+    io_workersは取得のスレッド数、parse_workersは解析のプロセス数(省略時はCPU数)。
+    取得中、解析中、取り出されていない結果の合計をmax_pending(省略時は両方のワーカー数の2倍)までにして、
+    結果を取り出す側が遅い場合は取得も止まる。
+    as_はNone(WeatherDataRowのリスト)、"compact"(CompactWeatherDataRowのリスト)、"columns"(ColumnarData)。
+    mp_contextは解析プロセスの起動方法(multiprocessingのcontext)。
+    '''
+
+    def __init__(self, io_workers=DEFAULT_WORKERS, parse_workers=None, jma=None, as_=None, max_pending=None,
+                 rate_limiter=_DEFAULT_RATE_LIMITER, mp_context=None):
+        if as_ not in (None, OUTPUT_COMPACT, OUTPUT_COLUMNS):
+            raise ValueError("as_ must be None, {!r} or {!r}".format(OUTPUT_COMPACT, OUTPUT_COLUMNS))
+        if parse_workers is None:
+            parse_workers = os.cpu_count() or 1
+        # rate_limiterの扱いはfetch_manyと同じ
+        self.jma, self._rate_limiter = _new_jma(jma, rate_limiter, io_workers)
+        self.io_workers = io_workers
+        self.parse_workers = parse_workers
+        self.as_ = as_
+        self.mp_context = mp_context
+        self.max_pending = max_pending if max_pending is not None else (io_workers + parse_workers) * 2
+
+    def _fetch(self, job):
+        '''取得スレッドで実行する。(Station, URL, ページの内容)を返す'''
+        station, date, data_frequency = job
+        if not isinstance(station, Station):
+            station = self.jma.get_station(*station)
+        if data_frequency not in ROW_CLASSES:
+            raise InvalidDataFrequency
+        self.jma._validate_date(date.year, date.month, date.day)
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire(self.jma.base_url)
+        url = self.jma._construct_url(station.prec_no, station.block_no, station.station_type,
+                                      date.year, date.month, date.day, data_frequenry=data_frequency)
+        return station, url, self.jma._get(url)
+
+    def _parsed(self, job, station, url, parsed):
+        value, seconds, table_rows, nulls = parsed
+        instrument = self.jma.instrument
+        if instrument is not None:
+            kind = url_kind(url)
+            instrument.on_parse(kind, url, seconds, table_rows)
+            instrument.on_rows(kind, url, len(value), nulls)
+        return FetchResult(job, rows=value)
+
+    def run(self, jobs, ordered=False):
+        '''jobsを処理してFetchResultを返す。orderedがFalseなら終わった順、Trueならjobsの順
+
+        個々のjobの失敗は例外を投げずにFetchResult.errorで返す。
+        '''
+        jobs = iter(FetchJob(*job) for job in jobs)
+        count_nulls = self.jma.instrument is not None
+        parser = self.jma.parser
+        # 番号 -> FetchResult。orderedの場合に順番が来るまで置いておく
+        finished = {}
+        next_index = 0
+        submitted = 0
+        # future -> (番号, job, 段階, 取得結果)
+        pending = {}
+        process_options = {} if self.mp_context is None else {"mp_context": self.mp_context}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.io_workers) as io_executor, \
+                concurrent.futures.ProcessPoolExecutor(max_workers=self.parse_workers, **process_options) as parse_executor:
+
+            def submit():
+                job = next(jobs, None)
+                if job is None:
+                    return False
+                pending[io_executor.submit(self._fetch, job)] = (submitted, job, "fetch", None)
+                return True
+
+            exhausted = False
+            while True:
+                # 取り出されていない結果も数に入れて、溜まりすぎないようにする
+                while not exhausted and len(pending) + len(finished) < self.max_pending:
+                    if not submit():
+                        exhausted = True
+                        break
+                    submitted += 1
+                if not pending:
+                    break
+                done, not_done = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    index, job, stage, fetched = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        finished[index] = FetchResult(job, error=e)
+                        continue
+                    if stage == "fetch":
+                        station, url, content = result
+                        parse_future = parse_executor.submit(
+                            _parse, parser, content, job.data_frequency, station.station_type,
+                            job.date.year, job.date.month, job.date.day, url, self.as_, count_nulls)
+                        pending[parse_future] = (index, job, "parse", (station, url))
+                    else:
+                        station, url = fetched
+                        finished[index] = self._parsed(job, station, url, result)
+                if ordered:
+                    while next_index in finished:
+                        yield finished.pop(next_index)
+                        next_index += 1
+                else:
+                    for index in sorted(finished):
+                        yield finished.pop(index)
+
+
+def fetch_parsed(jobs, io_workers=DEFAULT_WORKERS, parse_workers=None, ordered=False, jma=None, as_=None,
+                 rate_limiter=_DEFAULT_RATE_LIMITER):
+    '''fetch_manyと同じだが、解析をプロセスで行う。引数はPipelineと同じ'''
+    pipeline = Pipeline(io_workers, parse_workers, jma=jma, as_=as_, rate_limiter=rate_limiter)
+    return pipeline.run(jobs, ordered)
@@ -0,0 +1,280 @@
+'''10分毎、1時間毎の行を一定の長さの区間毎に集計する
+
+行は時刻の区間の終わりを表す(01:00の行は00:00から01:00まで、24:00の行は翌日の00:00)。
+区間も同じく終わりの時刻をdtにし、(start, dt]の行を集計する。
+行は1つずつ読み、集計中の区間の値だけを持つので、期間が長くてもメモリは増えない。
+rollingを指定すると、区間をrolling毎にずらしながら重ねて集計する(移動最大など)。
+'''
+import collections
+import datetime
+import itertools
+import operator
+
+from .core import DATA_TYPE_HOURLY, DATA_TYPE_TEN_MINUTELY, InvalidDataFrequency
+
+# 集計の種類
+MEAN = "mean"
+MIN = "min"
+MAX = "max"
+SUM = "sum"
+LAST = "last"
+AGGREGATIONS = (MEAN, MIN, MAX, SUM, LAST)
+
+# 観測の間隔
+STEPS = {
+    DATA_TYPE_HOURLY: datetime.timedelta(hours=1),
+    DATA_TYPE_TEN_MINUTELY: datetime.timedelta(minutes=10),
+}
+
+# 区間の値の数が本来の数のこの割合に満たない場合はNoneにする
+DEFAULT_COMPLETENESS = 0.8
+
+# 区間の起点。1日を割り切る区間は毎日0時から始まる
+ORIGIN = datetime.datetime(2000, 1, 1)
+ONE_DAY = datetime.timedelta(days=1)
+
+# 和の桁。観測値は小数1桁なので、足し合わせた誤差だけを丸める
+SUM_DIGITS = 6
+
+# 品質情報。欠けた値があるが集計できた区間は準正常値にする
+QUALITY_INCOMPLETE = ")"
+
+
+class ResampledRow:
+    '''1区間の集計値。startは区間の始まり、dtは終わりの時刻'''
+
+    def __repr__(self):
+        return '<ResampledRow>' + ', '.join("%s: %s" % item for item in vars(self).items())
+
+    def __str__(self):
+        return self.__repr__()
+
+
+def _aggregations(how):
+    '''{列名: 集計の種類かそのリスト} -> [(出力名, 列名, 集計の種類)]
+
+    集計の種類が1つなら列名のまま、リストなら"列名_種類"を出力名にする。
+    '''
+    result = []
+    for name, aggregations in how.items():
+        if isinstance(aggregations, str):
+            outputs = [(name, aggregations)]
+        else:
+            outputs = [("{}_{}".format(name, aggregation), aggregation) for aggregation in aggregations]
+        for output, aggregation in outputs:
+            if aggregation not in AGGREGATIONS:
+                raise ValueError("unknown aggregation: {}".format(aggregation))
+            result.append((output, name, aggregation))
+    return result
+
+
+class Resampler:
+    '''行を区間毎の集計値(ResampledRow)にする
+
+    data_frequencyは元の行の頻度、windowは区間の長さ(datetime.timedelta)。
+    howは{列名: "mean", "min", "max", "sum", "last"のいずれかかそのリスト}。
+    Noneの値は集計しない。値の数(欠けた行を含む)が区間の本来の数のcompleteness倍に満たない列はNoneにする。
+    降水量の"--"(現象なし)もNoneになるので、0として集計する場合はfill={"precipitation": 0.0}のように
+    Noneの代わりの値を指定する。1つも行の無い区間は返さない。
+
+    rollingを指定すると、終わりの時刻がrolling(datetime.timedelta)毎の長さwindowの区間を重ねて集計する。
+    Trueなら元の行の間隔毎。例えば10分毎の行でwindow=1時間、rolling=Trueなら10分毎の過去1時間の最大値になる。
+    区間の中の値だけを持ち、最小値と最大値は単調なdequeで求めるので、この場合もメモリは増えない。
+    '''
+
+    def __init__(self, data_frequency, window, how, completeness=DEFAULT_COMPLETENESS, fill=None, rolling=None):
+        if data_frequency not in STEPS:
+            raise InvalidDataFrequency
+        step = STEPS[data_frequency]
+        if window <= datetime.timedelta(0) or window % step:
+            raise ValueError("window must be a multiple of {}".format(step))
+        if rolling is True:
+            rolling = step
+        if rolling:
+            if rolling <= datetime.timedelta(0) or rolling % step or rolling > window:
+                raise ValueError("rolling must be a multiple of {} and not longer than window".format(step))
+            if ONE_DAY % rolling and rolling % ONE_DAY:
+                raise ValueError("rolling must divide a day or be a multiple of a day")
+        elif ONE_DAY % window and window % ONE_DAY:
+            raise ValueError("window must divide a day or be a multiple of a day")
+        if not 0 <= completeness <= 1:
+            raise ValueError("completeness must be between 0 and 1")
+        self.data_frequency = data_frequency
+        self.window = window
+        self.step = step
+        # 重ねて集計する区間の間隔。Noneなら区間を重ねない
+        self.rolling = rolling or None
+        self.completeness = completeness
+        self.aggregations = _aggregations(how)
+        self.columns = list(collections.OrderedDict.fromkeys(name for output, name, aggregation in self.aggregations))
+        # 列毎のNoneの代わりの値
+        self.fill = [(fill or {}).get(name) for name in self.columns]
+        # [(出力名, 列の位置, 集計の種類)]
+        self._outputs = [(output, self.columns.index(name), aggregation) for output, name, aggregation in self.aggregations]
+        # 区間の本来の値の数
+        self.expected = window // step
+        self.minimum_count = completeness * self.expected
+
+    def _window_start(self, dt):
+        # dtの行は(dt - step, dt]を表す
+        return ORIGIN + ((dt - self.step - ORIGIN) // self.window) * self.window
+
+    def _window_end(self, dt):
+        # dtの行を含む最初の区間の終わり
+        return ORIGIN - ((ORIGIN - dt) // self.rolling) * self.rolling
+
+    def resample(self, rows):
+        '''rows(時刻順の行)を集計してResampledRowを返す'''
+        if self.rolling is not None:
+            return self._resample_rolling(rows)
+        return self._resample(rows)
+
+    def _resample(self, rows):
+        get_values = operator.attrgetter(*self.columns)
+        single = len(self.columns) == 1
+        number_of_columns = len(self.columns)
+        fill = self.fill
+        start = None
+        last_dt = None
+        for row in rows:
+            # 列数の合わない行は属性を持たない
+            dt = getattr(row, "dt", None)
+            if dt is None:
+                continue
+            if last_dt is not None and dt <= last_dt:
+                raise ValueError("rows must be in ascending order of dt: {} after {}".format(dt, last_dt))
+            last_dt = dt
+            window_start = self._window_start(dt)
+            if window_start != start:
+                if start is not None:
+                    yield self._row(start, counts, totals, minimums, maximums, lasts)
+                start = window_start
+                counts = [0] * number_of_columns
+                totals = [0] * number_of_columns
+                minimums = [None] * number_of_columns
+                maximums = [None] * number_of_columns
+                lasts = [None] * number_of_columns
+            values = get_values(row)
+            if single:
+                values = (values,)
+            for i, value in enumerate(values):
+                if value is None:
+                    value = fill[i]
+                    if value is None:
+                        continue
+                if counts[i]:
+                    totals[i] += value
+                    if value < minimums[i]:
+                        minimums[i] = value
+                    if value > maximums[i]:
+                        maximums[i] = value
+                else:
+                    totals[i] = minimums[i] = maximums[i] = value
+                counts[i] += 1
+                lasts[i] = value
+        if start is not None:
+            yield self._row(start, counts, totals, minimums, maximums, lasts)
+
+    def _resample_rolling(self, rows):
+        get_values = operator.attrgetter(*self.columns)
+        single = len(self.columns) == 1
+        number_of_columns = len(self.columns)
+        fill = self.fill
+        # 区間の中の行の時刻と、列毎の(時刻, 値)。最小値と最大値の候補は値が単調になるように持つ
+        dts = collections.deque()
+        values = [collections.deque() for _ in range(number_of_columns)]
+        minimums = [collections.deque() for _ in range(number_of_columns)]
+        maximums = [collections.deque() for _ in range(number_of_columns)]
+        end = None
+        last_dt = None
+        for row in rows:
+            dt = getattr(row, "dt", None)
+            if dt is None:
+                continue
+            if last_dt is not None and dt <= last_dt:
+                raise ValueError("rows must be in ascending order of dt: {} after {}".format(dt, last_dt))
+            last_dt = dt
+            if end is None:
+                end = self._window_end(dt)
+            while dt > end:
+                self._expire(end - self.window, dts, values, minimums, maximums)
+                if dts:
+                    yield self._rolling_row(end, values, minimums, maximums)
+                    end += self.rolling
+                else:
+                    # 行の無い区間は飛ばす
+                    end = self._window_end(dt)
+            dts.append(dt)
+            row_values = get_values(row)
+            if single:
+                row_values = (row_values,)
+            for i, value in enumerate(row_values):
+                if value is None:
+                    value = fill[i]
+                    if value is None:
+                        continue
+                values[i].append((dt, value))
+                candidates = minimums[i]
+                while candidates and candidates[-1][1] >= value:
+                    candidates.pop()
+                candidates.append((dt, value))
+                candidates = maximums[i]
+                while candidates and candidates[-1][1] <= value:
+                    candidates.pop()
+                candidates.append((dt, value))
+        if end is not None:
+            self._expire(end - self.window, dts, values, minimums, maximums)
+            if dts:
+                yield self._rolling_row(end, values, minimums, maximums)
+
+    def _expire(self, start, dts, values, minimums, maximums):
+        '''start以前の行を区間から外す'''
+        while dts and dts[0] <= start:
+            dts.popleft()
+        for column in itertools.chain(values, minimums, maximums):
+            while column and column[0][0] <= start:
+                column.popleft()
+
+    def _rolling_row(self, end, values, minimums, maximums):
+        counts = [len(column) for column in values]
+        totals = [sum(value for dt, value in column) for column in values]
+        lasts = [column[-1][1] if column else None for column in values]
+        return self._row(end - self.window, counts, totals,
+                         [column[0][1] if column else None for column in minimums],
+                         [column[0][1] if column else None for column in maximums], lasts)
+
+    def _row(self, start, counts, totals, minimums, maximums, lasts):
+        row = ResampledRow()
+        row.start = start
+        row.dt = start + self.window
+        values = row.__dict__
+        quality = None
+        for output, i, aggregation in self._outputs:
+            count = counts[i]
+            if count == 0 or count < self.minimum_count:
+                values[output] = None
+                continue
+            if aggregation == MEAN:
+                value = totals[i] / count
+            elif aggregation == SUM:
+                value = totals[i]
+                if isinstance(value, float):
+                    value = round(value, SUM_DIGITS)
+            elif aggregation == MIN:
+                value = minimums[i]
+            elif aggregation == MAX:
+                value = maximums[i]
+            else:
+                value = lasts[i]
+            values[output] = value
+            if count < self.expected:
+                if quality is None:
+                    quality = {}
+                quality[output] = QUALITY_INCOMPLETE
+        row.quality = quality
+        return row
+
+
+def resample(rows, data_frequency, window, how, completeness=DEFAULT_COMPLETENESS, fill=None, rolling=None):
+    '''rowsを区間毎に集計する。引数はResamplerと同じ'''
+    return Resampler(data_frequency, window, how, completeness, fill, rolling).resample(rows)
@@ -0,0 +1,101 @@
+import collections
+import datetime
+
+from .core import WeatherDataRow, COLUMN_SPECS, DATA_TYPE_HOURLY, DATA_TYPE_TEN_MINUTELY, STATION_TYPE_S, STATION_TYPE_A
+
+_row = WeatherDataRow()
+
+
+class PageContext:
+    '''1ページの行で共有する情報'''
+
+    __slots__ = ("url", "station_type", "date")
+
+    def __init__(self, url, station_type, date):
+        self.url = url
+        self.station_type = station_type
+        self.date = date
+
+    def __repr__(self):
+        return '<PageContext>' + ', '.join("%s: %s" % (name, getattr(self, name)) for name in self.__slots__)
+
+
+class CompactWeatherDataRow(tuple):
+    '''tupleで値を持つ行。属性名とreprはWeatherDataRowと同じ'''
+
+    __slots__ = ()
+    _fields = ()
+
+    @property
+    def type(self):
+        return self[0].station_type
+
+    @property
+    def url(self):
+        return self[0].url
+
+    def __repr__(self):
+        items = [("type", self.type), ("url", self.url)]
+        items.extend(zip(self._fields[1:], self[1:]))
+        return '<WeatherDataRow>' + ', '.join("%s: %s" % item for item in items)
+
+    def __str__(self):
+        return self.__repr__()
+
+    def _asdict(self):
+        '''vars(WeatherDataRow)と同じdict'''
+        items = [("type", self.type), ("url", self.url)]
+        items.extend(zip(self._fields[1:], self[1:]))
+        return collections.OrderedDict(items)
+
+
+def _compact_row_class(name, data_frequency, station_type):
+    specs = COLUMN_SPECS[(data_frequency, station_type)]
+    namespace = {"__slots__": (), "_fields": ("page", "dt") + tuple(spec.name for spec in specs) + ("quality",)}
+    for index, field_name in enumerate(namespace["_fields"]):
+        namespace[field_name] = property(lambda self, index=index: self[index])
+    return type(name, (CompactWeatherDataRow,), namespace)
+
+
+CompactHourlyWeatherDataRowS = _compact_row_class("CompactHourlyWeatherDataRowS", DATA_TYPE_HOURLY, STATION_TYPE_S)
+CompactHourlyWeatherDataRowA = _compact_row_class("CompactHourlyWeatherDataRowA", DATA_TYPE_HOURLY, STATION_TYPE_A)
+CompactTenMinutelyWeatherDataRowS = _compact_row_class("CompactTenMinutelyWeatherDataRowS", DATA_TYPE_TEN_MINUTELY, STATION_TYPE_S)
+CompactTenMinutelyWeatherDataRowA = _compact_row_class("CompactTenMinutelyWeatherDataRowA", DATA_TYPE_TEN_MINUTELY, STATION_TYPE_A)
+
+# (frequency, station_type) -> 行のクラス
+COMPACT_ROW_CLASSES = {
+    (DATA_TYPE_HOURLY, STATION_TYPE_S): CompactHourlyWeatherDataRowS,
+    (DATA_TYPE_HOURLY, STATION_TYPE_A): CompactHourlyWeatherDataRowA,
+    (DATA_TYPE_TEN_MINUTELY, STATION_TYPE_S): CompactTenMinutelyWeatherDataRowS,
+    (DATA_TYPE_TEN_MINUTELY, STATION_TYPE_A): CompactTenMinutelyWeatherDataRowA,
+}
+
+
+def compact_rows(table_rows, data_frequency, station_type, year, month, day, url):
+    '''1ページ分の表の行をCompactWeatherDataRowにする'''
+    specs = COLUMN_SPECS[(data_frequency, station_type)]
+    row_class = COMPACT_ROW_CLASSES[(data_frequency, station_type)]
+    new_row = tuple.__new__
+    convert_weather_img = _row._convert_weather_img
+    parse_time_value = _row._parse_time_value
+    page = PageContext(url, station_type, datetime.date(year, month, day))
+    midnight = datetime.datetime(year, month, day)
+    decoders = [(spec.name, spec.decode) for spec in specs]
+    number_of_columns = len(specs) + 1
+    for cells in table_rows:
+        if len(cells) != number_of_columns:
+            continue
+        values = [page, parse_time_value(midnight, cells[0].text)]
+        quality = None
+        for cell, (name, decode) in zip(cells[1:], decoders):
+            if decode is None:
+                values.append(convert_weather_img(cell))
+                continue
+            value, flag = decode(cell.text)
+            values.append(value)
+            if flag is not None:
+                if quality is None:
+                    quality = {}
+                quality[name] = flag
+        values.append(quality)
+        yield new_row(row_class, values)
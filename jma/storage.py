@@ -0,0 +1,52 @@
+'''ファイルへの保存とJSONの変換で共通に使う関数'''
+import contextlib
+import datetime
+import json
+import os
+import threading
+
+# JSONに保存する日付の書式
+DATE_FORMAT = "%Y-%m-%d"
+
+
+@contextlib.contextmanager
+def replacing(path, hidden=False):
+    '''一時ファイルのパスを返し、ブロックを抜けたらpathをそのファイルで置き換える
+
+    書き込み途中のファイルを読まないようにするため。一時ファイルの名前にはプロセスとスレッドを入れ、
+    同じpathに同時に保存しても互いの一時ファイルを壊さない。失敗した場合は一時ファイルを消す。
+    hiddenなら一時ファイルの名前を.で始める(ディレクトリを読む側に無視させる)。
+    '''
+    directory, name = os.path.split(path)
+    tmp_name = "{}{}.{}.{}.tmp".format("." if hidden else "", name, os.getpid(), threading.get_ident())
+    tmp_path = os.path.join(directory, tmp_name)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json(path, data, **kwargs):
+    '''dataをJSONにしてpathを置き換える。kwargsはjson.dumpに渡す'''
+    with replacing(path) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, **kwargs)
+
+
+def params_to_json(params):
+    '''地点情報のdictをJSONにできる形にしたコピー(observation_end_dateを文字列にする)'''
+    params = dict(params)
+    if params["observation_end_date"] is not None:
+        params["observation_end_date"] = params["observation_end_date"].strftime(DATE_FORMAT)
+    return params
+
+
+def params_from_json(params):
+    '''params_to_jsonの逆'''
+    params = dict(params)
+    if params["observation_end_date"] is not None:
+        params["observation_end_date"] = datetime.datetime.strptime(params["observation_end_date"], DATE_FORMAT).date()
+    return params
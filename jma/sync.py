@@ -0,0 +1,176 @@
+import concurrent.futures
+import datetime
+import json
+import threading
+
+from .clock import jst_today
+from .core import (Station, DateRangeData, DataNotFoundError, OUTPUT_COMPACT, DEFAULT_PREFETCH, FutureDateError,
+                   DATA_TYPE_HOURLY, DATA_TYPE_TEN_MINUTELY, InvalidDataFrequency, _row_values)
+from .storage import write_json
+
+# この日数より前の日のページは、最後の行が欠測でも完成したものとみなす
+SETTLE_DAYS = 1
+WATERMARK_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+class WatermarkStore:
+    '''(地点, 頻度)毎に取得済みの最後の時刻(watermark)を保持する
+
+    pathを指定した場合はJSONファイルに保存する。
+    行はsink(station, data_frequency, date, rows)に渡すか、write_rowsを上書きして保存する。
+    '''
+
+    def __init__(self, path=None, sink=None):
+        self.path = path
+        self.sink = sink
+        # "prec_no/block_no/data_frequency" -> datetime
+        self._watermarks = {}
+        self._lock = threading.RLock()
+        if path is not None:
+            self._load()
+
+    def _key(self, station, data_frequency):
+        return "{}/{}/{}".format(station.prec_no, station.block_no, data_frequency)
+
+    def get_watermark(self, station, data_frequency):
+        '''取得済みの最後の時刻。まだ無ければNone'''
+        with self._lock:
+            return self._watermarks.get(self._key(station, data_frequency))
+
+    def write_rows(self, station, data_frequency, date, rows):
+        if self.sink is not None:
+            self.sink(station, data_frequency, date, rows)
+
+    def commit(self, station, data_frequency, date, rows, watermark):
+        '''1日分の新しい行を保存してwatermarkを進める'''
+        self.write_rows(station, data_frequency, date, rows)
+        with self._lock:
+            self._watermarks[self._key(station, data_frequency)] = watermark
+            if self.path is not None:
+                self._save()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, value in data.items():
+            self._watermarks[key] = datetime.datetime.strptime(value, WATERMARK_FORMAT)
+
+    def _save(self):
+        data = {key: value.strftime(WATERMARK_FORMAT) for key, value in self._watermarks.items()}
+        write_json(self.path, data, sort_keys=True)
+
+
+class SyncResult:
+    '''1地点分のsyncの結果
+
+    daysは保存した日数、rowsは保存した行数。途中で取得できなかった日があればerrorに例外が入る。
+    観測が終了していて取得する日が無い地点はskippedがTrue。
+    '''
+
+    def __init__(self, station, data_frequency, watermark, days=0, rows=0, error=None, skipped=False):
+        self.station = station
+        self.data_frequency = data_frequency
+        self.watermark = watermark
+        self.days = days
+        self.rows = rows
+        self.error = error
+        self.skipped = skipped
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return '<SyncResult>' + ', '.join("%s: %s" % item for item in vars(self).items() if item[0] != "station")
+
+    def __str__(self):
+        return self.__repr__()
+
+
+def page_watermark(rows, date, today):
+    '''1日分の行から(完成したか, 値のある最後の時刻)を返す
+
+    最後の行(24:00)に値があるか、SETTLE_DAYSより前の日なら完成とする。
+    '''
+    last = None
+    for row in rows:
+        if any(value is not None for value in _row_values(row)):
+            last = row.dt
+    next_day = datetime.datetime(date.year, date.month, date.day) + datetime.timedelta(days=1)
+    if last == next_day or date < today - datetime.timedelta(days=SETTLE_DAYS):
+        return True, next_day
+    return False, last
+
+
+def _sync_station(jma, station, data_frequency, store, start, today, prefetch, as_):
+    if not isinstance(station, Station):
+        try:
+            station = jma.get_station(*station)
+        except Exception as e:
+            return SyncResult(station, data_frequency, None, error=e)
+    watermark = store.get_watermark(station, data_frequency)
+    # watermarkの日から取得する(00:00の場合はその日、途中の場合は同じ日を取り直す)
+    first = watermark.date() if watermark is not None else (start if start is not None else today)
+    last = today
+    if station.observation_end_date is not None:
+        last = min(last, station.observation_end_date)
+    result = SyncResult(station, data_frequency, watermark)
+    if first > last:
+        result.skipped = station.observation_end_date is not None and first > station.observation_end_date
+        return result
+
+    data = DateRangeData(jma, station, first, last, data_frequency, prefetch)
+
+    def skip_missing_days(expected, until):
+        '''取得できなかった日を進める。観測の無かった過去の日は空の日として保存する'''
+        while expected < until:
+            error = data.errors.get(expected)
+            if not (isinstance(error, DataNotFoundError) and expected < today):
+                # 当日のページがまだ無いのはエラーにしない
+                if not (isinstance(error, FutureDateError) and expected >= today):
+                    result.error = error
+                return None
+            result.watermark = datetime.datetime.combine(expected + datetime.timedelta(days=1), datetime.time())
+            store.commit(station, data_frequency, expected, [], result.watermark)
+            result.days += 1
+            expected += datetime.timedelta(days=1)
+        return expected
+
+    expected = first
+    for date, url, table_rows in data._tables():
+        expected = skip_missing_days(expected, date)
+        if expected is None:
+            return result
+        rows = list(jma._rows(table_rows, data_frequency, station.station_type, date.year, date.month, date.day, url, as_))
+        complete, page_last = page_watermark(rows, date, today)
+        if page_last is not None and (result.watermark is None or page_last > result.watermark):
+            new_rows = [row for row in rows
+                        if row.dt <= page_last and (result.watermark is None or row.dt > result.watermark)]
+            store.commit(station, data_frequency, date, new_rows, page_last)
+            result.watermark = page_last
+            result.days += 1
+            result.rows += len(new_rows)
+        # 未完成の日の後は次回に取り直す
+        if not complete:
+            return result
+        expected = date + datetime.timedelta(days=1)
+    skip_missing_days(expected, last + datetime.timedelta(days=1))
+    return result
+
+
+def sync(jma, stations, data_frequency, store, start=None, workers=1, prefetch=DEFAULT_PREFETCH, as_=None):
+    '''地点毎にwatermarkより後の行だけを取得してstoreに保存し、SyncResultのリストを返す'''
+    if data_frequency not in (DATA_TYPE_HOURLY, DATA_TYPE_TEN_MINUTELY):
+        raise InvalidDataFrequency
+    if as_ not in (None, OUTPUT_COMPACT):
+        raise ValueError("as_ must be None or {!r}".format(OUTPUT_COMPACT))
+    if isinstance(start, datetime.datetime):
+        start = start.date()
+    today = jst_today()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_sync_station, jma, station, data_frequency, store, start, today, prefetch, as_)
+                   for station in stations]
+        return [future.result() for future in futures]
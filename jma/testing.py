@@ -0,0 +1,118 @@
+import datetime
+import http.server
+import os
+import posixpath
+import socketserver
+import threading
+import urllib.parse
+
+from .clock import jst_today
+
+# inject_errorsに渡すと、chunkの途中で接続を切る
+TRUNCATED_CHUNK = "truncated_chunk"
+
+def fixture_name(url):
+    '''URLに対応するfixtureのファイル名'''
+    parsed = urllib.parse.urlparse(url)
+    name = posixpath.basename(parsed.path)[:-len(".php")]
+    query = urllib.parse.parse_qs(parsed.query)
+    if name == "prefecture":
+        name = "prefecture_{}".format(query["prec_no"][0])
+    elif "year" in query:
+        date = datetime.date(int(query["year"][0]), int(query.get("month", ["1"])[0]), int(query.get("day", ["1"])[0]))
+        if date > jst_today():
+            name = "future"
+    return name + ".html"
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class _FixtureRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # ヘッダと本文を別々に送るのでNagleで遅延しないようにする
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server.fixture_server
+        status = server._next_error()
+        if status == TRUNCATED_CHUNK:
+            server._record(self.path)
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.write(b"400\r\n" + b"<html>" * 16)
+            self.close_connection = True
+            return
+        if status is not None:
+            server._record(self.path)
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        path = os.path.join(server.fixtures_dir, fixture_name(self.path))
+        if not os.path.exists(path):
+            path = os.path.join(server.fixtures_dir, "empty.html")
+        with open(path, "rb") as f:
+            body = f.read()
+        server._record(self.path)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    '''fixturesのHTMLをJMAと同じURL構成で返すローカルサーバ
+
+    base_urlをJma(base_url=...)に渡すとネットワークに出ずに動作を確認できる。
+    '''
+
+    def __init__(self, fixtures_dir, host="127.0.0.1", port=0):
+        self.fixtures_dir = fixtures_dir
+        self.requested_urls = []
+        # 次のリクエストから順に返すエラーのステータスかTRUNCATED_CHUNK
+        self.errors = []
+        self._lock = threading.Lock()
+        self._httpd = _ThreadingHTTPServer((host, port), _FixtureRequestHandler)
+        self._httpd.fixture_server = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return "http://{}:{}/obd/stats/etrn".format(host, port)
+
+    def _record(self, path):
+        with self._lock:
+            self.requested_urls.append(path)
+
+    def _next_error(self):
+        with self._lock:
+            return self.errors.pop(0) if self.errors else None
+
+    def inject_errors(self, *statuses):
+        '''次のリクエストから順にstatusesのエラーを返す。TRUNCATED_CHUNKは本文の途中で接続を切る'''
+        with self._lock:
+            self.errors.extend(statuses)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,145 @@
+import os
+import random
+import threading
+import time
+
+# (接続, 読み込み)のタイムアウト(秒)
+DEFAULT_TIMEOUT = (5.0, 30.0)
+DEFAULT_RETRIES = 3
+# 再試行の待ち時間の基準(秒)。試行毎に倍にしてジッタを入れる
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30.0
+DEFAULT_POOL_SIZE = 10
+# streamで読み込む大きさ(bytes)
+DEFAULT_CHUNK_SIZE = 16 * 1024
+
+# 再試行するHTTPステータス
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class Transport:
+    '''HTTPの取得を担当する
+
+    タイムアウト、失敗時の再試行(指数バックオフ+ジッタ)、コネクションプールの大きさを設定できる。
+    requests.Sessionは最初のリクエストの時に作る。forkした子プロセスでは親のSessionを使わずに作り直す。
+    '''
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_backoff=DEFAULT_MAX_BACKOFF, pool_size=DEFAULT_POOL_SIZE, session=None):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+        self._session = session
+        # Sessionを作ったプロセス
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    self._session = self._create_session()
+                    self._pid = os.getpid()
+        return self._session
+
+    def _create_session(self):
+        # requestsはimportが重いので使う時に読み込む
+        import requests
+        import requests.adapters
+        session = requests.Session()
+        # 再試行はこのクラスで行う
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["Accept-Encoding"] = "gzip, deflate"
+        return session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _wait(self, attempt, retry_after=None):
+        time.sleep(retry_delay(attempt, self.backoff, self.max_backoff, retry_after))
+
+    def _send(self, url, rate_limiter, stream):
+        '''ステータスが200のResponseを返す。失敗した場合はTransportErrorかHTTPStatusError'''
+        attempt = 0
+        while True:
+            if rate_limiter is not None:
+                rate_limiter.acquire(url)
+            retry_after = None
+            try:
+                r = self.session.get(url, timeout=self.timeout, stream=stream)
+            except _retryable_errors() as e:
+                if attempt >= self.retries:
+                    raise TransportError(url, e)
+            else:
+                if r.status_code == 200:
+                    return r
+                r.close()
+                if r.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.retries:
+                    raise HTTPStatusError(url, r.status_code)
+                retry_after = _retry_after(r)
+            self._wait(attempt, retry_after)
+            attempt += 1
+
+    def get(self, url, rate_limiter=None):
+        '''ページの内容(bytes)を返す。失敗した場合はTransportErrorかHTTPStatusError'''
+        return self._send(url, rate_limiter, False).content
+
+    def stream(self, url, rate_limiter=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        '''ページの内容をchunk_size bytesずつ返すイテレータ
+
+        再試行するのは本文を読み始める前まで。読み込み中に失敗した場合はTransportError。
+        '''
+        response = self._send(url, rate_limiter, True)
+        try:
+            for chunk in response.iter_content(chunk_size):
+                yield chunk
+        except _retryable_errors() as e:
+            raise TransportError(url, e)
+        finally:
+            response.close()
+
+
+def retry_delay(attempt, backoff=DEFAULT_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF, retry_after=None):
+    '''attempt回目(0から)の失敗の後に待つ秒数。Retry-Afterがあればそれに従う'''
+    if retry_after is not None:
+        return min(max_backoff, retry_after)
+    return random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+
+
+def _retryable_errors():
+    '''再試行する通信の例外。本文の途中で接続が切れた場合も含む'''
+    import requests
+    return (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+            requests.exceptions.ContentDecodingError)
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+class TransportError(Exception):
+    "Request failed after retries"
+
+    def __init__(self, url, cause=None):
+        super().__init__(url, cause)
+        self.url = url
+        self.cause = cause
+
+
+class HTTPStatusError(TransportError):
+    "Server returned an error status"
+
+    def __init__(self, url, status_code):
+        super().__init__(url)
+        self.args = (url, status_code)
+        self.status_code = status_code
@@ -0,0 +1,216 @@
+'''当日の観測値のページを繰り返し取得して、新しく公開された行だけを返す
+
+    scheduler = WatchScheduler(jma, interval=300)
+    scheduler.add(("51", "47636"), "ten_minutely")
+    scheduler.add(("51", "0467"), "ten_minutely")
+    for watch, rows in scheduler.run():
+        ...
+
+地点毎に返した最後の行の時刻を覚えておき、その日のページから後の行だけを返す。
+24時の行(翌日の0時)まで返したら次の日のページに移る。
+新しい行が無ければ確認の間隔を延ばし、新しい行があれば元の間隔に戻す。
+'''
+import concurrent.futures
+import datetime
+import hashlib
+import heapq
+import itertools
+import threading
+import time
+
+from .clock import jst_now
+from .core import Station, DataNotFoundError, FutureDateError, InvalidDataFrequency, OUTPUT_COMPACT
+from .resample import STEPS
+from .sync import page_watermark
+from .transport import TransportError
+
+# 新しい行を確認する間隔(秒)
+DEFAULT_WATCH_INTERVAL = 5 * 60
+# 新しい行が無い場合に間隔を延ばす倍率と、その上限(秒)
+DEFAULT_WATCH_BACKOFF = 2.0
+DEFAULT_MAX_WATCH_INTERVAL = 30 * 60
+# 日付が変わってからこの時間が経てば、前日のページは24時の行が無くても完成とする
+DEFAULT_SETTLE = datetime.timedelta(hours=1)
+# 同時に取得する地点の数
+DEFAULT_WATCH_WORKERS = 4
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+class Watch:
+    '''1地点・頻度の監視の状態
+
+    lastは返した最後の行の時刻で、次はlastの日のページを取得する
+    (24時の行はその日のページにあるので、lastが0時なら前日のページは返し終わっている)。
+    delayは次に確認するまでの秒数。errorは最後の確認で起きた通信のエラー。
+    '''
+
+    def __init__(self, station, data_frequency, last, interval=DEFAULT_WATCH_INTERVAL,
+                 max_interval=DEFAULT_MAX_WATCH_INTERVAL, backoff=DEFAULT_WATCH_BACKOFF, settle=DEFAULT_SETTLE, as_=None):
+        self.station = station
+        self.data_frequency = data_frequency
+        self.last = last
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.settle = settle
+        self.as_ = as_
+        self.delay = interval
+        self.error = None
+        # 最後に取得したページの(URL, 内容のハッシュ, 行のリストかNone)。変わっていなければ解析しない
+        self._page = None
+
+    def __repr__(self):
+        return '<Watch>' + ', '.join("%s: %s" % item for item in (
+            ("block_no", self.station.block_no), ("data_frequency", self.data_frequency), ("last", self.last),
+            ("delay", self.delay)))
+
+    def __str__(self):
+        return self.__repr__()
+
+    def _page_rows(self, jma, date):
+        '''date日のページの行のリスト。まだ公開されていなければNone'''
+        station = self.station
+        url = jma._construct_url(station.prec_no, station.block_no, station.station_type,
+                                 date.year, date.month, date.day, data_frequenry=self.data_frequency)
+        # 当日のページはキャッシュの有効期間中も更新されるので、キャッシュは使わない
+        content = jma._get(url, use_cache=False)
+        digest = hashlib.sha1(content).digest()
+        if self._page is not None and self._page[:2] == (url, digest):
+            return self._page[2]
+        try:
+            table_rows = jma._parse_page(content, url)
+        except (FutureDateError, DataNotFoundError):
+            rows = None
+        else:
+            rows = list(jma._rows(table_rows, self.data_frequency, station.station_type,
+                                  date.year, date.month, date.day, url, self.as_))
+        self._page = (url, digest, rows)
+        return rows
+
+    def advance(self, rows, date, now):
+        '''date日のページの行からlastより後の公開された行を返してlastを進める。(新しい行, 完成したか)を返す
+
+        値のある最後の行までを公開されたものとする。24時の行に値があるか、
+        日付が変わってからsettleが経った日のページは完成とする。
+        '''
+        complete, page_last = page_watermark(rows, date, now.date())
+        next_day = datetime.datetime.combine(date + ONE_DAY, datetime.time())
+        if not complete and now >= next_day + self.settle:
+            complete, page_last = True, next_day
+        new_rows = []
+        if page_last is not None and page_last > self.last:
+            new_rows = [row for row in rows if self.last < row.dt <= page_last]
+            self.last = page_last
+        return new_rows, complete
+
+    def poll(self, jma, now):
+        '''新しく公開された行のリストを返す。日付が変わっていれば次の日のページも続けて取得する'''
+        new_rows = []
+        self.error = None
+        while True:
+            date = self.last.date()
+            try:
+                rows = self._page_rows(jma, date)
+            except TransportError as e:
+                self.error = e
+                break
+            if rows is None:
+                break
+            rows, complete = self.advance(rows, date, now)
+            new_rows.extend(rows)
+            if not complete:
+                break
+        return new_rows
+
+    def schedule(self, found):
+        '''次に確認するまでの秒数。新しい行が無ければ延ばす'''
+        if found:
+            self.delay = self.interval
+        else:
+            self.delay = min(self.max_interval, self.delay * self.backoff)
+        return self.delay
+
+
+class WatchScheduler:
+    '''複数の地点の監視をまとめて行う
+
+    確認する時刻が来た地点をworkersのスレッドで同時に取得する。
+    Jmaのrate_limiterとコネクションプールは全ての地点で共有する。ページはJmaのcacheを使わずに毎回取得する。
+    nowは日本時間の現在の日時を返す関数(テスト用)。
+    '''
+
+    def __init__(self, jma, interval=DEFAULT_WATCH_INTERVAL, max_interval=DEFAULT_MAX_WATCH_INTERVAL,
+                 backoff=DEFAULT_WATCH_BACKOFF, settle=DEFAULT_SETTLE, workers=DEFAULT_WATCH_WORKERS, as_=None, now=None):
+        if as_ not in (None, OUTPUT_COMPACT):
+            raise ValueError("as_ must be None or {!r}".format(OUTPUT_COMPACT))
+        if jma.offline:
+            raise ValueError("watch requires an online Jma")
+        self.jma = jma
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.settle = settle
+        self.workers = workers
+        self.as_ = as_
+        self._now = now if now is not None else jst_now
+        # (確認する時刻(time.monotonic), 追加した順, Watch)のヒープ
+        self._queue = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def add(self, station, data_frequency, since=None):
+        '''監視する地点を追加してWatchを返す
+
+        stationはStationか(prec_no, block_no)。地点情報はここで1回だけ引く。
+        sinceより後の行を返す。省略した場合は日本時間の当日の0時より後。
+        '''
+        if data_frequency not in STEPS:
+            raise InvalidDataFrequency
+        if not isinstance(station, Station):
+            station = self.jma.get_station(*station)
+        if since is None:
+            since = datetime.datetime.combine(self._now().date(), datetime.time())
+        watch = Watch(station, data_frequency, since, self.interval, self.max_interval, self.backoff, self.settle, self.as_)
+        with self._lock:
+            heapq.heappush(self._queue, (time.monotonic(), next(self._counter), watch))
+        return watch
+
+    def stop(self):
+        '''runを終える。他のスレッドから呼んでもよい'''
+        self._stopped.set()
+
+    def _due(self):
+        '''確認する時刻が来たWatchのリストと、次の時刻までの秒数'''
+        with self._lock:
+            if not self._queue:
+                return [], None
+            clock = time.monotonic()
+            due = []
+            while self._queue and self._queue[0][0] <= clock:
+                due.append(heapq.heappop(self._queue)[2])
+            return due, (self._queue[0][0] - clock if not due else 0)
+
+    def run(self):
+        '''(Watch, 新しい行のリスト)を返し続ける。stopを呼ぶか地点が無くなれば終わる'''
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while not self._stopped.is_set():
+                due, delay = self._due()
+                if delay is None:
+                    return
+                if not due:
+                    self._stopped.wait(delay)
+                    continue
+                now = self._now()
+                futures = [(watch, executor.submit(watch.poll, self.jma, now)) for watch in due]
+                for watch, future in futures:
+                    rows = future.result()
+                    delay = watch.schedule(bool(rows))
+                    with self._lock:
+                        heapq.heappush(self._queue, (time.monotonic() + delay, next(self._counter), watch))
+                    if rows:
+                        yield watch, rows
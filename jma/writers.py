@@ -0,0 +1,181 @@
+import os
+import threading
+
+from .columns import SCHEMAS, FLOAT, INT
+from .storage import replacing
+
+# メモリに溜める行数
+DEFAULT_BATCH_SIZE = 10000
+
+
+def _coerce(value, kind):
+    '''値を列の型にする。数値の列の数値でない値はNoneにする'''
+    if value is None:
+        return None
+    if kind == FLOAT:
+        return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+    if kind == INT:
+        return value if isinstance(value, int) and not isinstance(value, bool) else None
+    # 雲量などの文字列の列は数値になっている場合がある
+    return str(value)
+
+
+class _BatchWriter:
+    '''行をパーティション毎にbatch_size行まで溜めてから書き込む'''
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        # パーティション -> 行の値のリスト
+        self._batches = {}
+        self._buffered = 0
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # 例外の場合は溜めた行を捨てる
+        if exc_type is None:
+            self.close()
+        else:
+            self._batches.clear()
+            self._close()
+
+    def _partition(self, station, data_frequency, row):
+        raise NotImplementedError
+
+    def _write_batch(self, partition, data_frequency, station_type, values):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def write(self, station, data_frequency, rows):
+        '''get_hourly_data/get_ten_minutely_dataの行(compactも可)を書き込む'''
+        names = [name for name, kind in SCHEMAS[(data_frequency, station.station_type)]]
+        with self._lock:
+            for row in rows:
+                key = (data_frequency, station.station_type, self._partition(station, data_frequency, row))
+                self._batches.setdefault(key, []).append(
+                    [station.prec_no, station.block_no, row.dt] + [getattr(row, name) for name in names])
+                self._buffered += 1
+                if self._buffered >= self.batch_size:
+                    self.flush()
+
+    def sink(self, station, data_frequency, date, rows):
+        '''WatermarkStoreのsinkに渡す。watermarkを進める前に書き込みを終える'''
+        self.write(station, data_frequency, rows)
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            batches = self._batches
+            self._batches = {}
+            self._buffered = 0
+            for (data_frequency, station_type, partition), values in batches.items():
+                self._write_batch(partition, data_frequency, station_type, values)
+
+    def close(self):
+        self.flush()
+        self._close()
+
+
+class ParquetWriter(_BatchWriter):
+    '''行をParquetファイルに書き込む
+
+    path/{data_frequency}_{station_type}/prec_no=../block_no=../year=../part-{年月}.parquet の構成にする。
+    ファイルは月毎に1つで、既にあるファイルには時刻(dt)が同じ行を置き換えて書き足す。
+    同じ日を別のbatch_sizeや範囲で書き直しても行は重複しない。
+    ファイルは一時ファイルに書いてから置き換えるので、途中で止まっても書きかけのファイルは残らない。
+    pyarrowが必要。
+    '''
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, compression="snappy"):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("ParquetWriter requires pyarrow. Install it with `pip install jma[parquet]`.")
+        super().__init__(batch_size)
+        self._pyarrow = pyarrow
+        self.path = path
+        self.compression = compression
+
+    def _partition(self, station, data_frequency, row):
+        # 24:00の行は翌日の00:00なので、年月はページの日付ではなく時刻で分ける
+        return (station.prec_no, station.block_no, row.dt.year, row.dt.month)
+
+    def _arrow_schema(self, data_frequency, station_type):
+        pa = self._pyarrow
+        types = {FLOAT: pa.float64(), INT: pa.int64()}
+        fields = [pa.field("prec_no", pa.string()), pa.field("block_no", pa.string()), pa.field("dt", pa.timestamp("s"))]
+        fields.extend(pa.field(name, types.get(kind, pa.string())) for name, kind in SCHEMAS[(data_frequency, station_type)])
+        return pa.schema(fields)
+
+    def _write_batch(self, partition, data_frequency, station_type, values):
+        pa = self._pyarrow
+        prec_no, block_no, year, month = partition
+        schema = self._arrow_schema(data_frequency, station_type)
+        kinds = [kind for name, kind in SCHEMAS[(data_frequency, station_type)]]
+        directory = os.path.join(self.path, "{}_{}".format(data_frequency, station_type),
+                                 "prec_no={}".format(prec_no), "block_no={}".format(block_no), "year={}".format(year))
+        path = os.path.join(directory, "part-{:04d}{:02d}.parquet".format(year, month))
+        # dt -> 行の値。既にあるファイルの行に新しい行を上書きする
+        rows = {}
+        if os.path.exists(path):
+            existing = self._pyarrow.parquet.read_table(path).to_pydict()
+            for row in zip(*(existing[field.name] for field in schema)):
+                rows[row[2]] = row
+        rows.update((row[2], row) for row in values)
+        values = [rows[dt] for dt in sorted(rows)]
+        arrays = [pa.array([row[index] for row in values], type=schema[index].type) for index in range(3)]
+        arrays.extend(pa.array([_coerce(row[index], kind) for row in values], type=schema[index].type)
+                      for index, kind in enumerate(kinds, start=3))
+        table = pa.Table.from_arrays(arrays, schema=schema)
+
+        os.makedirs(directory, exist_ok=True)
+        with replacing(path, hidden=True) as tmp_path:
+            self._pyarrow.parquet.write_table(table, tmp_path, compression=self.compression)
+
+
+class SqliteWriter(_BatchWriter):
+    '''行をSQLiteに書き込む
+
+    (data_frequency, station_type)毎に{data_frequency}_{station_type}のテーブルを作り、
+    (block_no, dt)が同じ行は置き換える。batch_size行毎に1つのトランザクションで書き込む。
+    '''
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__(batch_size)
+        import sqlite3
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._tables = set()
+
+    def _partition(self, station, data_frequency, row):
+        return None
+
+    def _table(self, data_frequency, station_type):
+        name = "{}_{}".format(data_frequency, station_type)
+        if name not in self._tables:
+            types = {FLOAT: "REAL", INT: "INTEGER"}
+            columns = ["prec_no TEXT NOT NULL", "block_no TEXT NOT NULL", "dt TEXT NOT NULL"]
+            columns.extend("{} {}".format(column, types.get(kind, "TEXT")) for column, kind in SCHEMAS[(data_frequency, station_type)])
+            with self.connection:
+                self.connection.execute("CREATE TABLE IF NOT EXISTS {} ({}, PRIMARY KEY (block_no, dt))".format(name, ", ".join(columns)))
+            self._tables.add(name)
+        return name
+
+    def _write_batch(self, partition, data_frequency, station_type, values):
+        table = self._table(data_frequency, station_type)
+        schema = SCHEMAS[(data_frequency, station_type)]
+        kinds = [kind for name, kind in schema]
+        placeholders = ", ".join("?" * (len(schema) + 3))
+        sql = "INSERT OR REPLACE INTO {} VALUES ({})".format(table, placeholders)
+        rows = ([prec_no, block_no, dt.strftime("%Y-%m-%d %H:%M:%S")] + [_coerce(value, kind) for value, kind in zip(row, kinds)]
+                for prec_no, block_no, dt, *row in values)
+        with self.connection:
+            self.connection.executemany(sql, rows)
+
+    def _close(self):
+        self.connection.close()
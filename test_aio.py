@@ -0,0 +1,147 @@
+import unittest
+import asyncio
+import datetime
+
+import jma
+from jma.aio import AsyncJma, AsyncSingleFlight
+from jma.testing import TRUNCATED_CHUNK
+
+from test_jma import FixtureServerTestCase
+
+
+class AsyncJmaTestCase(FixtureServerTestCase):
+    """AsyncJma test cases."""
+
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    def async_jma(self, **kwargs):
+        return AsyncJma(catalog=jma.StationCatalog(), base_url=self.server.base_url, **kwargs)
+
+    def test_get_prefectures(self):
+        async def collect():
+            async with self.async_jma() as aj:
+                return [prefecture async for prefecture in aj.get_prefectures()]
+        self.assertEqual(len(self.run_async(collect())), 61)
+
+    # 同期版と同じ行を返す
+    def test_get_hourly_data(self):
+        async def collect():
+            async with self.async_jma() as aj:
+                return [row async for row in aj.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28)]
+        rows = self.run_async(collect())
+        expected = list(self.jma.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28))
+        self.assertEqual([vars(row) for row in rows], [vars(row) for row in expected])
+
+    def test_get_ten_minutely_data_concurrently(self):
+        async def collect(aj, day):
+            return [row async for row in aj.get_ten_minutely_data(self.prec_no, self.block_no_okazaki, 2018, 9, day)]
+
+        async def main():
+            async with self.async_jma(concurrency=2) as aj:
+                return await asyncio.gather(*[collect(aj, day) for day in range(1, 6)])
+        results = self.run_async(main())
+        self.assertEqual([len(rows) for rows in results], [144] * 5)
+        self.assertEqual(results[2][-1].dt, datetime.datetime(2018, 9, 4))
+
+    def test_instrument(self):
+        stats = jma.Stats()
+
+        async def main():
+            async with self.async_jma(instrument=stats) as aj:
+                return [row async for row in aj.get_hourly_data(self.prec_no, self.block_no_okazaki, 2018, 9, 28)]
+        self.run_async(main())
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot["hourly"]["requests"], 1)
+        self.assertEqual(snapshot["hourly"]["rows"], 24)
+        self.assertEqual(snapshot["stations"]["parses"], 1)
+
+    def test_get_station_with_invalid_block_no(self):
+        async def main():
+            async with self.async_jma() as aj:
+                await aj.get_station(self.prec_no, "99999")
+        with self.assertRaises(jma.InvalidBlockNo):
+            self.run_async(main())
+
+    def test_get_station_by_block_no(self):
+        async def main():
+            async with self.async_jma() as aj:
+                return await aj.get_station(self.block_no_okazaki), len(await aj.get_all_stations())
+        station, count = self.run_async(main())
+        self.assertEqual((station.prec_no, station.name), (self.prec_no, "岡崎"))
+        self.assertEqual(count, 8)
+        self.assertEqual(len(self.requested_urls("prefecture.php")), 61)
+
+    # 同じページを同時に要求しても取得と解析は1回
+    def test_identical_requests_are_coalesced(self):
+        async def collect(aj):
+            return [vars(row) async for row in aj.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28)]
+
+        async def main():
+            async with self.async_jma(page_cache=jma.PageCache()) as aj:
+                await aj.get_station(self.prec_no, self.block_no_nagoya)
+                results = await asyncio.gather(*[collect(aj) for _ in range(5)])
+                results.append(await collect(aj))
+                return results
+        results = self.run_async(main())
+        self.assertEqual(len(self.requested_urls("/view/")), 1)
+        self.assertTrue(all(rows == results[0] for rows in results))
+        self.assertEqual(len(results[0]), 24)
+
+    # 最初に要求した側がキャンセルされても、同じページを待っている側は結果を受け取る
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        calls = []
+
+        async def main():
+            flights = AsyncSingleFlight()
+            released = asyncio.Event()
+
+            async def fetch():
+                calls.append(1)
+                await released.wait()
+                return "page"
+            leader = asyncio.ensure_future(flights.do("url", fetch))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flights.do("url", fetch))
+            await asyncio.sleep(0)
+            leader.cancel()
+            await asyncio.sleep(0)
+            released.set()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await follower
+        self.assertEqual(self.run_async(main()), "page")
+        self.assertEqual(len(calls), 1)
+
+    # 5xxや本文の途中で切れた接続はTransportと同じく再試行する
+    def test_retry(self):
+        async def main(errors, **kwargs):
+            async with self.async_jma(backoff=0.01, **kwargs) as aj:
+                await aj.get_station(self.prec_no, self.block_no_nagoya)
+                self.server.inject_errors(*errors)
+                return [row async for row in aj.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28)]
+        self.assertEqual(len(self.run_async(main([503, TRUNCATED_CHUNK]))), 24)
+        self.assertEqual(len(self.requested_urls("/view/")), 3)
+        with self.assertRaises(jma.HTTPStatusError):
+            self.run_async(main([503, 503], retries=1))
+
+    # 4xxは再試行しない
+    def test_no_retry_on_client_error(self):
+        async def main():
+            async with self.async_jma(backoff=0.01) as aj:
+                self.server.inject_errors(404)
+                await aj.get_station(self.prec_no, self.block_no_nagoya)
+        with self.assertRaises(jma.HTTPStatusError):
+            self.run_async(main())
+        self.assertEqual(len(self.server.requested_urls), 1)
+
+    def test_get_hourly_data_with_future_date(self):
+        async def main():
+            async with self.async_jma() as aj:
+                return [row async for row in aj.get_hourly_data(self.prec_no, self.block_no_nagoya, 2100, 1, 1)]
+        with self.assertRaises(jma.FutureDateError):
+            self.run_async(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import copy
+import datetime
+import math
+import tempfile
+
+import jma
+from jma.archive import archive_path, INT_NULL
+
+from test_jma import FixtureServerTestCase
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class ArchiveTestCase(FixtureServerTestCase):
+    """Archive test cases."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = self.tmpdir.name
+        self.nagoya = self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        self.okazaki = self.jma.get_station(self.prec_no, self.block_no_okazaki)
+
+    def write(self, station, data_frequency, days, as_=None):
+        get = self.jma.get_hourly_data if data_frequency == jma.DATA_TYPE_HOURLY else self.jma.get_ten_minutely_data
+        rows = []
+        with jma.ArchiveWriter(self.path) as writer:
+            for day in days:
+                page = list(get(self.prec_no, station.block_no, day.year, day.month, day.day, as_=as_))
+                writer.write(station, data_frequency, page)
+                rows.extend(page)
+        return rows
+
+    def open(self, station, data_frequency, year=2018):
+        return jma.open_archive(self.path, station.block_no, data_frequency, year)
+
+    # 行と同じ値を読み出せる。数値の列の数値でない値は欠測にする
+    def test_round_trip(self):
+        for station, data_frequency, as_ in ((self.nagoya, jma.DATA_TYPE_TEN_MINUTELY, None),
+                                             (self.okazaki, jma.DATA_TYPE_HOURLY, "compact")):
+            rows = self.write(station, data_frequency, [datetime.date(2018, 9, 28)], as_)
+            with self.open(station, data_frequency) as archive:
+                start, end = datetime.datetime(2018, 9, 28), datetime.datetime(2018, 9, 29)
+                self.assertEqual(archive.station_type, station.station_type)
+                self.assertEqual(archive.datetimes(start, end), [row.dt for row in rows])
+                for name, kind in jma.columns.SCHEMAS[(data_frequency, station.station_type)]:
+                    expected = [getattr(row, name) for row in rows]
+                    if kind in (jma.decoder.FLOAT, jma.decoder.INT):
+                        expected = [value if isinstance(value, (int, float)) else None for value in expected]
+                    self.assertEqual(archive.values(name, start, end), expected, name)
+                    quality = archive.quality_view(name, start, end)
+                    self.assertEqual([chr(flag) if flag else None for flag in quality],
+                                     [(row.quality or {}).get(name) for row in rows])
+                    quality.release()
+
+    # 時刻から記録の位置が決まり、24時の行はその年の最後の記録になる
+    def test_time_index(self):
+        rows = self.write(self.okazaki, jma.DATA_TYPE_HOURLY, [datetime.date(2018, 12, 31)])
+        with self.open(self.okazaki, jma.DATA_TYPE_HOURLY) as archive:
+            self.assertEqual(archive.capacity, 365 * 24)
+            self.assertEqual(len(archive), archive.capacity)
+            self.assertEqual(rows[-1].dt, datetime.datetime(2019, 1, 1))
+            self.assertEqual(archive.index(rows[-1].dt), archive.capacity - 1)
+            self.assertEqual(archive.dt(archive.index(rows[0].dt)), rows[0].dt)
+            with self.assertRaises(ValueError):
+                archive.index(datetime.datetime(2018, 12, 31, 0, 30))
+            # 書き込んでいない記録は欠測
+            self.assertEqual(archive.values("temperature", datetime.datetime(2018, 1, 1), datetime.datetime(2018, 1, 2)),
+                             [None] * 24)
+            view = archive.view("snow_cover", datetime.datetime(2018, 1, 1), datetime.datetime(2018, 1, 2))
+            self.assertEqual(view.tolist(), [INT_NULL] * 24)
+            view.release()
+
+    # 閉じた後も追記でき、同じ時刻は置き換える
+    def test_append(self):
+        self.write(self.nagoya, jma.DATA_TYPE_TEN_MINUTELY, [datetime.date(2018, 9, 1)])
+        with self.open(self.nagoya, jma.DATA_TYPE_TEN_MINUTELY) as archive:
+            count = len(archive)
+        rows = self.write(self.nagoya, jma.DATA_TYPE_TEN_MINUTELY, [datetime.date(2018, 9, 1), datetime.date(2018, 9, 2)])
+        with self.open(self.nagoya, jma.DATA_TYPE_TEN_MINUTELY) as archive:
+            self.assertEqual(len(archive), count + 144)
+            self.assertEqual(archive.values("temperature", datetime.datetime(2018, 9, 1)), [row.temperature for row in rows])
+        # 地点の種類が違うファイルには書かない
+        station = copy.copy(self.nagoya)
+        station.station_type = jma.STATION_TYPE_A
+        with self.assertRaises(ValueError):
+            self.write(station, jma.DATA_TYPE_TEN_MINUTELY, [datetime.date(2018, 9, 3)])
+
+    def test_view_is_zero_copy(self):
+        self.write(self.nagoya, jma.DATA_TYPE_TEN_MINUTELY, [datetime.date(2018, 9, 28)])
+        with self.open(self.nagoya, jma.DATA_TYPE_TEN_MINUTELY) as archive:
+            view = archive.view("temperature", datetime.datetime(2018, 9, 28), datetime.datetime(2018, 9, 29))
+            self.assertEqual(view.format, "d")
+            self.assertEqual(len(view), 144)
+            self.assertTrue(math.isnan(archive.view("temperature", None, datetime.datetime(2018, 1, 1, 0, 10))[0]))
+            self.assertIs(type(view.obj), type(archive._map))
+            view.release()
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_to_numpy(self):
+        rows = self.write(self.nagoya, jma.DATA_TYPE_TEN_MINUTELY, [datetime.date(2018, 9, 28)])
+        archive = self.open(self.nagoya, jma.DATA_TYPE_TEN_MINUTELY)
+        values = archive.to_numpy("temperature", datetime.datetime(2018, 9, 28), datetime.datetime(2018, 9, 29))
+        self.assertFalse(values.flags.owndata)
+        self.assertEqual(values.tolist(), [row.temperature for row in rows])
+        del values
+        archive.close()
+
+    def test_not_an_archive(self):
+        path = archive_path(self.path, self.block_no_nagoya, jma.DATA_TYPE_HOURLY, 2018)
+        self.write(self.nagoya, jma.DATA_TYPE_HOURLY, [datetime.date(2018, 9, 28)])
+        with open(path, "r+b") as f:
+            f.write(b"XXXX")
+        with self.assertRaises(ValueError):
+            jma.ArchiveFile(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
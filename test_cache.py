@@ -0,0 +1,165 @@
+import unittest
+import os
+import tempfile
+import threading
+import time
+
+import jma
+from jma.cache import ResponseCache, PageCache, SingleFlight
+
+from test_jma import FixtureServerTestCase
+
+
+class ResponseCacheTestCase(FixtureServerTestCase):
+    """ResponseCache test cases."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.cache = ResponseCache(self.tmpdir.name)
+
+    def new_jma(self, **kwargs):
+        return jma.Jma(catalog=jma.StationCatalog(), base_url=self.server.base_url, cache=self.cache, **kwargs)
+
+    # 2回目以降はキャッシュから読む
+    def test_cached_pages_are_reused(self):
+        rows = list(self.new_jma().get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28))
+        self.assertEqual(len(self.server.requested_urls), 2)
+        cached_rows = list(self.new_jma().get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28))
+        self.assertEqual(len(self.server.requested_urls), 2)
+        self.assertEqual([vars(row) for row in cached_rows], [vars(row) for row in rows])
+
+    def test_offline(self):
+        list(self.new_jma().get_ten_minutely_data(self.prec_no, self.block_no_okazaki, 2018, 9, 28))
+        offline = self.new_jma(offline=True)
+        self.assertEqual(len(list(offline.get_ten_minutely_data(self.prec_no, self.block_no_okazaki, 2018, 9, 28))), 144)
+        self.assertEqual(len(self.server.requested_urls), 2)
+        with self.assertRaises(jma.CacheMissError):
+            list(offline.get_ten_minutely_data(self.prec_no, self.block_no_okazaki, 2018, 9, 27))
+
+    def test_offline_requires_cache(self):
+        with self.assertRaises(ValueError):
+            jma.Jma(offline=True)
+
+    # 過去のページは期限切れにならず、当日のページは期限切れになる
+    def test_ttl(self):
+        cache = ResponseCache(self.tmpdir.name, today_ttl=0, ttl=0)
+        today = jma.jst_today()
+        j = jma.Jma(catalog=jma.StationCatalog(), base_url=self.server.base_url, cache=cache)
+        for i in range(2):
+            list(j.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28))
+            list(j.get_hourly_data(self.prec_no, self.block_no_nagoya, today.year, today.month, today.day))
+        self.assertEqual(len(self.requested_urls("year=2018")), 1)
+        self.assertEqual(len(self.requested_urls("year={}".format(today.year))), 2)
+        self.assertIsNone(cache.ttl_for(self.server.base_url + "/view/hourly_s1.php?prec_no=51&block_no=47636&year=2018&month=9&day=28"))
+
+    # 過去の日付でも表の無いページや途中までのページは取り直す
+    def test_incomplete_past_pages_expire(self):
+        cache = ResponseCache(self.tmpdir.name, today_ttl=0)
+        j = jma.Jma(catalog=jma.StationCatalog(), base_url=self.server.base_url, cache=cache)
+        station = j.get_station(self.prec_no, self.block_no_nagoya)
+        url = j._construct_url(self.prec_no, self.block_no_nagoya, station.station_type, 2018, 9, 28,
+                               data_frequenry=jma.DATA_TYPE_HOURLY)
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "hourly_s1.html"), "rb") as f:
+            content = f.read()
+        for page in (b"<html><body><div id='main'>maintenance</div></body></html>", content[:len(content) // 2]):
+            cache.put(url, page)
+            self.assertIsNone(cache.get(url))
+            self.assertEqual(cache.get(url, allow_stale=True), page)
+            self.assertEqual(len(list(j.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28))), 24)
+            self.assertEqual(cache.get(url), content)
+        self.assertEqual(len(self.requested_urls("year=2018")), 2)
+
+    def test_pages_are_compressed(self):
+        list(self.new_jma().get_ten_minutely_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28))
+        sizes = [os.path.getsize(os.path.join(root, name)) for root, dirs, names in os.walk(self.tmpdir.name) for name in names]
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "10min_s1.html"), "rb") as f:
+            self.assertLess(max(sizes), len(f.read()) / 3)
+
+
+class PageCacheTestCase(FixtureServerTestCase):
+    """PageCache test cases."""
+
+    def url(self, day):
+        return "http://example.com/view/hourly_s1.php?prec_no=51&block_no=47636&year=2018&month=9&day={}".format(day)
+
+    # 2回目以降は取得も解析もしない
+    def test_parsed_pages_are_reused(self):
+        instrument = jma.Stats()
+        j = jma.Jma(catalog=jma.StationCatalog(), base_url=self.server.base_url, page_cache=PageCache(),
+                    instrument=instrument)
+        rows = [vars(row) for row in j.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28)]
+        self.assertEqual([vars(row) for row in j.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28)], rows)
+        self.assertEqual(len(list(j.get_daily_data(self.prec_no, self.block_no_nagoya, 2018, 9))), 30)
+        list(j.get_daily_data(self.prec_no, self.block_no_nagoya, 2018, 9))
+        self.assertEqual(len(self.requested_urls("/view/")), 2)
+        self.assertEqual(instrument.snapshot()["hourly"]["parses"], 1)
+
+    # 大きさの合計がmax_bytesを超えたら最後に使ったのが古いものから捨てる
+    def test_eviction(self):
+        cache = PageCache(max_bytes=10)
+        cache.put(self.url(1), "a", 4)
+        cache.put(self.url(2), "b", 4)
+        self.assertEqual(cache.get(self.url(1)), "a")
+        cache.put(self.url(3), "c", 4)
+        self.assertIsNone(cache.get(self.url(2)))
+        self.assertEqual((len(cache), cache.size), (2, 8))
+        cache.put(self.url(4), "d", 11)
+        self.assertIsNone(cache.get(self.url(4)))
+        cache.invalidate()
+        self.assertEqual((len(cache), cache.size), (0, 0))
+
+    # 当日のページはtoday_ttl、過去のページはhistory_ttlで期限切れにする
+    def test_ttl(self):
+        today = jma.jst_today()
+        today_url = "http://example.com/view/hourly_s1.php?prec_no=51&block_no=47636&year={}&month={}&day={}".format(
+            today.year, today.month, today.day)
+        cache = PageCache(today_ttl=0, history_ttl=None)
+        cache.put(today_url, "today", 1)
+        cache.put(self.url(1), "history", 1)
+        self.assertIsNone(cache.get(today_url))
+        self.assertEqual(cache.get(self.url(1)), "history")
+        cache = PageCache(today_ttl=60, history_ttl=3600, ttl=0)
+        self.assertEqual((cache.ttl_for(today_url), cache.ttl_for(self.url(1))), (60, 3600))
+        self.assertEqual(cache.ttl_for("http://example.com/stats/etrn/select/prefecture.php?prec_no=51"), 0)
+
+    # 実行中の呼び出しがあれば、その結果を待って共有する
+    def test_single_flight(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def function():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return [1, 2, 3]
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("key", function))) for _ in range(4)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [[1, 2, 3]] * 4)
+        self.assertTrue(all(result is results[0] for result in results))
+        # 終わった後は実行し直す
+        flight.do("key", function)
+        self.assertEqual(len(calls), 2)
+
+    def test_single_flight_error(self):
+        def function():
+            raise jma.FutureDateError
+        with self.assertRaises(jma.FutureDateError):
+            SingleFlight().do("key", function)
+
+
+if __name__ == '__main__':
+    unittest.main()
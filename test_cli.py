@@ -0,0 +1,147 @@
+import unittest
+import contextlib
+import datetime
+import io
+import json
+import os
+import sqlite3
+import tempfile
+
+import jma
+from jma.cli import main
+
+from test_jma import FixtureServerTestCase
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class CliTestCase(FixtureServerTestCase):
+    """Command line test cases."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "jma.sqlite3")
+        # コマンドは共有の地点情報のキャッシュを使うので、他のテストに残さない
+        jma.core.default_catalog.invalidate()
+        self.addCleanup(jma.core.default_catalog.invalidate)
+
+    def run_main(self, *argv):
+        out = io.StringIO()
+        err = io.StringIO()
+        status = main(["--base-url", self.server.base_url] + list(argv), out=out, err=err)
+        return status, out.getvalue(), err.getvalue()
+
+    def download(self, *argv):
+        return self.run_main("download", "--prec", self.prec_no, "--format", "sqlite", "--output", self.path,
+                             "--rate", "0", "-j", "4", *argv)
+
+    def count_rows(self, table):
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute("SELECT COUNT(*) FROM {}".format(table)).fetchone()[0]
+        finally:
+            connection.close()
+
+    def test_prefectures(self):
+        status, out, err = self.run_main("prefectures")
+        self.assertEqual(status, 0)
+        prefectures = json.loads(out)
+        self.assertEqual(len(prefectures), 61)
+        self.assertIn({"prec_no": "51", "name": "愛知県"}, prefectures)
+
+    def test_stations(self):
+        status, out, err = self.run_main("stations", "--prec", self.prec_no)
+        stations = json.loads(out)
+        self.assertEqual(len(stations), 8)
+        houraiji = [station for station in stations if station["block_no"] == "1285"][0]
+        self.assertEqual(houraiji["observation_end_date"], "2008-03-31")
+
+    # 地点×日を並列で取得して書き込む
+    def test_download(self):
+        status, out, err = self.download("--block", self.block_no_nagoya, "--block", self.block_no_okazaki,
+                                         "--from", "2018-09-01", "--to", "2018-09-03")
+        self.assertEqual(status, 0, err)
+        self.assertEqual(self.count_rows("hourly_s"), 3 * 24)
+        self.assertEqual(self.count_rows("hourly_a"), 3 * 24)
+        self.assertIn("6/6 days, 144 rows", err)
+        with open(self.path + ".checkpoint.json") as f:
+            checkpoint = json.load(f)
+        self.assertEqual(checkpoint["51/47636/hourly"], ["2018-09-01", "2018-09-02", "2018-09-03"])
+
+    # 記録済みの日は取得しない
+    def test_resume(self):
+        self.download("--block", self.block_no_nagoya, "--from", "2018-09-01", "--to", "2018-09-02",
+                      "--freq", "ten_minutely")
+        del self.server.requested_urls[:]
+        status, out, err = self.download("--block", self.block_no_nagoya, "--from", "2018-09-01", "--to", "2018-09-04",
+                                         "--freq", "ten_minutely", "--checkpoint-every", "1")
+        self.assertEqual(status, 0)
+        self.assertEqual(len(self.requested_urls("/view/")), 2)
+        self.assertEqual(self.count_rows("ten_minutely_s"), 4 * 144)
+
+    # 失敗した日は記録せず、次の実行で取り直す
+    def test_failed_days_are_retried(self):
+        # 地点情報を先にキャッシュして、観測値のページを失敗させる
+        jma.Jma(base_url=self.server.base_url).get_station(self.prec_no, self.block_no_nagoya)
+        self.server.inject_errors(404)
+        status, out, err = self.download("--block", self.block_no_nagoya, "--from", "2018-09-01", "--to", "2018-09-01",
+                                         "-j", "1")
+        self.assertEqual(status, 1)
+        self.assertIn("failed: 47636 2018-09-01 hourly", err)
+        del self.server.requested_urls[:]
+        status, out, err = self.download("--block", self.block_no_nagoya, "--from", "2018-09-01", "--to", "2018-09-01")
+        self.assertEqual(status, 0)
+        self.assertEqual(len(self.requested_urls("/view/")), 1)
+        self.assertEqual(self.count_rows("hourly_s"), 24)
+
+    # 観測が終了した後の日は取得しない
+    def test_all_stations_in_prefecture(self):
+        status, out, err = self.download("--from", "2008-03-31", "--to", "2008-04-01", "-q")
+        self.assertEqual(status, 0)
+        self.assertEqual(err, "")
+        self.assertEqual(len(self.requested_urls("block_no=1285")), 1)
+        self.assertEqual(len(self.requested_urls("/view/")), 15)
+
+    # 存在しない地点や未来の日付はトレースバックではなく使い方のエラーにする
+    def test_usage_errors(self):
+        for argv, message in [
+                (("--block", "99999", "--from", "2018-09-01", "--to", "2018-09-01"), "unknown --block 99999"),
+                (("--from", "2018-09-02", "--to", "2018-09-01"), "--to must not be before --from"),
+                (("--from", str(jma.jst_today()), "--to", str(jma.jst_today())), "--from must not be after")]:
+            stderr = io.StringIO()
+            with self.assertRaises(SystemExit) as cm, contextlib.redirect_stderr(stderr):
+                self.download(*argv)
+            self.assertEqual(cm.exception.code, 2)
+            self.assertIn(message, stderr.getvalue())
+        stderr = io.StringIO()
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(stderr):
+            self.run_main("stations", "--prec", "00")
+        self.assertIn("unknown --prec 00", stderr.getvalue())
+
+    def test_download_archive(self):
+        output = os.path.join(self.tmpdir.name, "archive")
+        status, out, err = self.run_main("download", "--prec", self.prec_no, "--block", self.block_no_nagoya,
+                                         "--from", "2018-09-01", "--to", "2018-09-02", "--output", output,
+                                         "--format", "archive", "--rate", "0")
+        self.assertEqual(status, 0)
+        with jma.open_archive(output, self.block_no_nagoya, "hourly", 2018) as archive:
+            self.assertEqual(len(archive.values("temperature", datetime.datetime(2018, 9, 1))), 48)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_download_parquet(self):
+        output = os.path.join(self.tmpdir.name, "parquet")
+        status, out, err = self.run_main("download", "--prec", self.prec_no, "--block", self.block_no_okazaki,
+                                         "--from", "2018-09-01", "--to", "2018-09-02", "--output", output, "--rate", "0")
+        self.assertEqual(status, 0)
+        self.assertTrue(os.path.exists(output + ".checkpoint.json"))
+        files = [os.path.join(root, name) for root, dirs, names in os.walk(output) for name in names]
+        self.assertEqual(sum(pyarrow.parquet.read_table(path).num_rows for path in files), 48)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import datetime
+import math
+
+import jma
+
+from test_jma import FixtureServerTestCase
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+
+class ColumnarDataTestCase(FixtureServerTestCase):
+    """Columnar output test cases."""
+
+    def assert_same_values(self, columns, rows):
+        self.assertEqual(len(columns), len(rows))
+        self.assertEqual(columns.datetimes(), [row.dt for row in rows])
+        for name, column in columns.columns.items():
+            expected = [getattr(row, name) for row in rows]
+            values = column.to_list()
+            for value, expected_value in zip(values, expected):
+                if expected_value is None or (column.kind == jma.columns.INT and not isinstance(expected_value, int)):
+                    self.assertIsNone(value, name)
+                else:
+                    self.assertEqual(value, expected_value, name)
+
+    # 行と同じ値が列に入る
+    def test_get_hourly_data_as_columns(self):
+        for block_no in (self.block_no_nagoya, self.block_no_okazaki):
+            columns = self.jma.get_hourly_data(self.prec_no, block_no, 2018, 9, 28, as_="columns")
+            rows = list(self.jma.get_hourly_data(self.prec_no, block_no, 2018, 9, 28))
+            self.assert_same_values(columns, rows)
+            self.assertEqual(columns.station_type, rows[0].type)
+
+    def test_get_ten_minutely_data_as_columns(self):
+        for block_no in (self.block_no_nagoya, self.block_no_okazaki):
+            columns = self.jma.get_ten_minutely_data(self.prec_no, block_no, 2018, 9, 28, as_="columns")
+            rows = list(self.jma.get_ten_minutely_data(self.prec_no, block_no, 2018, 9, 28))
+            self.assert_same_values(columns, rows)
+            self.assertEqual(columns.datetimes()[-1], datetime.datetime(2018, 9, 29))
+
+    def test_get_hourly_range_as_columns(self):
+        today = jma.jst_today()
+        columns = self.jma.get_hourly_range(self.prec_no, self.block_no_nagoya,
+                                            today - datetime.timedelta(days=2), today + datetime.timedelta(days=1), as_="columns")
+        self.assertEqual(len(columns), 3 * 24)
+        self.assertEqual(len(columns.pages), 3)
+        self.assertEqual(list(columns.errors), [today + datetime.timedelta(days=1)])
+        temperature = columns["temperature"]
+        self.assertEqual(len(temperature.values), 3 * 24)
+        self.assertTrue(all(temperature.mask))
+        self.assertTrue(math.isnan(columns["precipitation"].values[list(columns["precipitation"].mask).index(0)]))
+
+    def test_invalid_as(self):
+        with self.assertRaises(ValueError):
+            self.jma.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28, as_="rows")
+
+    @unittest.skipIf(pandas is None, "pandas is not installed")
+    def test_to_pandas(self):
+        columns = self.jma.get_ten_minutely_data(self.prec_no, self.block_no_okazaki, 2018, 9, 28, as_="columns")
+        frame = columns.to_pandas()
+        self.assertEqual(len(frame), 144)
+        self.assertEqual(list(frame.columns), ["dt"] + list(columns.columns))
+        self.assertEqual(frame["dt"].iloc[0], pandas.Timestamp(2018, 9, 28, 0, 10))
+        arrays = columns.to_numpy()
+        self.assertEqual(arrays["temperature"].count(), 144)
+
+
+if __name__ == '__main__':
+    unittest.main()
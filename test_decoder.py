@@ -0,0 +1,66 @@
+import unittest
+
+from jma.decoder import sanitize, float_decoder, int_decoder, direction_decoder, code_decoder
+
+from test_jma import FixtureServerTestCase
+
+
+class DecoderTestCase(unittest.TestCase):
+    """Column decoder test cases."""
+
+    def test_float_decoder(self):
+        decode = float_decoder()
+        self.assertEqual(decode("1013.2"), (1013.2, None))
+        self.assertEqual(decode("18.7]"), (18.7, "]"))
+        self.assertEqual(decode("0.0)"), (0.0, ")"))
+        for text in ("--", "///", "", "#", "×"):
+            self.assertEqual(decode(text), (None, None))
+        # 同じ文字列の値は共有する
+        self.assertIs(decode("1013.2")[0], decode("1013.2")[0])
+
+    def test_int_decoder(self):
+        decode = int_decoder()
+        self.assertEqual(decode("87"), (87, None))
+        self.assertEqual(decode("10)"), (10, ")"))
+
+    def test_direction_decoder(self):
+        decode = direction_decoder()
+        self.assertEqual(decode("北北西"), ("NNW", None))
+        self.assertEqual(decode("静穏"), (None, None))
+        self.assertEqual(decode("南]"), ("S", "]"))
+
+    def test_code_decoder(self):
+        decode = code_decoder()
+        self.assertEqual(decode("5"), (5, None))
+        self.assertEqual(decode("0+"), ("0+", None))
+
+    def test_sanitize(self):
+        self.assertEqual(sanitize("18.7]"), 18.7)
+        self.assertEqual(sanitize("西"), "W")
+        self.assertEqual(sanitize("10-"), "10-")
+        self.assertIsNone(sanitize("///"))
+
+
+class QualityTestCase(FixtureServerTestCase):
+    """Quality flag test cases."""
+
+    # 品質情報は値とは別にqualityに入る
+    def test_quality(self):
+        rows = list(self.jma.get_hourly_data(self.prec_no, self.block_no_okazaki, 2018, 9, 28))
+        flagged = [row for row in rows if row.quality]
+        self.assertEqual(len(flagged), 1)
+        self.assertEqual(flagged[0].quality, {"temperature": "]"})
+        self.assertEqual(flagged[0].temperature, 18.7)
+        compact = list(self.jma.get_hourly_data(self.prec_no, self.block_no_okazaki, 2018, 9, 28, as_="compact"))
+        self.assertEqual([row.quality for row in compact], [row.quality for row in rows])
+
+    def test_columns_quality(self):
+        columns = self.jma.get_hourly_data(self.prec_no, self.block_no_okazaki, 2018, 9, 28, as_="columns")
+        flags = columns["temperature"].quality_flags()
+        self.assertEqual(flags.count("]"), 1)
+        self.assertEqual(columns["temperature"].to_list()[flags.index("]")], 18.7)
+        self.assertEqual(set(columns["precipitation"].quality_flags()), {None})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# import jmaでは読み込まないモジュール
+HEAVY_MODULES = ("requests", "requests_html", "lxml", "pyppeteer", "pyquery", "aiohttp", "asyncio",
+                 "numpy", "pandas", "pyarrow", "sqlite3")
+
+
+def loaded_modules(code):
+    '''新しいプロセスでcodeを実行した後に読み込まれているHEAVY_MODULES'''
+    code = "import sys, json\n{}\nprint(json.dumps(sorted(set(name.split('.')[0] for name in sys.modules) & set({!r}))))".format(
+        code, HEAVY_MODULES)
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT)
+    return json.loads(output.decode().splitlines()[-1])
+
+
+class ImportTestCase(unittest.TestCase):
+    """Import test cases."""
+
+    # import jmaとJma()では重い依存パッケージを読み込まず、Sessionも作らない
+    def test_import_is_lazy(self):
+        self.assertEqual(loaded_modules("import jma\nassert jma.Jma().transport._session is None"), [])
+
+    def test_loaded_on_first_use(self):
+        self.assertEqual(loaded_modules("import jma\njma.LxmlParser().areas(b'<html></html>')"), ["lxml"])
+        self.assertIn("requests", loaded_modules("import jma\njma.Jma().transport.session"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import datetime
+import os
+import random
+import tempfile
+import threading
+
+import jma
+from jma.core import _station_vars
+
+from test_jma import FixtureServerTestCase
+
+
+def new_station(block_no, latitude, longitude, observation_end_date=None):
+    return jma.Station("00", str(block_no), name=str(block_no), name_kana="", station_type="a",
+                       latitude_degrees=str(int(latitude)), latitude_minutes=str((latitude % 1) * 60),
+                       longitude_degrees=str(int(longitude)), longitude_minutes=str((longitude % 1) * 60),
+                       altitude="0", f_pre=True, f_wsp=True, f_tem=block_no % 2 == 0, f_sun=False, f_snc=False,
+                       observation_end_date=observation_end_date)
+
+
+class StationIndexTestCase(FixtureServerTestCase):
+    """StationIndex test cases."""
+
+    def setUp(self):
+        super().setUp()
+        self.index = self.jma.get_station_index([self.prec_no])
+
+    def names(self, results):
+        return [station.name for station, distance in results]
+
+    def test_great_circle_distance(self):
+        # 東京と大阪
+        self.assertAlmostEqual(jma.great_circle_distance(35.6895, 139.6917, 34.6937, 135.5023), 396.9, delta=0.5)
+        self.assertEqual(jma.great_circle_distance(35.0, 137.0, 35.0, 137.0), 0.0)
+
+    def test_nearest(self):
+        self.assertEqual(len(self.index), 8)
+        nagoya = self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        results = self.index.nearest(nagoya.latitude, nagoya.longitude, k=3)
+        self.assertEqual(self.names(results), ["名古屋", "豊田", "愛西"])
+        self.assertAlmostEqual(results[0][1], 0.0)
+        self.assertAlmostEqual(results[1][1], jma.great_circle_distance(nagoya.latitude, nagoya.longitude,
+                                                                         35.11, 137.17333333333335))
+
+    # 観測項目と観測終了日で絞り込む
+    def test_require_and_active(self):
+        # 鳳来の近く
+        results = self.index.nearest(34.95, 137.53, k=2)
+        self.assertEqual(self.names(results), ["鳳来", "豊橋"])
+        results = self.index.nearest(34.95, 137.53, k=2, active=True)
+        self.assertEqual(self.names(results), ["豊橋", "稲武"])
+        results = self.index.nearest(34.95, 137.53, k=1, active=datetime.date(2008, 3, 31))
+        self.assertEqual(self.names(results), ["鳳来"])
+        results = self.index.nearest(34.95, 137.53, k=2, require=("f_tem", "f_pre"))
+        self.assertEqual(self.names(results), ["豊橋", "岡崎"])
+
+    def test_within(self):
+        nagoya = self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        results = self.index.within(nagoya.latitude, nagoya.longitude, 25)
+        self.assertEqual(self.names(results), ["名古屋", "豊田", "愛西"])
+        self.assertTrue(all(distance <= 25 for station, distance in results))
+        self.assertEqual(self.index.within(nagoya.latitude, nagoya.longitude, 0.001), results[:1])
+
+    # 保存した索引は作り直さずに読み込める
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as path:
+            path = os.path.join(path, "stations.json")
+            self.index.save(path)
+            index = jma.StationIndex.load(path)
+        self.assertEqual([_station_vars(station) for station in index], [_station_vars(station) for station in self.index])
+        self.assertEqual(self.names(index.nearest(34.95, 137.53, k=8)), self.names(self.index.nearest(34.95, 137.53, k=8)))
+
+    # 全地点を調べた結果と同じ
+    # 同じファイルに複数のスレッドから同時に保存しても一時ファイルがぶつからない
+    def test_concurrent_saves(self):
+        index = jma.StationIndex(self.jma.get_all_stations())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "index.json")
+            errors = []
+
+            def save():
+                try:
+                    for _ in range(20):
+                        index.save(path)
+                except Exception as e:
+                    errors.append(e)
+            threads = [threading.Thread(target=save) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(errors, [])
+            self.assertEqual(os.listdir(directory), ["index.json"])
+            self.assertEqual(len(jma.StationIndex.load(path)), len(index))
+
+    def test_matches_linear_scan(self):
+        rng = random.Random(0)
+        stations = [new_station(i, rng.uniform(24, 46), rng.uniform(122, 154),
+                                datetime.date(2000, 1, 1) if i % 5 == 0 else None) for i in range(500)]
+        index = jma.StationIndex(stations)
+        for _ in range(50):
+            latitude, longitude = rng.uniform(20, 50), rng.uniform(120, 156)
+            distances = sorted((jma.great_circle_distance(latitude, longitude, s.latitude, s.longitude), s.block_no)
+                               for s in stations if s.f_tem and s.observation_end_date is None)
+            results = index.nearest(latitude, longitude, k=5, require=("f_tem",), active=True)
+            self.assertEqual([station.block_no for station, distance in results], [b for d, b in distances[:5]])
+            for (station, distance), (expected, block_no) in zip(results, distances):
+                self.assertAlmostEqual(distance, expected, places=6)
+            within = index.within(latitude, longitude, 300, require=("f_tem",), active=True)
+            self.assertEqual([station.block_no for station, distance in within], [b for d, b in distances if d <= 300])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import datetime
+import tempfile
+
+import jma
+from jma.cache import ResponseCache
+from jma.instrument import url_kind
+
+from test_jma import FixtureServerTestCase
+
+
+class RecordingInstrument(jma.Instrument):
+
+    def __init__(self):
+        self.events = []
+
+    def on_request(self, kind, url, nbytes, seconds, cache, error=None):
+        self.events.append(("request", kind, nbytes, cache, error))
+
+    def on_parse(self, kind, url, seconds, rows):
+        self.events.append(("parse", kind, rows))
+
+    def on_rows(self, kind, url, rows, nulls):
+        self.events.append(("rows", kind, rows, nulls))
+
+    def on_catalog(self, prec_no, hit):
+        self.events.append(("catalog", prec_no, hit))
+
+
+class InstrumentTestCase(FixtureServerTestCase):
+    """Instrument test cases."""
+
+    def new_jma(self, instrument, **kwargs):
+        return jma.Jma(catalog=jma.StationCatalog(), base_url=self.server.base_url, instrument=instrument, **kwargs)
+
+    def test_url_kind(self):
+        base_url = self.server.base_url
+        self.assertEqual(url_kind(base_url + "/select/prefecture00.php"), "prefectures")
+        self.assertEqual(url_kind(base_url + "/select/prefecture.php?prec_no=51"), "stations")
+        self.assertEqual(url_kind(base_url + "/view/hourly_a1.php?prec_no=51"), "hourly")
+        self.assertEqual(url_kind(base_url + "/view/10min_s1.php?prec_no=51"), "ten_minutely")
+
+    def test_events(self):
+        instrument = RecordingInstrument()
+        j = self.new_jma(instrument)
+        rows = list(j.get_hourly_data(self.prec_no, self.block_no_okazaki, 2018, 9, 28))
+        list(j.get_hourly_data(self.prec_no, self.block_no_okazaki, 2018, 9, 27))
+        events = instrument.events
+        self.assertEqual(events[0], ("catalog", self.prec_no, False))
+        self.assertEqual(events[1][:2], ("request", "stations"))
+        self.assertEqual(events[2], ("parse", "stations", 8))
+        self.assertEqual(events[3][:2], ("request", "hourly"))
+        self.assertGreater(events[3][2], 0)
+        self.assertIsNone(events[3][3])
+        self.assertEqual(events[4], ("parse", "hourly", 24))
+        nulls = sum(value is None for row in rows for name, value in vars(row).items() if name != "quality")
+        self.assertEqual(events[5], ("rows", "hourly", 24, nulls))
+        # 2回目は地点情報をキャッシュから引く
+        self.assertEqual(events[6], ("catalog", self.prec_no, True))
+
+    def test_errors_and_cache(self):
+        instrument = RecordingInstrument()
+        with tempfile.TemporaryDirectory() as path:
+            j = self.new_jma(instrument, cache=ResponseCache(path))
+            list(j.get_ten_minutely_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28))
+            list(j.get_ten_minutely_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28))
+            offline = self.new_jma(instrument, cache=ResponseCache(path), offline=True)
+            with self.assertRaises(jma.CacheMissError):
+                list(offline.get_ten_minutely_data(self.prec_no, self.block_no_nagoya, 2018, 9, 27))
+        requests = [event for event in instrument.events if event[0] == "request" and event[1] == "ten_minutely"]
+        self.assertEqual([event[3] for event in requests], ["miss", "hit", "miss"])
+        self.assertIsInstance(requests[-1][4], jma.CacheMissError)
+
+    def test_stats(self):
+        stats = jma.Stats()
+        j = self.new_jma(stats)
+        list(j.get_ten_minutely_data(self.prec_no, self.block_no_okazaki, 2018, 9, 28, as_="compact"))
+        j.get_ten_minutely_range(self.prec_no, self.block_no_okazaki,
+                                 datetime.date(2018, 9, 1), datetime.date(2018, 9, 2), as_="columns")
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot["ten_minutely"]["requests"], 3)
+        self.assertEqual(snapshot["ten_minutely"]["parses"], 3)
+        self.assertEqual(snapshot["ten_minutely"]["rows"], 3 * 144)
+        self.assertEqual(snapshot["stations"]["requests"], 1)
+        self.assertEqual(snapshot["catalog"], {"hits": 1, "misses": 1})
+        text = stats.to_prometheus()
+        self.assertIn('jma_requests_total{kind="ten_minutely"} 3', text)
+        self.assertIn('jma_catalog_lookups_total{result="hit"} 1', text)
+        self.assertIn("# TYPE jma_parse_seconds_total counter", text)
+
+    def test_statsd(self):
+        sent = []
+
+        class Client:
+            def incr(self, name, count=1):
+                sent.append(("incr", name, count))
+
+            def timing(self, name, milliseconds):
+                sent.append(("timing", name))
+
+        j = self.new_jma(jma.StatsdInstrument(Client()))
+        list(j.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28))
+        self.assertIn(("incr", "jma.hourly.rows", 24), sent)
+        self.assertIn(("timing", "jma.hourly.parse"), sent)
+        self.assertIn(("incr", "jma.catalog.misses", 1), sent)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,36 @@
 import unittest
 import datetime
+import os
+import tempfile
 
 import jma
+from jma.core import _station_vars
+from jma.testing import FixtureServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class FixtureServerTestCase(unittest.TestCase):
+    """fixturesを返すローカルサーバを使うテストの基底クラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FixtureServer(FIXTURES_DIR).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        del self.server.requested_urls[:]
+        self.jma = jma.Jma(catalog=jma.StationCatalog(), base_url=self.server.base_url)
+        self.prec_no = "51"
+        self.block_no_nagoya = "47636"
+        self.block_no_okazaki = "0467"
+
+    def requested_urls(self, keyword):
+        return [url for url in self.server.requested_urls if keyword in url]
+
 
 class JmaTestCase(unittest.TestCase):
     """Jma test cases."""
@@ -89,5 +118,269 @@ class JmaTestCase(unittest.TestCase):
             self.assertEqual(datetime.datetime(self.year, self.month, self.day) + datetime.timedelta(hours=i), data.dt)
             i += 1
 
+class StationCatalogTestCase(FixtureServerTestCase):
+    """StationCatalog test cases."""
+
+    def count_station_requests(self):
+        return len(self.requested_urls("prefecture.php"))
+
+    # 2回目以降は地点情報を取得しない
+    def test_get_hourly_data_fetches_stations_once(self):
+        for day in (27, 28):
+            list(self.jma.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, day))
+        self.assertEqual(self.count_station_requests(), 1)
+        self.assertEqual(len(self.server.requested_urls), 3)
+
+    def test_get_stations_deduplicates(self):
+        block_nos = [station.block_no for station in self.jma.get_stations(self.prec_no)]
+        self.assertEqual(len(block_nos), len(set(block_nos)))
+        self.assertNotIn("00", block_nos)
+        self.assertEqual(self.jma.get_station(self.prec_no, self.block_no_nagoya).name, "名古屋")
+
+    def test_refresh_stations(self):
+        self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        self.jma.refresh_stations(self.prec_no)
+        self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        self.assertEqual(self.count_station_requests(), 2)
+        self.jma.catalog.invalidate()
+        self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        self.assertEqual(self.count_station_requests(), 3)
+
+    def test_ttl_expired(self):
+        j = jma.Jma(catalog=jma.StationCatalog(ttl=0), base_url=self.server.base_url)
+        j.get_station(self.prec_no, self.block_no_nagoya)
+        j.get_station(self.prec_no, self.block_no_nagoya)
+        self.assertEqual(self.count_station_requests(), 2)
+
+    # ファイルに保存したキャッシュは別インスタンスから使える
+    def test_persistent_catalog(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "stations.json")
+            station = jma.Jma(catalog=jma.StationCatalog(path=path), base_url=self.server.base_url).get_station(self.prec_no, "1285")
+            restored = jma.Jma(catalog=jma.StationCatalog(path=path), base_url=self.server.base_url).get_station(self.prec_no, "1285")
+        self.assertEqual(self.count_station_requests(), 1)
+        self.assertEqual(_station_vars(station), _station_vars(restored))
+        self.assertEqual(restored.observation_end_date, datetime.date(2008, 3, 31))
+
+    # 地点のメソッドは地点を返したJmaの設定(base_url、キャッシュなど)で取得する
+    def test_station_uses_owning_jma(self):
+        station = self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        self.assertEqual(len(list(station.get_hourly_data(2018, 9, 28))), 24)
+        self.assertEqual(len(list(station.get_hourly_range(datetime.date(2018, 9, 27), datetime.date(2018, 9, 28)))), 48)
+        self.assertEqual(len(list(station.get_daily_data(2018, 9))), 30)
+        self.assertEqual(len(self.requested_urls("/view/")), 4)
+        prefecture = [prefecture for prefecture in self.jma.get_prefectures() if prefecture.prec_no == self.prec_no][0]
+        self.assertEqual(len(list(prefecture.get_stations())), 8)
+        self.assertNotIn("_jma", repr(station))
+
+    def test_invalid_block_no(self):
+        with self.assertRaises(jma.InvalidBlockNo):
+            self.jma.get_station(self.prec_no, "99999")
+
+    # 全国の地点一覧は都府県毎に1回だけ取得する
+    def test_get_all_stations(self):
+        stations = self.jma.get_all_stations()
+        self.assertEqual(len(stations), 8)
+        self.assertEqual(self.count_station_requests(), 61)
+        self.assertEqual(len(self.jma.get_all_stations()), 8)
+        self.assertEqual(self.count_station_requests(), 61)
+
+    # prec_noを省略してblock_noだけで引ける
+    def test_get_station_by_block_no(self):
+        station = self.jma.get_station(self.block_no_okazaki)
+        self.assertEqual((station.prec_no, station.name), (self.prec_no, "岡崎"))
+        requests = self.count_station_requests()
+        self.assertEqual(self.jma.get_station(self.block_no_nagoya).name, "名古屋")
+        self.assertEqual(self.count_station_requests(), requests)
+        with self.assertRaises(jma.InvalidBlockNo):
+            self.jma.get_station("99999")
+
+    # 取得済みの都府県の地点は全国を取得しなくても引ける
+    def test_block_no_index(self):
+        list(self.jma.get_stations(self.prec_no))
+        self.assertEqual(self.jma.get_station("1285").name, "鳳来")
+        self.assertEqual(self.count_station_requests(), 1)
+        self.jma.catalog.invalidate(self.prec_no)
+        self.assertIsNone(self.jma.catalog.find("1285"))
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "stations.json")
+            jma.Jma(catalog=jma.StationCatalog(path=path), base_url=self.server.base_url).get_station(self.prec_no, "1285")
+            self.assertEqual(jma.StationCatalog(path=path).find(self.block_no_nagoya), self.prec_no)
+
+
+class DateRangeTestCase(FixtureServerTestCase):
+    """Date range test cases."""
+
+    def test_get_hourly_range(self):
+        start = datetime.date(2018, 9, 27)
+        data = self.jma.get_hourly_range(self.prec_no, self.block_no_nagoya, start, datetime.date(2018, 9, 29))
+        dts = [row.dt for row in data]
+        expected = [datetime.datetime(2018, 9, 27) + datetime.timedelta(hours=i) for i in range(1, 3 * 24 + 1)]
+        self.assertEqual(dts, expected)
+        self.assertEqual(len(data.errors), 0)
+        self.assertEqual(len(self.requested_urls("prefecture.php")), 1)
+
+    # 未来の日付はエラーとして記録して続ける
+    def test_get_ten_minutely_range_with_future_date(self):
+        today = jma.jst_today()
+        start = today - datetime.timedelta(days=1)
+        end = today + datetime.timedelta(days=1)
+        data = self.jma.get_ten_minutely_range(self.prec_no, self.block_no_okazaki, start, end)
+        rows = list(data)
+        self.assertEqual(len(rows), 2 * 144)
+        self.assertEqual(rows[0].type, jma.STATION_TYPE_A)
+        self.assertEqual(list(data.errors), [end])
+        self.assertIsInstance(data.errors[end], jma.FutureDateError)
+        self.assertEqual(len(self.requested_urls("10min_a1.php")), 2)
+
+
+class SummaryDataTestCase(FixtureServerTestCase):
+    """Daily and monthly data test cases."""
+
+    def test_get_daily_data(self):
+        rows = list(self.jma.get_daily_data(self.prec_no, self.block_no_nagoya, 2018, 9))
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(rows[0].type, jma.STATION_TYPE_S)
+        self.assertEqual([row.date for row in rows[:2]], [datetime.date(2018, 9, 1), datetime.date(2018, 9, 2)])
+        self.assertIsInstance(rows[0].max_temperature, float)
+        self.assertIsInstance(rows[0].humidity, int)
+        self.assertIsInstance(rows[0].weather_daytime, str)
+        self.assertTrue(all(row.max_temperature > row.min_temperature for row in rows))
+        self.assertIsNone(rows[0].snowfall)
+        # 1か月分を1回のリクエストで取得する
+        self.assertEqual(len(self.requested_urls("daily_s1.php")), 1)
+        self.assertIn("month=9", self.requested_urls("daily_s1.php")[0])
+
+    def test_get_daily_data_a(self):
+        rows = list(self.jma.get_daily_data(self.prec_no, self.block_no_okazaki, 2018, 9))
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(rows[0].type, jma.STATION_TYPE_A)
+        self.assertFalse(hasattr(rows[0], "air_pressure_spot"))
+        self.assertIsNone(rows[16].daylight_hours)
+        self.assertIn(rows[0].most_frequent_wind_direction, ("N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
+                                                             "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"))
+
+    def test_get_monthly_data(self):
+        for block_no, station_type in ((self.block_no_nagoya, jma.STATION_TYPE_S), (self.block_no_okazaki, jma.STATION_TYPE_A)):
+            rows = list(self.jma.get_monthly_data(self.prec_no, block_no, 2018))
+            self.assertEqual([row.date for row in rows], [datetime.date(2018, month, 1) for month in range(1, 13)])
+            self.assertEqual(rows[0].type, station_type)
+            self.assertGreater(rows[7].temperature, rows[0].temperature)
+        self.assertIsInstance(rows[0].quality, (dict, type(None)))
+        self.assertEqual(len(self.requested_urls("monthly_")), 2)
+
+    def test_get_daily_data_with_future_date(self):
+        with self.assertRaises(jma.FutureDateError):
+            list(self.jma.get_daily_data(self.prec_no, self.block_no_nagoya, 2100, 1))
+
+
+class StreamingTestCase(FixtureServerTestCase):
+    """Streaming parse test cases."""
+
+    def setUp(self):
+        super().setUp()
+        self.streaming = jma.Jma(catalog=self.jma.catalog, base_url=self.server.base_url, streaming=True)
+
+    # ページを全て読んでから解析した場合と同じ行を返す
+    def test_same_rows(self):
+        for block_no in (self.block_no_nagoya, self.block_no_okazaki):
+            for get in ("get_hourly_data", "get_ten_minutely_data"):
+                for as_ in (None, "compact"):
+                    rows = list(getattr(self.streaming, get)(self.prec_no, block_no, 2018, 9, 28, as_=as_))
+                    expected = list(getattr(self.jma, get)(self.prec_no, block_no, 2018, 9, 28, as_=as_))
+                    self.assertEqual([repr(row) for row in rows], [repr(row) for row in expected])
+
+    def test_future_date(self):
+        tomorrow = jma.jst_today() + datetime.timedelta(days=1)
+        with self.assertRaises(jma.FutureDateError):
+            list(self.streaming.get_hourly_data(self.prec_no, self.block_no_nagoya,
+                                                tomorrow.year, tomorrow.month, tomorrow.day))
+
+    # 途中でやめても次の取得に影響しない
+    def test_stop_early(self):
+        rows = self.streaming.get_ten_minutely_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28)
+        next(rows)
+        rows.close()
+        self.assertEqual(len(list(self.streaming.get_ten_minutely_data(self.prec_no, self.block_no_nagoya, 2018, 9, 27))), 144)
+
+
+class ParserTestCase(unittest.TestCase):
+    """Parser backend test cases."""
+
+    def read_fixture(self, name):
+        with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+            return f.read()
+
+    # lxmlとrequests_htmlで同じ行になる
+    def test_parsers_produce_identical_rows(self):
+        fixtures = [
+            ("hourly_s1.html", jma.HourlyWeatherDataRow),
+            ("hourly_a1.html", jma.HourlyWeatherDataRow),
+            ("10min_s1.html", jma.TenMinutelyWeatherDataRow),
+            ("10min_a1.html", jma.TenMinutelyWeatherDataRow),
+        ]
+        fast = jma.Jma(parser="lxml")
+        slow = jma.Jma(parser="requests_html")
+        for name, row_class in fixtures:
+            content = self.read_fixture(name)
+            rows = [vars(row) for row in fast._parse_data(content, row_class, 2018, 9, 28, name)]
+            expected = [vars(row) for row in slow._parse_data(content, row_class, 2018, 9, 28, name)]
+            self.assertEqual(rows, expected)
+            self.assertIn(len(rows), (24, 144))
+
+    def test_parsers_produce_identical_summary_rows(self):
+        fast = jma.Jma(parser="lxml")
+        slow = jma.Jma(parser="requests_html")
+        for name in ("daily_s1.html", "daily_a1.html"):
+            content = self.read_fixture(name)
+            rows = [vars(jma.DailyWeatherDataRow(row, 2018, 9, name)) for row in fast._parse_table(content, None)]
+            expected = [vars(jma.DailyWeatherDataRow(row, 2018, 9, name)) for row in slow._parse_table(content, None)]
+            self.assertEqual(rows, expected)
+            self.assertEqual(len(rows), 30)
+
+    def test_parsers_produce_identical_stations(self):
+        content = self.read_fixture("prefecture_51.html")
+        stations = jma.Jma(parser="lxml")._parse_stations(content, "51")
+        self.assertEqual(stations, jma.Jma(parser="requests_html")._parse_stations(content, "51"))
+        self.assertEqual(len(stations), 8)
+
+    def test_parsers_detect_future_date(self):
+        content = self.read_fixture("future.html")
+        for parser in ("lxml", "requests_html"):
+            with self.assertRaises(jma.FutureDateError):
+                list(jma.Jma(parser=parser)._parse_data(content, jma.HourlyWeatherDataRow, 2100, 1, 1, ""))
+
+    def chunks(self, content, size=1000):
+        return (content[i:i + size] for i in range(0, len(content), size))
+
+    # 少しずつ読んで解析しても同じ行になる
+    def test_stream_data_table(self):
+        for parser in (jma.LxmlParser(), jma.RequestsHTMLParser()):
+            for name, header_rows in (("hourly_s1.html", 2), ("10min_a1.html", 2), ("daily_s1.html", None)):
+                content = self.read_fixture(name)
+                rows = list(parser.stream_data_table(self.chunks(content), header_rows).rows)
+                self.assertEqual(rows, parser.data_table(content, header_rows).rows)
+            content = self.read_fixture("future.html")
+            table = parser.stream_data_table(self.chunks(content))
+            self.assertIsNone(table.rows)
+            self.assertEqual(table.main_text, parser.data_table(content).main_text)
+
+    # 最初の行はページを全て読む前に返す
+    def test_stream_yields_rows_before_end(self):
+        content = self.read_fixture("10min_s1.html")
+        read = []
+
+        def chunks():
+            for chunk in self.chunks(content):
+                read.append(len(chunk))
+                yield chunk
+        rows = jma.LxmlParser().stream_data_table(chunks()).rows
+        first = next(rows)
+        self.assertEqual(first[0].text, "00:10")
+        self.assertLess(sum(read), len(content) / 2)
+        self.assertEqual(len(list(rows)), 143)
+        self.assertEqual(sum(read), len(content))
+
+
 if __name__ == '__main__':
     unittest.main()
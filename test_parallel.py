@@ -0,0 +1,79 @@
+import unittest
+import datetime
+import time
+
+import jma
+from jma.parallel import RateLimiter, fetch_many
+
+from test_jma import FixtureServerTestCase
+
+
+class RateLimiterTestCase(unittest.TestCase):
+    """RateLimiter test cases."""
+
+    def test_acquire_waits_for_tokens(self):
+        limiter = RateLimiter(rate=20, burst=2)
+        started = time.monotonic()
+        for i in range(6):
+            limiter.acquire("http://www.data.jma.go.jp/obd/stats/etrn/select/prefecture00.php")
+        # 2回はburst、残り4回は0.05秒毎
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+
+    # ホストが違えば別のバケット
+    def test_buckets_per_host(self):
+        limiter = RateLimiter(rate=1, burst=1)
+        started = time.monotonic()
+        limiter.acquire("http://a.example/")
+        limiter.acquire("http://b.example/")
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+class FetchManyTestCase(FixtureServerTestCase):
+    """fetch_many test cases."""
+
+    def setUp(self):
+        super().setUp()
+        self.jma.rate_limiter = RateLimiter(rate=1000, burst=10)
+
+    def test_fetch_many_ordered(self):
+        station = self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        jobs = [(station, datetime.date(2018, 9, day), jma.DATA_TYPE_HOURLY) for day in range(1, 11)]
+        jobs.append(((self.prec_no, self.block_no_okazaki), datetime.date(2018, 9, 1), jma.DATA_TYPE_TEN_MINUTELY))
+        results = list(fetch_many(jobs, workers=4, ordered=True, jma=self.jma))
+        self.assertEqual([result.job.date for result in results], [job[1] for job in jobs])
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(results[3].rows[0].dt, datetime.datetime(2018, 9, 4, 1))
+        self.assertEqual(len(results[-1].rows), 144)
+
+    # 失敗したjobがあっても他のjobは続ける
+    def test_fetch_many_errors(self):
+        jobs = [
+            ((self.prec_no, "99999"), datetime.date(2018, 9, 1), jma.DATA_TYPE_HOURLY),
+            ((self.prec_no, self.block_no_nagoya), datetime.date(2100, 1, 1), jma.DATA_TYPE_HOURLY),
+            ((self.prec_no, self.block_no_nagoya), datetime.date(2018, 9, 1), jma.DATA_TYPE_HOURLY),
+        ]
+        results = {result.job.station[1] + str(result.job.date): result for result in fetch_many(jobs, workers=2, jma=self.jma)}
+        self.assertEqual(len(results), 3)
+        self.assertIsInstance(results["999992018-09-01"].error, jma.InvalidBlockNo)
+        self.assertIsInstance(results["476362100-01-01"].error, jma.FutureDateError)
+        self.assertEqual(len(results["476362018-09-01"].rows), 24)
+
+    # jmaにrate_limiterが無ければ、渡したrate_limiterでjob毎に制限する
+    def test_rate_limiter_with_jma(self):
+        self.jma.rate_limiter = None
+        self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        jobs = [((self.prec_no, self.block_no_nagoya), datetime.date(2018, 9, day), jma.DATA_TYPE_HOURLY) for day in range(1, 6)]
+        started = time.monotonic()
+        results = list(fetch_many(jobs, workers=4, jma=self.jma, rate_limiter=RateLimiter(rate=20, burst=1)))
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+        self.assertTrue(all(result.ok for result in results))
+
+    def test_rate_limiter_conflicts_with_jma(self):
+        with self.assertRaises(ValueError):
+            list(fetch_many([], jma=self.jma, rate_limiter=RateLimiter(rate=2)))
+        # jmaと同じrate_limiterなら制限は1回
+        self.assertEqual(list(fetch_many([], jma=self.jma, rate_limiter=self.jma.rate_limiter)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
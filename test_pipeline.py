@@ -0,0 +1,85 @@
+import unittest
+import datetime
+
+import jma
+from jma.parallel import RateLimiter, fetch_many
+
+from test_jma import FixtureServerTestCase
+from test_instrument import RecordingInstrument
+
+
+class PipelineTestCase(FixtureServerTestCase):
+    """Pipeline test cases."""
+
+    def setUp(self):
+        super().setUp()
+        self.jma.rate_limiter = RateLimiter(rate=1000, burst=10)
+
+    def jobs(self, days=4):
+        jobs = [((self.prec_no, self.block_no_nagoya), datetime.date(2018, 9, day), jma.DATA_TYPE_HOURLY)
+                for day in range(1, days + 1)]
+        jobs.append(((self.prec_no, self.block_no_okazaki), datetime.date(2018, 9, 1), jma.DATA_TYPE_TEN_MINUTELY))
+        return jobs
+
+    # スレッドだけの場合と同じ行を返す
+    def test_same_rows_as_fetch_many(self):
+        jobs = self.jobs()
+        expected = list(fetch_many(jobs, ordered=True, jma=self.jma))
+        for as_ in (None, "compact"):
+            results = list(jma.fetch_parsed(jobs, parse_workers=2, ordered=True, jma=self.jma, as_=as_))
+            self.assertEqual([result.job for result in results], [result.job for result in expected])
+            for result, expected_result in zip(results, expected):
+                self.assertTrue(result.ok)
+                self.assertEqual([repr(row) for row in result.rows], [repr(row) for row in expected_result.rows])
+
+    # rate_limiterの扱いはfetch_manyと同じ
+    def test_rate_limiter_conflicts_with_jma(self):
+        with self.assertRaises(ValueError):
+            jma.Pipeline(jma=self.jma, rate_limiter=RateLimiter(rate=2))
+        self.jma.rate_limiter = None
+        pipeline = jma.Pipeline(jma=self.jma, rate_limiter=RateLimiter(rate=2))
+        self.assertIsNotNone(pipeline._rate_limiter)
+
+    def test_columns(self):
+        results = list(jma.fetch_parsed(self.jobs(1), parse_workers=1, ordered=True, jma=self.jma, as_="columns"))
+        self.assertIsInstance(results[0].rows, jma.ColumnarData)
+        self.assertEqual(len(results[0].rows), 24)
+        self.assertEqual(results[1].rows.station_type, jma.STATION_TYPE_A)
+        self.assertEqual(len(results[1].rows), 144)
+
+    # 失敗したjobがあっても他のjobは続ける
+    def test_errors(self):
+        jobs = [
+            ((self.prec_no, "99999"), datetime.date(2018, 9, 1), jma.DATA_TYPE_HOURLY),
+            ((self.prec_no, self.block_no_nagoya), datetime.date(2100, 1, 1), jma.DATA_TYPE_HOURLY),
+            ((self.prec_no, self.block_no_nagoya), datetime.date(2018, 9, 1), jma.DATA_TYPE_HOURLY),
+        ]
+        results = list(jma.fetch_parsed(jobs, parse_workers=1, ordered=True, jma=self.jma))
+        self.assertIsInstance(results[0].error, jma.InvalidBlockNo)
+        self.assertIsInstance(results[1].error, jma.FutureDateError)
+        self.assertEqual(len(results[2].rows), 24)
+
+    # 結果を取り出さなければmax_pendingより先は取得しない
+    def test_backpressure(self):
+        self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        pipeline = jma.Pipeline(io_workers=2, parse_workers=1, jma=self.jma, max_pending=3)
+        results = pipeline.run(self.jobs(20))
+        next(results)
+        self.assertLessEqual(len(self.requested_urls("/view/")), 4)
+        self.assertEqual(len(list(results)), 20)
+
+    def test_instrument(self):
+        instrument = RecordingInstrument()
+        self.jma.instrument = instrument
+        results = list(jma.fetch_parsed(self.jobs(1), parse_workers=1, jma=self.jma))
+        nulls = {result.job.data_frequency: sum(value is None for row in result.rows
+                                                for name, value in vars(row).items() if name != "quality")
+                 for result in results}
+        events = [event for event in instrument.events if event[0] in ("parse", "rows") and event[1] != "stations"]
+        self.assertIn(("parse", "hourly", 24), events)
+        self.assertIn(("rows", "hourly", 24, nulls["hourly"]), events)
+        self.assertIn(("rows", "ten_minutely", 144, nulls["ten_minutely"]), events)
+
+
+if __name__ == '__main__':
+    unittest.main()
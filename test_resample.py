@@ -0,0 +1,142 @@
+import unittest
+import datetime
+import itertools
+import types
+
+import jma
+
+from test_jma import FixtureServerTestCase
+
+
+def ten_minutely_rows(start, values):
+    '''startの次の10分からvaluesのtemperatureを持つ行'''
+    for i, value in enumerate(values):
+        yield types.SimpleNamespace(dt=start + datetime.timedelta(minutes=10 * (i + 1)), temperature=value)
+
+
+class ResamplerTestCase(FixtureServerTestCase):
+    """Resampler test cases."""
+
+    # 10分毎の行から1時間毎の平均などを作る
+    def test_hourly_from_ten_minutely(self):
+        rows = list(self.jma.get_ten_minutely_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28))
+        how = {"temperature": ["mean", "min", "max"], "precipitation": "sum", "max_wind_speed": "max",
+               "wind_direction": "last"}
+        hourly = list(jma.resample(rows, jma.DATA_TYPE_TEN_MINUTELY, datetime.timedelta(hours=1), how,
+                                   fill={"precipitation": 0.0}))
+        self.assertEqual(len(hourly), 24)
+        self.assertEqual(hourly[0].start, datetime.datetime(2018, 9, 28, 0, 0))
+        self.assertEqual(hourly[0].dt, datetime.datetime(2018, 9, 28, 1, 0))
+        for i, row in enumerate(hourly):
+            window = rows[i * 6:(i + 1) * 6]
+            temperatures = [r.temperature for r in window if r.temperature is not None]
+            self.assertAlmostEqual(row.temperature_mean, sum(temperatures) / len(temperatures))
+            self.assertEqual(row.temperature_min, min(temperatures))
+            self.assertEqual(row.temperature_max, max(temperatures))
+            self.assertAlmostEqual(row.precipitation, sum(r.precipitation or 0 for r in window))
+            # lastはNoneでない最後の値
+            directions = [r.wind_direction for r in window if r.wind_direction is not None]
+            self.assertEqual(row.wind_direction, directions[-1] if directions else None)
+
+    # 24:00の行はその日の区間に入る
+    def test_daily_window_and_24_00(self):
+        data = self.jma.get_ten_minutely_range(self.prec_no, self.block_no_okazaki,
+                                               datetime.date(2018, 9, 1), datetime.date(2018, 9, 2), as_="compact")
+        rows = list(data)
+        self.assertEqual(rows[143].dt, datetime.datetime(2018, 9, 2, 0, 0))
+        daily = list(data.resample(datetime.timedelta(days=1), {"precipitation": "sum", "daylight_minute": "sum"},
+                                   fill={"precipitation": 0.0}))
+        self.assertEqual([row.start for row in daily], [datetime.datetime(2018, 9, 1), datetime.datetime(2018, 9, 2)])
+        self.assertEqual(daily[0].dt, datetime.datetime(2018, 9, 2))
+        self.assertEqual(daily[0].precipitation, round(sum(r.precipitation or 0 for r in rows[:144]), 6))
+        # 日照時間は半分が欠測
+        self.assertIsNone(daily[0].daylight_minute)
+        daily = list(data.resample(datetime.timedelta(days=1), {"daylight_minute": "sum"}, completeness=0.4))
+        self.assertEqual(daily[0].daylight_minute, sum(r.daylight_minute or 0 for r in rows[:144]))
+        self.assertEqual(daily[0].quality, {"daylight_minute": ")"})
+
+    def test_hourly_rows(self):
+        rows = list(self.jma.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28))
+        resampled = list(jma.resample(rows, jma.DATA_TYPE_HOURLY, datetime.timedelta(hours=6), {"temperature": "max"}))
+        self.assertEqual([row.dt.hour for row in resampled], [6, 12, 18, 0])
+        self.assertEqual(resampled[-1].temperature, max(row.temperature for row in rows[18:]))
+
+    # 欠けた値の割合がcompletenessを超えるとNone、超えなければ準正常値
+    def test_completeness(self):
+        start = datetime.datetime(2018, 9, 28)
+        values = [1.0, 2.0, None, 4.0, 5.0, 6.0] + [1.0, None, None, None, 5.0, 6.0]
+        window = datetime.timedelta(hours=1)
+        rows = list(jma.resample(ten_minutely_rows(start, values), jma.DATA_TYPE_TEN_MINUTELY, window,
+                                 {"temperature": "mean"}))
+        self.assertEqual(rows[0].temperature, 3.6)
+        self.assertEqual(rows[0].quality, {"temperature": ")"})
+        self.assertIsNone(rows[1].temperature)
+        self.assertIsNone(rows[1].quality)
+        rows = list(jma.resample(ten_minutely_rows(start, values), jma.DATA_TYPE_TEN_MINUTELY, window,
+                                 {"temperature": "mean"}, completeness=0.5))
+        self.assertEqual(rows[1].temperature, 4.0)
+        # 行自体が無い場合も欠けた値に数える
+        rows = list(jma.resample(ten_minutely_rows(start, [1.0, 2.0]), jma.DATA_TYPE_TEN_MINUTELY, window,
+                                 {"temperature": "mean"}))
+        self.assertIsNone(rows[0].temperature)
+
+    # 行は必要な分だけ読む
+    def test_streaming(self):
+        values = itertools.cycle([1.0, 2.0, 3.0])
+        rows = ten_minutely_rows(datetime.datetime(2018, 9, 28), values)
+        resampled = jma.resample(rows, jma.DATA_TYPE_TEN_MINUTELY, datetime.timedelta(minutes=30), {"temperature": "sum"})
+        self.assertEqual([row.temperature for row in itertools.islice(resampled, 3)], [6.0, 6.0, 6.0])
+
+    # 10分毎の過去1時間の最大値。全ての行から区間の値を選んで求めた値と同じ
+    def test_rolling_max(self):
+        rows = list(self.jma.get_ten_minutely_range(self.prec_no, self.block_no_nagoya,
+                                                    datetime.date(2018, 9, 27), datetime.date(2018, 9, 28)))
+        hour = datetime.timedelta(hours=1)
+        for every in (True, datetime.timedelta(minutes=30)):
+            rolling = list(jma.resample(rows, jma.DATA_TYPE_TEN_MINUTELY, hour, {"max_wind_speed": ["max", "min"]},
+                                        completeness=0, rolling=every))
+            step = datetime.timedelta(minutes=10) if every is True else every
+            self.assertEqual([row.dt for row in rolling],
+                             [rows[0].dt - datetime.timedelta(minutes=10) + step * (i + 1) for i in range(len(rolling))])
+            self.assertEqual(rolling[-1].dt, rows[-1].dt)
+            for row in rolling:
+                speeds = [r.max_wind_speed for r in rows if row.dt - hour < r.dt <= row.dt and r.max_wind_speed is not None]
+                self.assertEqual(row.start, row.dt - hour)
+                self.assertEqual(row.max_wind_speed_max, max(speeds) if speeds else None)
+                self.assertEqual(row.max_wind_speed_min, min(speeds) if speeds else None)
+
+    # rollingがwindowと同じなら重ねない集計と同じ。行の無い区間は返さない
+    def test_rolling_equals_tumbling(self):
+        start = datetime.datetime(2018, 9, 28)
+        values = [3.0, 1.0, None, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0] + [None] * 12 + [5.0, 3.0, 5.0]
+        rows = [row for row in ten_minutely_rows(start, values) if row.temperature is not None or row.dt.hour != 2]
+        how = {"temperature": ["mean", "min", "max", "sum", "last"]}
+        window = datetime.timedelta(minutes=30)
+        expected = [vars(row) for row in jma.resample(rows, jma.DATA_TYPE_TEN_MINUTELY, window, how)]
+        self.assertEqual([vars(row) for row in jma.resample(rows, jma.DATA_TYPE_TEN_MINUTELY, window, how, rolling=window)],
+                         expected)
+        self.assertEqual(len(expected), 7)
+
+    def test_invalid_arguments(self):
+        hour = datetime.timedelta(hours=1)
+        with self.assertRaises(ValueError):
+            jma.Resampler(jma.DATA_TYPE_TEN_MINUTELY, datetime.timedelta(minutes=15), {"temperature": "mean"})
+        with self.assertRaises(ValueError):
+            jma.Resampler(jma.DATA_TYPE_TEN_MINUTELY, datetime.timedelta(hours=7), {"temperature": "mean"})
+        with self.assertRaises(ValueError):
+            jma.Resampler(jma.DATA_TYPE_TEN_MINUTELY, hour, {"temperature": "median"})
+        with self.assertRaises(jma.InvalidDataFrequency):
+            jma.Resampler(jma.DATA_TYPE_DAILY, hour, {"temperature": "mean"})
+        with self.assertRaises(ValueError):
+            jma.Resampler(jma.DATA_TYPE_TEN_MINUTELY, hour, {"temperature": "max"}, rolling=2 * hour)
+        with self.assertRaises(ValueError):
+            jma.Resampler(jma.DATA_TYPE_TEN_MINUTELY, hour, {"temperature": "max"}, rolling=datetime.timedelta(minutes=15))
+        # rollingの場合はwindowが1日を割り切らなくてもよい
+        jma.Resampler(jma.DATA_TYPE_TEN_MINUTELY, datetime.timedelta(hours=7), {"temperature": "max"}, rolling=True)
+        rows = ten_minutely_rows(datetime.datetime(2018, 9, 28), [1.0, 2.0])
+        with self.assertRaises(ValueError):
+            list(jma.resample(reversed(list(rows)), jma.DATA_TYPE_TEN_MINUTELY, hour, {"temperature": "mean"}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import pickle
+
+import jma
+from jma.rows import CompactWeatherDataRow
+
+from test_jma import FixtureServerTestCase
+
+
+class CompactWeatherDataRowTestCase(FixtureServerTestCase):
+    """Compact row test cases."""
+
+    # 属性とreprが従来の行と同じ
+    def test_compatible_with_weather_data_row(self):
+        for get_data in (self.jma.get_hourly_data, self.jma.get_ten_minutely_data):
+            for block_no in (self.block_no_nagoya, self.block_no_okazaki):
+                rows = list(get_data(self.prec_no, block_no, 2018, 9, 28))
+                compact = list(get_data(self.prec_no, block_no, 2018, 9, 28, as_="compact"))
+                self.assertEqual(len(compact), len(rows))
+                for row, compact_row in zip(rows, compact):
+                    self.assertIsInstance(compact_row, CompactWeatherDataRow)
+                    self.assertEqual(repr(compact_row), repr(row))
+                    self.assertEqual(dict(compact_row._asdict()), vars(row))
+                    self.assertEqual(compact_row.temperature, row.temperature)
+
+    # ページの情報は行の間で共有する
+    def test_page_context_is_shared(self):
+        rows = list(self.jma.get_ten_minutely_data(self.prec_no, self.block_no_okazaki, 2018, 9, 28, as_="compact"))
+        self.assertIs(rows[0].page, rows[-1].page)
+        self.assertEqual(rows[0].type, jma.STATION_TYPE_A)
+        self.assertFalse(hasattr(rows[0], "__dict__"))
+
+    def test_pickle(self):
+        row = next(iter(self.jma.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28, as_="compact")))
+        restored = pickle.loads(pickle.dumps(row))
+        self.assertEqual(repr(restored), repr(row))
+
+    def test_get_ten_minutely_range_compact(self):
+        import datetime
+        data = self.jma.get_ten_minutely_range(self.prec_no, self.block_no_nagoya,
+                                               datetime.date(2018, 9, 1), datetime.date(2018, 9, 2), as_="compact")
+        rows = list(data)
+        self.assertEqual(len(rows), 2 * 144)
+        self.assertEqual(rows[144].dt, datetime.datetime(2018, 9, 2, 0, 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
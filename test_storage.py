@@ -0,0 +1,67 @@
+import unittest
+import datetime
+import json
+import os
+import tempfile
+import threading
+
+from jma.core import _station_vars
+from jma.storage import replacing, write_json, params_from_json, params_to_json
+
+from test_jma import FixtureServerTestCase
+
+
+class StorageTestCase(FixtureServerTestCase):
+    """Storage helper test cases."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "data.json")
+
+    # 同じファイルに複数のスレッドから同時に保存しても一時ファイルがぶつからない
+    def test_concurrent_saves(self):
+        errors = []
+
+        def save(i):
+            try:
+                for _ in range(20):
+                    write_json(self.path, {"thread": i})
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=save, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(self.tmpdir.name), ["data.json"])
+
+    # 失敗した場合は元のファイルを残して一時ファイルを消す
+    def test_failed_write_keeps_original(self):
+        write_json(self.path, {"a": 1})
+        with self.assertRaises(TypeError):
+            write_json(self.path, {"a": object()})
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {"a": 1})
+        self.assertEqual(os.listdir(self.tmpdir.name), ["data.json"])
+
+    def test_hidden_temporary_file(self):
+        with replacing(self.path, hidden=True) as tmp_path:
+            self.assertTrue(os.path.basename(tmp_path).startswith("."))
+            with open(tmp_path, "w") as f:
+                f.write("x")
+        self.assertEqual(os.listdir(self.tmpdir.name), ["data.json"])
+
+    def test_station_params(self):
+        station = self.jma.get_station(self.prec_no, "1285")
+        params = params_to_json(_station_vars(station))
+        self.assertEqual(params["observation_end_date"], "2008-03-31")
+        self.assertEqual(json.loads(json.dumps(params)), params)
+        self.assertEqual(params_from_json(params)["observation_end_date"], datetime.date(2008, 3, 31))
+        self.assertIsInstance(station.observation_end_date, datetime.date)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import datetime
+import os
+import tempfile
+
+import jma
+from jma.parser import Cell
+from jma.sync import page_watermark
+
+from test_jma import FixtureServerTestCase, FIXTURES_DIR
+
+
+class SyncTestCase(FixtureServerTestCase):
+    """Jma.sync test cases."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.written = []
+        self.store = jma.WatermarkStore(os.path.join(self.tmpdir.name, "watermarks.json"), sink=self.sink)
+        self.block_no_horai = "1285"
+
+    def sink(self, station, data_frequency, date, rows):
+        self.written.append((station.block_no, date, rows))
+
+    # 観測が終了した地点は終了日まで取得し、次回からは取得しない
+    def test_sync_ended_station(self):
+        results = self.jma.sync([(self.prec_no, self.block_no_horai)], jma.DATA_TYPE_HOURLY, self.store,
+                                start=datetime.date(2008, 3, 30))
+        self.assertEqual(len(results), 1)
+        self.assertTrue(results[0].ok)
+        self.assertEqual(results[0].days, 2)
+        self.assertEqual(results[0].rows, 48)
+        self.assertEqual(results[0].watermark, datetime.datetime(2008, 4, 1))
+        self.assertEqual([date for block_no, date, rows in self.written], [datetime.date(2008, 3, 30), datetime.date(2008, 3, 31)])
+
+        del self.server.requested_urls[:]
+        store = jma.WatermarkStore(self.store.path)
+        results = self.jma.sync([(self.prec_no, self.block_no_horai)], jma.DATA_TYPE_HOURLY, store)
+        self.assertTrue(results[0].skipped)
+        self.assertEqual(results[0].watermark, datetime.datetime(2008, 4, 1))
+        self.assertEqual(self.requested_urls("hourly"), [])
+
+    # watermarkより後の日だけを取得する
+    def test_sync_from_watermark(self):
+        today = jma.jst_today()
+        station = self.jma.get_station(self.prec_no, self.block_no_okazaki)
+        yesterday = datetime.datetime.combine(today, datetime.time()) - datetime.timedelta(days=1)
+        self.store.commit(station, jma.DATA_TYPE_TEN_MINUTELY, yesterday.date(), [], yesterday)
+        del self.written[:]
+        results = self.jma.sync([station], jma.DATA_TYPE_TEN_MINUTELY, self.store, workers=2)
+        self.assertEqual(len(self.requested_urls("10min")), 2)
+        self.assertEqual(results[0].days, 2)
+        self.assertEqual(results[0].rows, 2 * 144)
+        self.assertEqual(results[0].watermark, yesterday + datetime.timedelta(days=2))
+        self.assertEqual(self.written[0][2][0].dt, yesterday + datetime.timedelta(minutes=10))
+
+    def test_sync_invalid_block_no(self):
+        results = self.jma.sync([(self.prec_no, "99999")], jma.DATA_TYPE_HOURLY, self.store)
+        self.assertIsInstance(results[0].error, jma.InvalidBlockNo)
+
+    # 途中までのページは値のある最後の時刻までを取得済みとする
+    def test_page_watermark(self):
+        with open(os.path.join(FIXTURES_DIR, "hourly_a1.html"), "rb") as f:
+            table_rows = self.jma._parse_table(f.read())
+        for i in range(15, 24):
+            table_rows[i] = [table_rows[i][0]] + [Cell("", []) for cell in table_rows[i][1:]]
+        date = datetime.date(2018, 9, 28)
+        rows = list(self.jma._rows(table_rows, jma.DATA_TYPE_HOURLY, jma.STATION_TYPE_A, 2018, 9, 28, ""))
+        self.assertEqual(page_watermark(rows, date, date), (False, datetime.datetime(2018, 9, 28, 15)))
+        # 数日経てば欠測のまま完成とする
+        self.assertEqual(page_watermark(rows, date, date + datetime.timedelta(days=2)), (True, datetime.datetime(2018, 9, 29)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import socket
+import time
+
+import jma
+from jma.testing import TRUNCATED_CHUNK
+from jma.transport import Transport
+
+from test_jma import FixtureServerTestCase
+
+
+class TransportTestCase(FixtureServerTestCase):
+    """Transport test cases."""
+
+    def setUp(self):
+        super().setUp()
+        self.jma.transport = Transport(backoff=0.01)
+
+    # 5xxは再試行する
+    def test_retry_on_server_error(self):
+        self.server.inject_errors(503, 502)
+        rows = list(self.jma.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28))
+        self.assertEqual(len(rows), 24)
+        self.assertEqual(len(self.server.requested_urls), 4)
+
+    def test_retries_exhausted(self):
+        self.jma.transport = Transport(backoff=0.01, retries=1)
+        self.server.inject_errors(500, 500)
+        with self.assertRaises(jma.HTTPStatusError) as cm:
+            self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        self.assertEqual(cm.exception.status_code, 500)
+        self.assertEqual(len(self.server.requested_urls), 2)
+
+    # 本文の途中で接続が切れた場合も再試行する
+    def test_retry_on_truncated_body(self):
+        self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        self.server.inject_errors(TRUNCATED_CHUNK)
+        rows = list(self.jma.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28))
+        self.assertEqual(len(rows), 24)
+        self.assertEqual(len(self.requested_urls("hourly")), 2)
+
+    def test_truncated_body_retries_exhausted(self):
+        self.jma.transport = Transport(backoff=0.01, retries=1)
+        self.server.inject_errors(TRUNCATED_CHUNK, TRUNCATED_CHUNK)
+        url = self.server.base_url + "/view/hourly_s1.php?prec_no=51&block_no=47636&year=2018&month=9&day=28&view="
+        with self.assertRaises(jma.TransportError) as cm:
+            self.jma.transport.get(url)
+        self.assertEqual(cm.exception.url, url)
+        self.assertEqual(len(self.server.requested_urls), 2)
+
+    # 4xxは再試行しない
+    def test_no_retry_on_client_error(self):
+        self.server.inject_errors(404)
+        with self.assertRaises(jma.HTTPStatusError):
+            self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        self.assertEqual(len(self.server.requested_urls), 1)
+
+    # forkした子プロセスでは親のSessionを使わない
+    def test_session_is_recreated_after_fork(self):
+        transport = Transport()
+        session = transport.session
+        self.assertIs(transport.session, session)
+        transport._pid = -1
+        self.assertIsNot(transport.session, session)
+
+    def test_missing_table_is_typed(self):
+        content = b"<html><body><div id='main'></div></body></html>"
+        with self.assertRaises(jma.DataNotFoundError):
+            list(self.jma._parse_data(content, jma.HourlyWeatherDataRow, 2018, 9, 28, ""))
+
+
+class TransportTimeoutTestCase(unittest.TestCase):
+    """Transport timeout test cases."""
+
+    def setUp(self):
+        # 接続を受け付けるだけで応答しないサーバ
+        self.listener = socket.socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(8)
+        self.addCleanup(self.listener.close)
+
+    def test_read_timeout(self):
+        transport = Transport(timeout=(1.0, 0.2), retries=1, backoff=0.01)
+        url = "http://127.0.0.1:{}/".format(self.listener.getsockname()[1])
+        started = time.monotonic()
+        with self.assertRaises(jma.TransportError) as cm:
+            transport.get(url)
+        self.assertLess(time.monotonic() - started, 2.0)
+        self.assertEqual(cm.exception.url, url)
+
+
+if __name__ == '__main__':
+    unittest.main()
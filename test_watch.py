@@ -0,0 +1,145 @@
+import unittest
+import datetime
+import os
+import tempfile
+import threading
+
+import jma
+from jma.parser import Cell
+from jma.transport import Transport
+from jma.watch import Watch, WatchScheduler
+
+from test_jma import FixtureServerTestCase, FIXTURES_DIR
+
+
+class WatchTestCase(FixtureServerTestCase):
+    """Watch test cases."""
+
+    def setUp(self):
+        super().setUp()
+        self.today = datetime.datetime.combine(jma.jst_today(), datetime.time())
+        self.yesterday = self.today - datetime.timedelta(days=1)
+        self.station = self.jma.get_station(self.prec_no, self.block_no_okazaki)
+
+    def run_for(self, scheduler, seconds=0.3):
+        timer = threading.Timer(seconds, scheduler.stop)
+        timer.start()
+        self.addCleanup(timer.cancel)
+        return list(scheduler.run())
+
+    def hourly_rows(self, date, published):
+        '''published時までだけ値のある1時間毎の行'''
+        with open(os.path.join(FIXTURES_DIR, "hourly_a1.html"), "rb") as f:
+            table_rows = self.jma._parse_table(f.read())
+        for i in range(published, 24):
+            table_rows[i] = [table_rows[i][0]] + [Cell("", []) for cell in table_rows[i][1:]]
+        return list(self.jma._rows(table_rows, jma.DATA_TYPE_HOURLY, jma.STATION_TYPE_A, date.year, date.month, date.day, ""))
+
+    # 前日から当日までを返した後は、翌日のページが公開されるまで間隔を延ばして確認する
+    def test_catch_up_and_back_off(self):
+        scheduler = WatchScheduler(self.jma, interval=0.01, max_interval=0.04)
+        watch = scheduler.add(self.station, jma.DATA_TYPE_TEN_MINUTELY, since=self.yesterday)
+        results = self.run_for(scheduler)
+        self.assertEqual(len(results), 1)
+        rows = results[0][1]
+        self.assertEqual(len(rows), 2 * 144)
+        self.assertEqual(rows[0].dt, self.yesterday + datetime.timedelta(minutes=10))
+        self.assertEqual(len(set(row.dt for row in rows)), len(rows))
+        self.assertEqual(watch.last, self.today + datetime.timedelta(days=1))
+        self.assertEqual(watch.delay, 0.04)
+        tomorrow = self.today + datetime.timedelta(days=1)
+        self.assertGreater(len(self.requested_urls("day={}".format(tomorrow.day))), 1)
+
+    # 公開された行だけを返し、24時の行まで返したら次の日に移る
+    def test_advance(self):
+        date = datetime.date(2018, 9, 28)
+        midnight = datetime.datetime(2018, 9, 28)
+        watch = Watch(self.station, jma.DATA_TYPE_HOURLY, midnight)
+        now = midnight + datetime.timedelta(hours=15, minutes=20)
+        rows, complete = watch.advance(self.hourly_rows(date, 15), date, now)
+        self.assertEqual([row.dt.hour for row in rows], list(range(1, 16)))
+        self.assertFalse(complete)
+        rows, complete = watch.advance(self.hourly_rows(date, 15), date, now)
+        self.assertEqual((rows, complete), ([], False))
+        rows, complete = watch.advance(self.hourly_rows(date, 24), date, now + datetime.timedelta(hours=9))
+        self.assertEqual(rows[-1].dt, datetime.datetime(2018, 9, 29))
+        self.assertEqual(len(rows), 9)
+        self.assertTrue(complete)
+        self.assertEqual(watch.last.date(), datetime.date(2018, 9, 29))
+
+    # 24時の行が公開されなくても、日付が変わってsettleが経てば次の日に移る
+    def test_settle(self):
+        date = datetime.date(2018, 9, 28)
+        watch = Watch(self.station, jma.DATA_TYPE_HOURLY, datetime.datetime(2018, 9, 28), settle=datetime.timedelta(hours=1))
+        rows = self.hourly_rows(date, 23)
+        self.assertEqual(len(watch.advance(rows, date, datetime.datetime(2018, 9, 29, 0, 30))[0]), 23)
+        rows, complete = watch.advance(rows, date, datetime.datetime(2018, 9, 29, 1))
+        self.assertEqual([row.dt for row in rows], [datetime.datetime(2018, 9, 29)])
+        self.assertTrue(complete)
+
+    # 内容が変わっていないページは解析しない
+    def test_unchanged_page_is_not_parsed(self):
+        parsed = []
+        parse_page = self.jma._parse_page
+        self.jma._parse_page = lambda content, url, *args: parsed.append(url) or parse_page(content, url, *args)
+        watch = Watch(self.station, jma.DATA_TYPE_TEN_MINUTELY, self.today)
+        self.assertEqual(len(watch.poll(self.jma, jma.jst_now())), 144)
+        self.assertEqual(len(parsed), 2)
+        self.assertEqual(watch.poll(self.jma, jma.jst_now()), [])
+        self.assertEqual(len(parsed), 2)
+        self.assertEqual(len(self.requested_urls("/view/")), 3)
+
+    # 通信のエラーでは止めずに次の確認で取り直す
+    def test_transport_error(self):
+        watch = Watch(self.station, jma.DATA_TYPE_HOURLY, self.today)
+        self.jma.transport = Transport(backoff=0.01, retries=0)
+        self.server.inject_errors(503)
+        self.assertEqual(watch.poll(self.jma, jma.jst_now()), [])
+        self.assertIsInstance(watch.error, jma.HTTPStatusError)
+        self.assertEqual(len(watch.poll(self.jma, jma.jst_now())), 24)
+        self.assertIsNone(watch.error)
+
+    # 複数の地点で1つのスケジューラを使う
+    def test_many_stations(self):
+        scheduler = WatchScheduler(self.jma, interval=0.01, max_interval=0.02, workers=2)
+        for block_no in (self.block_no_nagoya, self.block_no_okazaki):
+            scheduler.add((self.prec_no, block_no), jma.DATA_TYPE_HOURLY)
+        results = self.run_for(scheduler)
+        self.assertEqual(sorted(watch.station.block_no for watch, rows in results),
+                         sorted([self.block_no_nagoya, self.block_no_okazaki]))
+        self.assertTrue(all(len(rows) == 24 for watch, rows in results))
+        self.assertEqual(len(self.requested_urls("prefecture.php")), 1)
+
+    def test_jma_watch(self):
+        rows = self.jma.watch(self.prec_no, self.block_no_nagoya, jma.DATA_TYPE_HOURLY, interval=0.01, since=self.yesterday)
+        self.assertEqual(next(rows).dt, self.yesterday + datetime.timedelta(hours=1))
+        self.assertEqual(len([next(rows) for _ in range(47)]), 47)
+        rows.close()
+
+    # 当日と日付の変わり目は実行する環境のタイムゾーンによらず日本時間で決める
+    def test_jst(self):
+        utc_now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        self.assertLess(abs(jma.jst_now() - utc_now - datetime.timedelta(hours=9)), datetime.timedelta(seconds=5))
+        watch = WatchScheduler(self.jma).add(self.station, jma.DATA_TYPE_HOURLY)
+        self.assertIn(watch.last, (self.today, datetime.datetime.combine(jma.jst_today(), datetime.time())))
+
+    # ResponseCacheの有効期間中でも当日のページは取得し直す
+    def test_bypasses_response_cache(self):
+        with tempfile.TemporaryDirectory() as path:
+            cached = jma.Jma(catalog=self.jma.catalog, base_url=self.server.base_url, cache=jma.ResponseCache(path))
+            watch = Watch(self.station, jma.DATA_TYPE_HOURLY, self.today)
+            self.assertEqual(len(watch.poll(cached, jma.jst_now())), 24)
+            watch.poll(cached, jma.jst_now())
+            self.assertEqual(os.listdir(path), [])
+        # 当日と翌日、2回目は翌日をもう一度
+        self.assertEqual(len(self.requested_urls("/view/")), 3)
+        with self.assertRaises(ValueError):
+            WatchScheduler(jma.Jma(cache=jma.ResponseCache(path), offline=True))
+
+    def test_invalid_data_frequency(self):
+        with self.assertRaises(jma.InvalidDataFrequency):
+            WatchScheduler(self.jma).add(self.station, jma.DATA_TYPE_DAILY)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import datetime
+import os
+import sqlite3
+import tempfile
+
+import jma
+
+from test_jma import FixtureServerTestCase
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class SqliteWriterTestCase(FixtureServerTestCase):
+    """SqliteWriter test cases."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "jma.sqlite3")
+
+    def query(self, sql):
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute(sql).fetchall()
+        finally:
+            connection.close()
+
+    # (block_no, dt)が同じ行は置き換える
+    def test_upsert(self):
+        nagoya = self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        with jma.SqliteWriter(self.path, batch_size=10) as writer:
+            for i in range(2):
+                writer.write(nagoya, jma.DATA_TYPE_HOURLY, self.jma.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28))
+            writer.write(nagoya, jma.DATA_TYPE_HOURLY,
+                         self.jma.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 29, as_="compact"))
+        self.assertEqual(self.query("SELECT COUNT(*) FROM hourly_s"), [(48,)])
+        row = next(iter(self.jma.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28)))
+        self.assertEqual(self.query("SELECT block_no, dt, temperature FROM hourly_s ORDER BY dt LIMIT 1"),
+                         [(self.block_no_nagoya, "2018-09-28 01:00:00", row.temperature)])
+
+    # 地点の種類毎にテーブルを分ける
+    def test_tables_per_station_type(self):
+        okazaki = self.jma.get_station(self.prec_no, self.block_no_okazaki)
+        with jma.SqliteWriter(self.path) as writer:
+            writer.write(okazaki, jma.DATA_TYPE_TEN_MINUTELY, self.jma.get_ten_minutely_data(self.prec_no, self.block_no_okazaki, 2018, 9, 28))
+        self.assertEqual(self.query("SELECT COUNT(*) FROM ten_minutely_a"), [(144,)])
+        columns = [row[1] for row in self.query("PRAGMA table_info(ten_minutely_a)")]
+        self.assertNotIn("air_pressure_spot", columns)
+
+    # 例外で終わった場合は溜めた行を書き込まない
+    def test_discard_on_error(self):
+        nagoya = self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        with self.assertRaises(RuntimeError):
+            with jma.SqliteWriter(self.path) as writer:
+                writer.write(nagoya, jma.DATA_TYPE_HOURLY, self.jma.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 9, 28))
+                raise RuntimeError
+        self.assertEqual(self.query("SELECT name FROM sqlite_master"), [])
+
+    def test_sync_sink(self):
+        writer = jma.SqliteWriter(self.path)
+        self.addCleanup(writer.close)
+        store = jma.WatermarkStore(sink=writer.sink)
+        self.jma.sync([(self.prec_no, "1285")], jma.DATA_TYPE_HOURLY, store, start=datetime.date(2008, 3, 31))
+        self.assertEqual(self.query("SELECT COUNT(*) FROM hourly_a"), [(24,)])
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+class ParquetWriterTestCase(FixtureServerTestCase):
+    """ParquetWriter test cases."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def files(self):
+        return sorted(os.path.relpath(os.path.join(root, name), self.tmpdir.name)
+                      for root, dirs, names in os.walk(self.tmpdir.name) for name in names)
+
+    # prec_no/block_no/年月毎に分けて書き込む
+    def test_partitions(self):
+        nagoya = self.jma.get_station(self.prec_no, self.block_no_nagoya)
+        with jma.ParquetWriter(self.tmpdir.name) as writer:
+            writer.write(nagoya, jma.DATA_TYPE_HOURLY, self.jma.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 12, 31))
+        self.assertEqual(self.files(), [
+            os.path.join("hourly_s", "prec_no=51", "block_no=47636", "year=2018", "part-201812.parquet"),
+            os.path.join("hourly_s", "prec_no=51", "block_no=47636", "year=2019", "part-201901.parquet"),
+        ])
+        table = pyarrow.parquet.read_table(os.path.join(self.tmpdir.name, self.files()[0]))
+        self.assertEqual(table.num_rows, 23)
+        self.assertEqual(table.schema.field("humidity").type, pyarrow.int64())
+        rows = list(self.jma.get_hourly_data(self.prec_no, self.block_no_nagoya, 2018, 12, 31))
+        self.assertEqual(table.column("temperature").to_pylist(), [row.temperature for row in rows[:23]])
+
+    def test_batch_size(self):
+        okazaki = self.jma.get_station(self.prec_no, self.block_no_okazaki)
+        with jma.ParquetWriter(self.tmpdir.name, batch_size=100) as writer:
+            writer.write(okazaki, jma.DATA_TYPE_TEN_MINUTELY, self.jma.get_ten_minutely_data(self.prec_no, self.block_no_okazaki, 2018, 9, 28))
+            self.assertEqual(len(self.files()), 1)
+        self.assertEqual(len(self.files()), 1)
+        self.assertFalse(any(name.endswith(".tmp") for name in self.files()))
+        self.assertEqual(pyarrow.parquet.read_table(os.path.join(self.tmpdir.name, self.files()[0])).num_rows, 144)
+
+    # 同じ日を別のbatch_sizeで書き直しても行は重複しない
+    def test_rewrite_same_day(self):
+        okazaki = self.jma.get_station(self.prec_no, self.block_no_okazaki)
+        rows = list(self.jma.get_ten_minutely_data(self.prec_no, self.block_no_okazaki, 2018, 9, 28))
+        for batch_size in (100, 7, 1000):
+            with jma.ParquetWriter(self.tmpdir.name, batch_size=batch_size) as writer:
+                writer.write(okazaki, jma.DATA_TYPE_TEN_MINUTELY, rows)
+        self.assertEqual(len(self.files()), 1)
+        table = pyarrow.parquet.read_table(os.path.join(self.tmpdir.name, self.files()[0]))
+        self.assertEqual(table.column("dt").to_pylist(), [row.dt for row in rows])
+        self.assertEqual(table.column("temperature").to_pylist(), [row.temperature for row in rows])
+
+
+if __name__ == '__main__':
+    unittest.main()